@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+import Box2D
+from settings import PPM, CAMERA_MIN_ZOOM, CAMERA_MAX_ZOOM
+
+class Camera:
+    """Maps world coordinates (meters, Y-up) to screen pixels (Y-down) with pan and zoom.
+
+    `offset_x`/`offset_y` are the world coordinates shown at the screen's
+    bottom-left corner. All conversions in settings (`to_pygame`, `to_box2d`,
+    scalar helpers) go through the active camera once one is set.
+    """
+    def __init__(self, screen_width, screen_height, ppm=PPM):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.ppm = ppm
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.zoom = 1.0
+        self.scale = ppm # Pixels per meter at the current zoom
+        self.world_bounds = None # (min_x, min_y, max_x, max_y) in meters, used for clamping
+
+    # --- Conversions ---
+
+    def world_to_screen(self, x, y):
+        return (int((x - self.offset_x) * self.scale),
+                int(self.screen_height - (y - self.offset_y) * self.scale))
+
+    def screen_to_world(self, x, y):
+        return Box2D.b2Vec2(x / self.scale + self.offset_x,
+                            (self.screen_height - y) / self.scale + self.offset_y)
+
+    def scalar_to_screen(self, meters):
+        return int(meters * self.scale)
+
+    def scalar_to_world(self, pixels):
+        return pixels / self.scale
+
+    # --- Movement ---
+
+    def set_world_bounds(self, min_x, min_y, max_x, max_y):
+        self.world_bounds = (min_x, min_y, max_x, max_y)
+        self._clamp()
+
+    def pan_pixels(self, dx, dy):
+        """Moves the view by a screen-space delta (dy positive = down)."""
+        self.offset_x += dx / self.scale
+        self.offset_y -= dy / self.scale
+        self._clamp()
+
+    def zoom_at(self, screen_pos, factor):
+        """Zooms by `factor`, keeping the world point under `screen_pos` fixed."""
+        anchor = self.screen_to_world(*screen_pos)
+        self.zoom = max(CAMERA_MIN_ZOOM, min(CAMERA_MAX_ZOOM, self.zoom * factor))
+        self.scale = self.ppm * self.zoom
+        self.offset_x = anchor.x - screen_pos[0] / self.scale
+        self.offset_y = anchor.y - (self.screen_height - screen_pos[1]) / self.scale
+        self._clamp()
+
+    def center_on(self, world_x, world_y):
+        self.offset_x = world_x - self.screen_width / (2 * self.scale)
+        self.offset_y = world_y - self.screen_height / (2 * self.scale)
+        self._clamp()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.scale = self.ppm
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self._clamp()
+
+    def resize(self, screen_width, screen_height):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self._clamp()
+
+    def _clamp(self):
+        """Keeps the view inside the world, or centers the world if it is smaller than the view."""
+        if not self.world_bounds: return
+        min_x, min_y, max_x, max_y = self.world_bounds
+        view_w = self.screen_width / self.scale
+        view_h = self.screen_height / self.scale
+        if max_x - min_x <= view_w:
+            self.offset_x = (min_x + max_x - view_w) / 2
+        else:
+            self.offset_x = max(min_x, min(max_x - view_w, self.offset_x))
+        if max_y - min_y <= view_h:
+            self.offset_y = (min_y + max_y - view_h) / 2
+        else:
+            self.offset_y = max(min_y, min(max_y - view_h, self.offset_y))
+
+    @contextmanager
+    def render_scaled(self, factor):
+        """Temporarily maps the same view onto a screen `factor` times the size (reduced-resolution rendering)."""
+        saved = (self.scale, self.screen_width, self.screen_height)
+        self.scale *= factor
+        self.screen_width = max(1, int(self.screen_width * factor))
+        self.screen_height = max(1, int(self.screen_height * factor))
+        try:
+            yield self
+        finally:
+            self.scale, self.screen_width, self.screen_height = saved
+
+    # --- Queries ---
+
+    def get_view_aabb(self, margin=0.0):
+        """World-space (lower, upper) corners of the visible area, grown by `margin` meters."""
+        return ((self.offset_x - margin, self.offset_y - margin),
+                (self.offset_x + self.screen_width / self.scale + margin,
+                 self.offset_y + self.screen_height / self.scale + margin))
+
+    def contains_bounds(self, bounds):
+        """True if the world-space (min_x, min_y, max_x, max_y) box is entirely visible."""
+        (x0, y0), (x1, y1) = self.get_view_aabb()
+        return x0 <= bounds[0] and y0 <= bounds[1] and bounds[2] <= x1 and bounds[3] <= y1
+
+    def get_state_key(self):
+        """Hashable description of the view; changes whenever the projection changes."""
+        return (self.offset_x, self.offset_y, self.zoom, self.screen_width, self.screen_height)
@@ -0,0 +1,94 @@
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import pygame
+from settings import CAPTURE_FPS, CAPTURE_QUEUE_SIZE, CAPTURE_ENCODER_CMD
+
+def surface_to_rgb_bytes(surface):
+    """Raw RGB24 bytes of a surface (pygame 2.1.3+ has tobytes, older versions tostring)."""
+    if hasattr(pygame.image, 'tobytes'):
+        return pygame.image.tobytes(surface, 'RGB')
+    return pygame.image.tostring(surface, 'RGB')
+
+
+class FrameRecorder:
+    """Writes rendered frames to disk from a background thread.
+
+    Frames are copied to raw RGB bytes on the game thread and handed to a
+    bounded queue. The writer thread either saves a numbered PNG sequence into
+    `output_dir` or pipes the raw frames into an external encoder
+    (`encoder_output`, using CAPTURE_ENCODER_CMD). When the queue is full,
+    `submit` blocks instead of dropping frames, so the output always has one
+    frame per simulated step.
+    """
+    def __init__(self, size, output_dir=None, encoder_output=None, fps=CAPTURE_FPS,
+                 queue_size=CAPTURE_QUEUE_SIZE, encoder_cmd=CAPTURE_ENCODER_CMD):
+        if not output_dir and not encoder_output:
+            raise ValueError("FrameRecorder needs an output directory or an encoder output file.")
+        self.size = size
+        self.output_dir = output_dir
+        self.encoder_output = encoder_output
+        self.fps = fps
+        self.encoder_cmd = encoder_cmd
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._process = None
+
+    def start(self):
+        if self.encoder_output:
+            cmd = self.encoder_cmd.format(width=self.size[0], height=self.size[1], fps=self.fps,
+                                          output=shlex.quote(self.encoder_output))
+            self._process = subprocess.Popen(shlex.split(cmd), stdin=subprocess.PIPE)
+            print(f"Recording: piping frames to encoder -> {self.encoder_output}")
+        else:
+            os.makedirs(self.output_dir, exist_ok=True)
+            print(f"Recording: writing PNG sequence to {self.output_dir}")
+        self._thread = threading.Thread(target=self._writer_loop, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def submit(self, surface):
+        """Queues a copy of the frame. Blocks while the writer is behind."""
+        if self.error:
+            return False
+        self._queue.put((self.frames_submitted, surface_to_rgb_bytes(surface)))
+        self.frames_submitted += 1
+        return True
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error:
+                continue # Keep draining so submit() never blocks forever
+            index, data = item
+            try:
+                if self._process:
+                    self._process.stdin.write(data)
+                else:
+                    frame = pygame.image.frombuffer(data, self.size, 'RGB')
+                    pygame.image.save(frame, os.path.join(self.output_dir, f"frame_{index:06d}.png"))
+                self.frames_written += 1
+            except Exception as e:
+                self.error = e
+                print(f"Error writing frame {index}: {e}")
+
+    def close(self):
+        """Flushes queued frames and stops the writer (and encoder)."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._process:
+            try:
+                self._process.stdin.close()
+                self._process.wait()
+            except Exception as e:
+                print(f"Warning: Error closing encoder: {e}")
+            self._process = None
+        print(f"Recording finished: {self.frames_written}/{self.frames_submitted} frames written.")
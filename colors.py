@@ -0,0 +1,66 @@
+NAMED_COLORS = { # The pygame color names used in this project (same values as pygame's table)
+    'black': (0, 0, 0),
+    'white': (255, 255, 255),
+    'gray': (190, 190, 190),
+    'grey': (190, 190, 190),
+    'red': (255, 0, 0),
+    'green': (0, 255, 0),
+    'blue': (0, 0, 255),
+    'cyan': (0, 255, 255),
+}
+
+class Color(tuple):
+    """Immutable RGBA color that does not need pygame.
+
+    Built from "#RRGGBB[AA]", a name in NAMED_COLORS, or 3-4 components, like
+    pygame.Color. It is a 4-tuple, so pygame accepts it anywhere it takes a
+    color, and it is hashable. `lerp` matches pygame.Color.lerp exactly, so
+    colors mixed here draw the same pixels as before.
+    """
+    __slots__ = ()
+
+    def __new__(cls, *args):
+        if len(args) == 1:
+            value = args[0]
+            components = _parse(value) if isinstance(value, str) else tuple(value)
+        else:
+            components = args
+        if len(components) == 3:
+            components = (*components, 255)
+        if len(components) != 4:
+            raise ValueError(f"Invalid color: {args!r}")
+        return super().__new__(cls, (int(c) for c in components))
+
+    @property
+    def r(self): return self[0]
+
+    @property
+    def g(self): return self[1]
+
+    @property
+    def b(self): return self[2]
+
+    @property
+    def a(self): return self[3]
+
+    def lerp(self, other, amount):
+        """Linear mix toward `other` (any 3-4 component color); amount 0 is self, 1 is other."""
+        other = tuple(other)
+        if len(other) == 3:
+            other = (*other, 255)
+        return Color(*(int(x + (y - x) * amount + 0.5) for x, y in zip(self, other)))
+
+    def __repr__(self):
+        return f"Color{tuple(self)}"
+
+
+def _parse(text):
+    name = text.strip().lower()
+    if name in NAMED_COLORS:
+        return NAMED_COLORS[name]
+    if name.startswith('#') and len(name) in (7, 9):
+        try:
+            return tuple(int(name[i:i + 2], 16) for i in range(1, len(name), 2))
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid color: {text!r}")
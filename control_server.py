@@ -0,0 +1,459 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+import threading
+import traceback
+from array import array
+from collections import deque
+from settings import (TIME_STEP, WORLD_WIDTH_M, WORLD_HEIGHT_M, SPAWN_SHAPE_MIX,
+                      CONTROL_HOST, CONTROL_MAX_MESSAGE, CONTROL_SEND_BUFFER_LIMIT)
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+COMMAND_FAILED = -32000 # Valid request the world could not carry out (e.g. no room for a portal)
+
+STATE_FIELDS = ('x', 'y', 'angle', 'vx', 'vy')
+EVENTS = ('teleport',)
+FLOOD_MARGIN = 1.0 # Meters kept clear of the world edges when a spawn gives no region
+
+class ControlError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class _Client:
+    __slots__ = ('reader', 'writer', 'task', 'pending', 'events', 'dropped')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.pending = None # Future of the batch waiting for the world
+        self.events = set() # Subscribed event names
+        self.dropped = 0    # Notifications skipped because the client was not reading
+
+
+class _Batch:
+    """One request line (a single call or a JSON-RPC batch) and the future its reply resolves."""
+    __slots__ = ('client', 'calls', 'future', 'responses', 'waits')
+
+    def __init__(self, client, calls, future):
+        self.client = client
+        self.calls = calls
+        self.future = future
+        self.responses = []
+        self.waits = [] # (response index, target step) for 'step' calls still running
+
+
+class ControlServer:
+    """Optional JSON-RPC 2.0 interface for driving the sandbox from test harnesses.
+
+    Clients connect over local TCP (loopback) or a Unix socket and send one JSON
+    request or batch per line; replies come back one per line in the same
+    order. The sockets are served by asyncio on a daemon thread, so the game
+    loop never waits on I/O. Requests are queued and `process`, called by the
+    game loop at the start of every frame, hands them to the thread that owns
+    the world through Game.submit_command. A batch is therefore applied in one
+    piece between two physics steps.
+
+    Methods: spawn, create_portal_pair, delete_portal_pair, set_gravity, pause,
+    step, get_state, get_info, subscribe, unsubscribe and quit. See
+    docs/core_systems.md for their parameters.
+    """
+    def __init__(self, port=None, socket_path=None, host=CONTROL_HOST):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.address = None # "host:port" or the socket path once listening
+        self.error = None
+        self.game = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopping = None
+        self._inbox = deque()   # Batches from the asyncio thread, drained by `process`
+        self._events = deque()  # Teleport notifications from the world thread, flushed each frame
+        self._waiting = []      # Batches whose 'step' calls have not reached their target step
+        self._waiting_lock = threading.Lock()
+        self._clients = set()
+        self._subscribers = set() # Clients subscribed to teleport events
+        self._methods = {
+            'spawn': self._spawn,
+            'create_portal_pair': self._create_portal_pair,
+            'delete_portal_pair': self._delete_portal_pair,
+            'set_gravity': self._set_gravity,
+            'pause': self._pause,
+            'step': self._step,
+            'get_state': self._get_state,
+            'get_info': self._get_info,
+            'subscribe': self._subscribe,
+            'unsubscribe': self._unsubscribe,
+            'quit': self._quit,
+        }
+
+    # --- Game thread ---
+
+    def start(self, game):
+        """Starts serving and waits until the socket is bound. Returns success."""
+        self.game = game
+        game.portal_manager.add_teleport_listener(self._on_teleport)
+        self._thread = threading.Thread(target=self._run, name="ControlServer", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        if self.address:
+            print(f"Control server listening on {self.address}")
+            return True
+        print(f"Error: Control server failed to start: {self.error or 'timed out'}")
+        return False
+
+    def stop(self):
+        loop = self._loop
+        if loop and self._stopping:
+            try:
+                loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass # Loop already closed
+        if self._thread:
+            self._thread.join(2.0)
+            self._thread = None
+        if self.socket_path and self.address:
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def process(self):
+        """Frame boundary: submits queued requests, answers finished steps, sends events."""
+        inbox = self._inbox
+        while inbox:
+            self.game.submit_command(self._execute, inbox.popleft())
+        if self._waiting:
+            self._finish_steps(self.game.simulation.step_count)
+        self._flush_events()
+
+    def _flush_events(self):
+        # Called before any reply is resolved, so events a batch caused reach the client ahead of its reply
+        if self._events:
+            events = []
+            while self._events:
+                events.append(self._events.popleft())
+            self._call_soon(self._broadcast, 'teleport', events)
+
+    # --- World thread (main thread, or the physics thread with threaded physics) ---
+
+    def _execute(self, batch):
+        for index, request in enumerate(batch.calls):
+            batch.responses.append(self._call(batch, index, request))
+        if batch.waits:
+            with self._waiting_lock:
+                self._waiting.append(batch)
+        else:
+            self._flush_events()
+            self._call_soon(_resolve, batch.future, batch.responses)
+
+    def _call(self, batch, index, request):
+        """Runs one JSON-RPC request. Returns its response dict, or None for a notification."""
+        if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' \
+                or not isinstance(request.get('method'), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get('id')
+        try:
+            handler = self._methods.get(request['method'])
+            if handler is None:
+                raise ControlError(METHOD_NOT_FOUND, f"Unknown method: {request['method']}")
+            params = request.get('params', {})
+            if not isinstance(params, dict):
+                raise ControlError(INVALID_PARAMS, "params must be an object")
+            result = handler(batch, params)
+        except ControlError as e:
+            result, error = None, _error(request_id, e.code, str(e))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            result, error = None, _error(request_id, INVALID_PARAMS, f"Invalid params: {e!r}")
+        except Exception as e:
+            print(f"Error in control command {request['method']}: {e}")
+            traceback.print_exc()
+            result, error = None, _error(request_id, INTERNAL_ERROR, str(e))
+        else:
+            error = None
+        if 'id' not in request:
+            return None
+        if error:
+            return error
+        if isinstance(result, _StepWait):
+            batch.waits.append((index, result.target))
+            return None # Filled in by _finish_steps
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def _finish_steps(self, step_count):
+        with self._waiting_lock:
+            done = [batch for batch in self._waiting
+                    if all(step_count >= target for _, target in batch.waits)]
+            if not done: return
+            self._waiting = [batch for batch in self._waiting if batch not in done]
+        self._flush_events()
+        for batch in done:
+            for index, _ in batch.waits:
+                request = batch.calls[index]
+                if 'id' in request:
+                    batch.responses[index] = {'jsonrpc': '2.0', 'id': request['id'],
+                                              'result': {'step': step_count}}
+            self._call_soon(_resolve, batch.future, batch.responses)
+
+    def _on_teleport(self, obj, entry_portal, exit_portal, entry_pos, exit_pos):
+        if not self._subscribers: return
+        self._events.append({
+            'object_id': obj.id,
+            'pair_id': entry_portal.pair_id,
+            'entry_portal': entry_portal.id,
+            'exit_portal': exit_portal.id,
+            'entry': [float(entry_pos[0]), float(entry_pos[1])],
+            'exit': [float(exit_pos[0]), float(exit_pos[1])],
+            'step': self.game.simulation.step_count,
+        })
+
+    # --- Methods (run on the world thread) ---
+
+    def _spawn(self, batch, params):
+        """objects: [[type, x, y, angle?, vx?, vy?], ...] -> ids, or count (+ lower, upper, shape_mix) -> flood."""
+        simulation = self.game.simulation
+        if 'objects' in params:
+            specs = []
+            for entry in params['objects']:
+                angle = float(entry[3]) if len(entry) > 3 else 0.0
+                velocity = (float(entry[4]), float(entry[5])) if len(entry) > 5 else (0.0, 0.0)
+                specs.append((entry[0], (float(entry[1]), float(entry[2])), angle, velocity))
+            created = simulation.object_manager.create_objects(specs)
+            return {'ids': [obj.id for obj in created]}
+        lower = params.get('lower', (FLOOD_MARGIN, FLOOD_MARGIN))
+        upper = params.get('upper', (WORLD_WIDTH_M - FLOOD_MARGIN, WORLD_HEIGHT_M - FLOOD_MARGIN))
+        shape_mix = params.get('shape_mix', SPAWN_SHAPE_MIX)
+        created = simulation.spawner.flood((float(lower[0]), float(lower[1])),
+                                           (float(upper[0]), float(upper[1])),
+                                           int(params['count']), shape_mix)
+        return {'created': created}
+
+    def _create_portal_pair(self, batch, params):
+        """a, b: [x, y, angle] in meters and radians -> pair_id."""
+        a, b = params['a'], params['b']
+        pair_id = self.game.simulation.add_portal_pair((float(a[0]), float(a[1])), float(a[2]),
+                                                       (float(b[0]), float(b[1])), float(b[2]))
+        if pair_id is None:
+            raise ControlError(COMMAND_FAILED, "Portal pair could not be created")
+        return {'pair_id': pair_id}
+
+    def _delete_portal_pair(self, batch, params):
+        portal_manager = self.game.simulation.portal_manager
+        pair_id = params['pair_id']
+        if pair_id not in portal_manager.portal_pairs:
+            return {'deleted': False}
+        portal_manager.delete_portal_pair(pair_id)
+        return {'deleted': True}
+
+    def _set_gravity(self, batch, params):
+        """enabled: bool, or omitted to toggle."""
+        physics_manager = self.game.simulation.physics_manager
+        enabled = params.get('enabled')
+        if enabled is None or bool(enabled) != physics_manager.get_gravity_state():
+            physics_manager.toggle_gravity()
+        return {'gravity': physics_manager.get_gravity_state()}
+
+    def _pause(self, batch, params):
+        """paused: bool (default true). While paused the world only moves through 'step'."""
+        if self.game.physics_thread:
+            raise ControlError(COMMAND_FAILED, "pause is not available with threaded physics")
+        self.game.paused = bool(params.get('paused', True))
+        return {'paused': self.game.paused}
+
+    def _step(self, batch, params):
+        """frames: K. Paused: runs K steps now. Running: replies once the loop has made K more steps.
+
+        There is no timeout: if the world stops stepping (e.g. the physics thread
+        dies), the reply waits until the client disconnects or the server stops.
+        `stop` then closes the connection without a reply; the batch stays unanswered.
+        """
+        frames = int(params.get('frames', 1))
+        if frames < 0:
+            raise ControlError(INVALID_PARAMS, "frames must not be negative")
+        simulation = self.game.simulation
+        if self.game.paused:
+            simulation.run(frames, self.game.fixed_dt or TIME_STEP)
+            return {'step': simulation.step_count}
+        return _StepWait(simulation.step_count + frames)
+
+    def _get_state(self, batch, params):
+        """Objects as packed little-endian arrays: ids (int64) and one float64 row of STATE_FIELDS each."""
+        state = self.game.simulation.get_state()
+        ids = array('q', (row[0] for row in state))
+        data = array('d')
+        for row in state:
+            data.extend(row[1:])
+        if sys.byteorder != 'little':
+            ids.byteswap()
+            data.byteswap()
+        return {
+            'step': self.game.simulation.step_count,
+            'count': len(state),
+            'fields': list(STATE_FIELDS),
+            'ids': base64.b64encode(ids.tobytes()).decode('ascii'),
+            'data': base64.b64encode(data.tobytes()).decode('ascii'),
+        }
+
+    def _get_info(self, batch, params):
+        simulation = self.game.simulation
+        return {
+            'step': simulation.step_count,
+            'time': simulation.time,
+            'objects': simulation.object_manager.get_count(),
+            'portal_pairs': sorted(simulation.portal_manager.portal_pairs),
+            'gravity': simulation.physics_manager.get_gravity_state(),
+            'paused': self.game.paused,
+            'threaded_physics': self.game.physics_thread is not None,
+        }
+
+    def _subscribe(self, batch, params):
+        """events: list of event names (default all of EVENTS)."""
+        events = set(params.get('events', EVENTS))
+        unknown = events.difference(EVENTS)
+        if unknown:
+            raise ControlError(INVALID_PARAMS, f"Unknown events: {sorted(unknown)}")
+        batch.client.events |= events
+        if 'teleport' in batch.client.events:
+            self._subscribers.add(batch.client)
+        return {'events': sorted(batch.client.events)}
+
+    def _unsubscribe(self, batch, params):
+        batch.client.events -= set(params.get('events', EVENTS))
+        if 'teleport' not in batch.client.events:
+            self._subscribers.discard(batch.client)
+        return {'events': sorted(batch.client.events)}
+
+    def _quit(self, batch, params):
+        self.game.running = False
+        return {'quitting': True}
+
+    # --- asyncio thread ---
+
+    def _call_soon(self, fn, *args):
+        try:
+            self._loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass # Server stopped; nobody is waiting for the reply
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self.error = e
+            print(f"Error in control server: {e}")
+        finally:
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            if self.socket_path:
+                if not hasattr(asyncio, 'start_unix_server'):
+                    raise OSError("Unix sockets are not supported on this platform")
+                server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path,
+                                                         limit=CONTROL_MAX_MESSAGE)
+                self.address = self.socket_path
+            else:
+                server = await asyncio.start_server(self._handle_client, self.host, self.port or 0,
+                                                    limit=CONTROL_MAX_MESSAGE)
+                host, port = server.sockets[0].getsockname()[:2]
+                self.port = port
+                self.address = f"{host}:{port}"
+        except OSError as e:
+            self.error = e
+            return
+        self._ready.set()
+        await self._stopping.wait()
+        server.close()
+        # Let every connection handler finish on its own (cancelled ones are logged as errors)
+        clients = list(self._clients)
+        for client in clients:
+            client.reader.feed_eof()
+            if client.pending:
+                _resolve(client.pending, [])
+        await asyncio.gather(*(client.task for client in clients), return_exceptions=True)
+        await server.wait_closed()
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(reader, writer)
+        self._clients.add(client)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # Line longer than CONTROL_MAX_MESSAGE
+                    self._send(client, _error(None, INVALID_REQUEST, "Request too large"))
+                    break
+                except ConnectionError:
+                    break
+                if not line: break
+                line = line.strip()
+                if not line: continue
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    self._send(client, _error(None, PARSE_ERROR, f"Parse error: {e}"))
+                    continue
+                is_batch = isinstance(message, list)
+                if is_batch and not message:
+                    self._send(client, _error(None, INVALID_REQUEST, "Empty batch"))
+                    continue
+                batch = _Batch(client, message if is_batch else [message], self._loop.create_future())
+                client.pending = batch.future
+                self._inbox.append(batch)
+                responses = [r for r in await batch.future if r is not None]
+                client.pending = None
+                if responses:
+                    self._send(client, responses if is_batch else responses[0])
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(client)
+            self._subscribers.discard(client)
+            writer.close()
+
+    def _send(self, client, message):
+        client.writer.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+
+    def _broadcast(self, event, params_list):
+        clients = [c for c in list(self._subscribers) if event in c.events]
+        if not clients: return
+        payload = b''.join(json.dumps({'jsonrpc': '2.0', 'method': event, 'params': params},
+                                      separators=(',', ':')).encode('utf-8') + b'\n'
+                           for params in params_list)
+        for client in clients:
+            transport = client.writer.transport
+            if transport.is_closing(): continue
+            if transport.get_write_buffer_size() > CONTROL_SEND_BUFFER_LIMIT:
+                client.dropped += len(params_list) # Client is not reading; don't buffer without bound
+                continue
+            client.writer.write(payload)
+
+
+class _StepWait:
+    __slots__ = ('target',)
+
+    def __init__(self, target):
+        self.target = target
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
@@ -0,0 +1,139 @@
+import pygame
+import math
+import Box2D
+from settings import (PPM, HEIGHT, COLOR_DEBUG, COLOR_DEBUG_SENSOR, COLOR_DEBUG_SLEEP,
+                      COLOR_DEBUG_AABB, COLOR_DEBUG_PROXY, COLOR_DEBUG_CONTACT,
+                      DEBUG_LAYERS, get_active_camera)
+from physics import describe_body_geometry
+
+CONTACT_NORMAL_PX = 10 # Length of drawn contact normals
+
+class PhysicsDebugDraw:
+    """Draws the Box2D debug overlay from fixture geometry cached per body.
+
+    Shape kind, sensor flag and local vertices come from
+    `PhysicsManager.body_geometry` (filled when bodies are created), so a frame
+    only reads each body's position and angle from Box2D. Each body's vertices
+    are projected to the screen with one precomputed rotate+scale+translate.
+    Bodies outside the view are skipped. Layers are toggled through `layers`.
+    """
+    def __init__(self, camera=None, layers=DEBUG_LAYERS):
+        self.camera = camera
+        self.layers = dict(layers)
+        self.allowed_layers = None # Optional set limiting which layers may draw (quality governor); None = all
+        self.last_body_count = 0 # Bodies drawn last frame, for the debug overlay
+
+    def toggle_layer(self, name):
+        self.layers[name] = not self.layers.get(name, False)
+        return self.layers[name]
+
+    def _projection(self, surface):
+        """Returns (scale, offset_x, offset_y, screen_height) of the active world->screen mapping."""
+        camera = self.camera or get_active_camera()
+        if camera is not None:
+            return camera.scale, camera.offset_x, camera.offset_y, camera.screen_height
+        return PPM, 0.0, 0.0, HEIGHT
+
+    def draw(self, surface, world, geometry):
+        """Draws the enabled layers. `geometry` maps b2Body -> describe_body_geometry()."""
+        if not world: return
+        scale, offset_x, offset_y, screen_height = self._projection(surface)
+        view_x0, view_y0 = offset_x, offset_y
+        view_x1 = offset_x + surface.get_width() / scale
+        view_y1 = offset_y + screen_height / scale
+
+        allowed = self.allowed_layers
+        layers = self.layers if allowed is None else {k: v for k, v in self.layers.items() if k in allowed}
+        show_shapes = layers.get('shapes')
+        show_sleep = layers.get('sleep')
+        show_aabbs = layers.get('aabbs')
+        show_proxies = layers.get('proxies')
+        draw_polygon = pygame.draw.polygon
+        draw_circle = pygame.draw.circle
+        draw_line = pygame.draw.line
+        cos, sin = math.cos, math.sin
+
+        drawn = 0
+        for body in world.bodies:
+            if not body.active: continue # Pooled ghosts (GhostPool) waiting for reuse
+            entry = geometry.get(body)
+            if entry is None:
+                entry = describe_body_geometry(body) # Body created outside PhysicsManager
+                geometry[body] = entry
+            is_dynamic, radius, fixtures = entry
+            if not fixtures: continue
+            position = body.position
+            px, py = position.x, position.y
+            if px + radius < view_x0 or px - radius > view_x1 or py + radius < view_y0 or py - radius > view_y1:
+                continue
+            drawn += 1
+
+            # Body -> screen affine: screen = (bx, by) + R(angle) * local * scale, with Y flipped
+            angle = body.angle
+            c, s = cos(angle), sin(angle)
+            cs, ss = c * scale, s * scale
+            bx = (px - offset_x) * scale
+            by = screen_height - (py - offset_y) * scale
+            sleeping = show_sleep and is_dynamic and not body.awake
+
+            for kind, sensor, data in fixtures:
+                if sensor:
+                    color = COLOR_DEBUG_SENSOR
+                elif sleeping:
+                    color = COLOR_DEBUG_SLEEP
+                else:
+                    color = COLOR_DEBUG
+                if kind == 'polygon':
+                    points = [(int(bx + vx * cs - vy * ss), int(by - (vx * ss + vy * cs))) for vx, vy in data]
+                    if show_shapes and len(points) >= 2:
+                        draw_polygon(surface, color, points, 1)
+                    if show_aabbs:
+                        xs = [p[0] for p in points]
+                        ys = [p[1] for p in points]
+                        rect = (min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+                        pygame.draw.rect(surface, COLOR_DEBUG_AABB, rect, 1)
+                else:
+                    lx, ly, r = data
+                    cx = int(bx + lx * cs - ly * ss)
+                    cy = int(by - (lx * ss + ly * cs))
+                    r_px = int(r * scale)
+                    if show_shapes and r_px > 0:
+                        draw_circle(surface, color, (cx, cy), r_px, 1)
+                        draw_line(surface, color, (cx, cy), (int(cx + r_px * c), int(cy - r_px * s)), 1)
+                    if show_aabbs:
+                        pygame.draw.rect(surface, COLOR_DEBUG_AABB, (cx - r_px, cy - r_px, 2 * r_px + 1, 2 * r_px + 1), 1)
+
+            if show_proxies:
+                self._draw_proxies(surface, body, scale, offset_x, offset_y, screen_height)
+        self.last_body_count = drawn
+
+        if layers.get('contacts'):
+            self._draw_contacts(surface, world, scale, offset_x, offset_y, screen_height)
+
+    def _draw_proxies(self, surface, body, scale, offset_x, offset_y, screen_height):
+        """Broadphase boxes. pybox2d does not expose proxy ids, so the fat AABB is
+        approximated as the fixture's AABB grown by b2_aabbExtension."""
+        extension = Box2D.b2_aabbExtension
+        for fixture in body.fixtures:
+            aabb = fixture.GetAABB(0)
+            lower, upper = aabb.lowerBound, aabb.upperBound
+            left = int((lower.x - extension - offset_x) * scale)
+            top = int(screen_height - (upper.y + extension - offset_y) * scale)
+            right = int((upper.x + extension - offset_x) * scale)
+            bottom = int(screen_height - (lower.y - extension - offset_y) * scale)
+            pygame.draw.rect(surface, COLOR_DEBUG_PROXY, (left, top, right - left + 1, bottom - top + 1), 1)
+
+    def _draw_contacts(self, surface, world, scale, offset_x, offset_y, screen_height):
+        """Touching contact points with their normals."""
+        for contact in world.contacts:
+            if not contact.touching: continue
+            count = contact.manifold.pointCount
+            if not count: continue
+            manifold = contact.worldManifold
+            nx, ny = manifold.normal
+            for x, y in manifold.points[:count]:
+                sx = int((x - offset_x) * scale)
+                sy = int(screen_height - (y - offset_y) * scale)
+                pygame.draw.circle(surface, COLOR_DEBUG_CONTACT, (sx, sy), 3)
+                pygame.draw.line(surface, COLOR_DEBUG_CONTACT, (sx, sy),
+                                 (int(sx + nx * CONTACT_NORMAL_PX), int(sy - ny * CONTACT_NORMAL_PX)), 1)
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import pygame
+from settings import DEFAULT_FONT_NAME, UI_FONT_SIZE, HUD_FONT_SIZE, FONT_CACHE_FILE
+
+FALLBACK_MONOSPACE = 'monospace'
+
+class FontLoader:
+    """Loads the game fonts on a background thread while the world is built.
+
+    The bundled font (assets/fonts/DEFAULT_FONT_NAME) is opened directly. If it
+    is missing, the UI falls back to pygame's built-in default font, and only the
+    debug overlay's monospace font needs a system lookup. That lookup
+    (pygame.font.match_font) scans every installed font through fontconfig, so
+    its result is cached in FONT_CACHE_FILE and reused on later runs while the
+    file still exists. pygame.font must be initialized before `start`.
+    """
+    def __init__(self, cache_file=FONT_CACHE_FILE):
+        self.cache_file = cache_file
+        self.fonts = {}
+        self.source = None # Description of where the fonts came from, for the log
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FontLoader", daemon=True)
+        self._thread.start()
+
+    def wait(self, assets):
+        """Blocks until loading is done and copies the fonts into `assets`. Returns success."""
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        elif not self.fonts and self.error is None:
+            self._run() # Never started; load on the calling thread
+        if self.error is not None:
+            print(f"FATAL: Failed to load fonts: {self.error}")
+            return False
+        assets.update(self.fonts)
+        print(f"Loaded fonts: {self.source}")
+        return True
+
+    def _run(self):
+        try:
+            self.fonts = self._load()
+        except Exception as e:
+            self.error = e
+
+    def _load(self):
+        font_path = os.path.join('assets', 'fonts', DEFAULT_FONT_NAME)
+        if os.path.isfile(font_path):
+            try:
+                fonts = {
+                    'ui_font': pygame.font.Font(font_path, UI_FONT_SIZE),
+                    'hud_font': pygame.font.Font(font_path, HUD_FONT_SIZE),
+                    'debug_font': pygame.font.Font(font_path, HUD_FONT_SIZE - 2),
+                }
+                self.source = font_path
+                return fonts
+            except pygame.error as e:
+                print(f"Warning: Failed to load font '{font_path}' using Pygame: {e}.")
+        else:
+            print(f"Warning: Font file not found at '{font_path}'.")
+
+        # Fallback: pygame's bundled default font (no system scan) and a system monospace for debug text
+        monospace_path = self._find_system_font(FALLBACK_MONOSPACE)
+        self.source = f"pygame default + {monospace_path or 'pygame default'}"
+        return {
+            'ui_font': pygame.font.Font(None, UI_FONT_SIZE),
+            'hud_font': pygame.font.Font(None, HUD_FONT_SIZE),
+            'debug_font': pygame.font.Font(monospace_path, HUD_FONT_SIZE - 1),
+        }
+
+    def _find_system_font(self, name):
+        """Path of a system font by name (or None), from the cache file when possible."""
+        cache = self._read_cache()
+        if name in cache:
+            path = cache[name]
+            if path is None or os.path.isfile(path):
+                return path
+        path = pygame.font.match_font(name)
+        cache[name] = path
+        self._write_cache(cache)
+        return path
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, cache):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print(f"Warning: Could not write font cache '{self.cache_file}': {e}")
@@ -1,52 +1,109 @@
 import pygame
+import math
 import os
 import sys
-from settings import (WIDTH, HEIGHT, FPS, PPM, COLOR_BACKGROUND, DEFAULT_FONT_NAME,
-                      UI_FONT_SIZE, HUD_FONT_SIZE)
+import time
+from settings import (WIDTH, HEIGHT, FPS, PPM, COLOR_BACKGROUND, WORLD_WIDTH_M, WORLD_HEIGHT_M,
+                      CAMERA_CULL_MARGIN, THREADED_PHYSICS, PARTICLES_ENABLED,
+                      QUALITY_GOVERNOR_ENABLED, SCENE_EMITTERS, REWIND_ENABLED, set_active_camera)
+from camera import Camera
 from input import InputManager
-from physics import PhysicsManager
-from objects import ObjectManager
-from portals import PortalManager
+from simcore import Simulation
 from renderer import Renderer
 from ui import UIManager
+from utils import text_cache
+from threaded_physics import PhysicsThread, ObjectSnapshot
+from particles import ParticleSystem, PARTICLES_AVAILABLE
+from quality import QualityGovernor
+from spawner import Emitter
+from fonts import FontLoader
+from startup import StartupTimer
+from rewind import RewindBuffer
 
 class Game:
     """Main game class orchestrating initialization, game loop, and managers."""
-    def __init__(self):
-        self.screen = None # Pygame screen
+    def __init__(self, headless=False, recorder=None, fixed_fps=None, max_frames=None,
+                 threaded_physics=THREADED_PHYSICS, startup_timer=None, control_server=None, replica=None,
+                 rewind=REWIND_ENABLED):
+        # Launch-to-first-frame timings; main.py passes one started before the heavy imports
+        self.startup = startup_timer or StartupTimer()
+        self.time_to_first_frame_ms = None
+        self.font_loader = None
+
+        self.screen = None # Pygame screen (an offscreen Surface when headless)
         self.clock = None
         self.running = False
         self.debug_mode = False
         self.assets = {} # Game assets (fonts, sounds)
 
+        # Offscreen capture: render without a display, step at a fixed rate independent of real time
+        self.headless = headless
+        self.recorder = recorder
+        self.fixed_dt = 1.0 / fixed_fps if fixed_fps else None
+        self.max_frames = max_frames
+        self.frame_count = 0
+        self.frame_time = 0.0 # Sum of the frames' dt: fixed_dt per frame when fixed, else measured
+
+        # Optional: physics steps on its own thread; the main thread renders its snapshots
+        self.threaded_physics = threaded_physics and not fixed_fps and not replica # Fixed-rate capture stays in lockstep
+        self.physics_thread = None
+
+        # Viewer mode (replication.ReplicationClient): draws a remote server's world and never simulates
+        self.replica = replica
+        self.replica_snapshot = None
+
+        # Optional JSON-RPC control (control_server.ControlServer); it can hold the world still between steps
+        self.control_server = control_server
+        self.paused = False
+        self.rewind_enabled = rewind
+        self.rewind = None # RewindBuffer; scrubbing holds the world paused
+
+        # Adaptive quality tiers; off for fixed-rate capture so recordings don't depend on machine speed
+        self.quality = QualityGovernor() if QUALITY_GOVERNOR_ENABLED and not fixed_fps else None
+
         self.input_manager = None
         self.physics_manager = None
         self.object_manager = None
         self.portal_manager = None
         self.ui_manager = None
         self.renderer = None
+        self.camera = None
+        self.particles = None # Visual-only effects; None when disabled or NumPy is missing
+        self.simulation = None # Pygame-free core (simcore.Simulation) owning the managers below
+        self.spawner = None # Emitters and flood fill for load testing
 
         if not self.init_pygame(): return
-        if not self._load_assets(): return
+        self.startup.mark("pygame init")
+        self._start_asset_loading() # Fonts load in the background while the world is built
         if not self._init_managers(): return
+        self.startup.mark("managers")
         self._setup_scene()
+        self.startup.mark("scene")
+        if not self._load_assets(): return
+        self.startup.mark("fonts (wait)")
         self._create_ui()
+        self.startup.mark("ui")
 
         self.running = True
 
 
     def init_pygame(self):
-        """Initializes Pygame modules, screen, and clock."""
-        try:
-            pygame.init()
-            try:
-                pygame.mixer.init()
-                print("Pygame mixer initialized.")
-            except pygame.error as e:
-                print(f"Warning: Pygame mixer could not be initialized - {e}")
+        """Initializes the Pygame modules the game uses (display, font), screen, and clock.
 
-            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-            pygame.display.set_caption("Portals2D - Minimalist Physics Sandbox")
+        pygame.init() is avoided because it also opens the audio device, and the
+        game plays no sound.
+        """
+        try:
+            if self.headless:
+                os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            pygame.display.init()
+            pygame.font.init()
+
+            if self.headless:
+                self.screen = pygame.Surface((WIDTH, HEIGHT))
+            else:
+                self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+                pygame.display.set_caption("Portals2D - Minimalist Physics Sandbox")
             self.clock = pygame.time.Clock()
             print("Pygame initialized successfully.")
             return True
@@ -58,35 +115,18 @@ class Game:
             return False
 
 
-    def _load_assets(self):
-        """Loads fonts and potentially sounds, storing them in self.assets."""
+    def _start_asset_loading(self):
+        """Starts loading fonts on a background thread (see FontLoader)."""
         print("Loading assets...")
-        font_dir = os.path.join('assets', 'fonts')
-        font_path = os.path.join(font_dir, DEFAULT_FONT_NAME)
-        loaded_font = False
-        try:
-            self.assets['ui_font'] = pygame.font.Font(font_path, UI_FONT_SIZE)
-            self.assets['hud_font'] = pygame.font.Font(font_path, HUD_FONT_SIZE)
-            self.assets['debug_font'] = pygame.font.Font(font_path, HUD_FONT_SIZE - 2)
-            print(f"Loaded font: {font_path}")
-            loaded_font = True
-        except FileNotFoundError:
-            print(f"Warning: Font file not found at '{font_path}'.")
-        except pygame.error as e:
-             print(f"Warning: Failed to load font '{font_path}' using Pygame: {e}.")
-        except Exception as e:
-            print(f"Warning: Unexpected error loading font '{font_path}': {e}")
-
-        if not loaded_font:
-            print("Using system default font as fallback.")
-            try:
-                self.assets['ui_font'] = pygame.font.SysFont(None, UI_FONT_SIZE)
-                self.assets['hud_font'] = pygame.font.SysFont(None, HUD_FONT_SIZE)
-                self.assets['debug_font'] = pygame.font.SysFont("monospace", HUD_FONT_SIZE - 1)
-            except Exception as e:
-                 print(f"FATAL: Failed to load system default font: {e}")
-                 return False
+        self.font_loader = FontLoader()
+        self.font_loader.start()
 
+    def _load_assets(self):
+        """Waits for the background font loading and stores the fonts in self.assets."""
+        if not self.font_loader:
+            self._start_asset_loading()
+        if not self.font_loader.wait(self.assets):
+            return False
         print("Assets loaded.")
         return True
 
@@ -95,15 +135,29 @@ class Game:
         """Initializes all the game managers in the correct order."""
         print("Initializing managers...")
         try:
-            self.object_manager = ObjectManager(None)
-            self.portal_manager = PortalManager(None)
-            self.physics_manager = PhysicsManager(self.object_manager, self.portal_manager)
-            self.object_manager.set_physics_manager(self.physics_manager)
-            self.portal_manager.set_physics_manager(self.physics_manager)
+            self.camera = Camera(WIDTH, HEIGHT)
+            set_active_camera(self.camera)
+
+            # Pygame-free core; boundaries are added by _setup_scene. Cooldowns use its own clock,
+            # which only advances with steps, so pausing and single-stepping stay deterministic
+            self.simulation = Simulation(world_size=None)
+            self.object_manager = self.simulation.object_manager
+            self.portal_manager = self.simulation.portal_manager
+            self.physics_manager = self.simulation.physics_manager
+            self.spawner = self.simulation.spawner
 
             self.ui_manager = UIManager(self.assets)
-            self.renderer = Renderer(self.screen, self.assets)
+            self.renderer = Renderer(self.screen, self.assets, self.camera, offscreen=self.headless)
             self.input_manager = InputManager(self)
+            if PARTICLES_ENABLED and PARTICLES_AVAILABLE:
+                self.particles = ParticleSystem()
+                self.portal_manager.add_teleport_listener(self.particles.on_teleport)
+            elif PARTICLES_ENABLED:
+                print("Warning: NumPy not installed, particle effects disabled.")
+            if self.rewind_enabled and not self.replica:
+                self.rewind = RewindBuffer(self.simulation)
+            if self.threaded_physics:
+                self.physics_thread = PhysicsThread(self.simulation)
             print("Managers initialized successfully.")
             return True
         except Exception as e:
@@ -116,13 +170,16 @@ class Game:
         """Initial setup of the game world (boundaries, initial objects)."""
         print("Setting up scene...")
         try:
-            width_m = WIDTH / PPM
-            height_m = HEIGHT / PPM
-            self.physics_manager.add_boundaries(width_m, height_m)
-
-            self.object_manager.create_object('box', (WIDTH * 0.5, HEIGHT * 0.3))
-            self.object_manager.create_object('circle', (WIDTH * 0.6, HEIGHT * 0.5))
-            self.object_manager.create_object('circle', (WIDTH * 0.4, HEIGHT * 0.5))
+            self.physics_manager.add_boundaries(WORLD_WIDTH_M, WORLD_HEIGHT_M)
+            self.camera.set_world_bounds(0.0, 0.0, WORLD_WIDTH_M, WORLD_HEIGHT_M)
+
+            if not self.replica: # A viewer's objects come from the server
+                self.object_manager.create_object('box', (WIDTH * 0.5, HEIGHT * 0.3))
+                self.object_manager.create_object('circle', (WIDTH * 0.6, HEIGHT * 0.5))
+                self.object_manager.create_object('circle', (WIDTH * 0.4, HEIGHT * 0.5))
+                for emitter_args in SCENE_EMITTERS:
+                    self.spawner.add_emitter(Emitter(**emitter_args))
+            self.renderer.set_static_world(self.physics_manager.world)
             print("Scene setup complete.")
         except Exception as e:
             print(f"Error during scene setup: {e}")
@@ -139,7 +196,7 @@ class Game:
              self.ui_manager.create_button(
                  (button_x, button_y, button_width, button_height),
                  "Toggle Gravity (G)",
-                 self.physics_manager.toggle_gravity,
+                 lambda: self.submit_command(self.physics_manager.toggle_gravity),
                  border_radius=4
              )
              print("UI created.")
@@ -154,8 +211,25 @@ class Game:
              return
 
         print("Starting game loop...")
+        if self.recorder:
+            self.recorder.start()
+        if self.physics_thread:
+            self.physics_thread.start()
+        if self.control_server and not self.control_server.start(self):
+            self.control_server = None
+        if self.replica:
+            self.replica.connect()
         while self.running:
-            dt = min(self.clock.tick(FPS) / 1000.0, 0.1)
+            if self.fixed_dt:
+                self.clock.tick() # Run as fast as possible; only measures real FPS
+                dt = self.fixed_dt
+            else:
+                dt = min(self.clock.tick(FPS) / 1000.0, 0.1)
+            self.frame_time += dt
+            frame_start = time.perf_counter()
+
+            if self.control_server:
+                self.control_server.process() # Frame boundary: queued remote commands go in here
 
             try:
                 self.input_manager.process_inputs()
@@ -179,39 +253,211 @@ class Game:
                  import traceback; traceback.print_exc()
                  self.running = False
 
+            if self.time_to_first_frame_ms is None and self.running:
+                self.time_to_first_frame_ms = self.startup.mark("first frame")
+                print(f"Time to first frame: {self.time_to_first_frame_ms:.0f} ms")
+
+            if self.quality and self.running:
+                now = time.perf_counter()
+                tier = self.quality.record_frame((now - frame_start) * 1000.0, now)
+                if tier:
+                    self._apply_quality_tier(tier)
+
+            if self.recorder and self.running:
+                self.recorder.submit(self.screen)
+            self.frame_count += 1
+            if self.max_frames and self.frame_count >= self.max_frames:
+                self.running = False
+
         print("Game loop finished.")
         self.cleanup()
 
 
+    def submit_command(self, fn, *args):
+        """Runs a world-changing call now, or queues it for the physics thread when that is enabled."""
+        if self.replica:
+            return # Viewers only watch; the server owns the world
+        if self.physics_thread:
+            self.physics_thread.submit(fn, *args)
+        else:
+            fn(*args)
+
+    def set_paused(self, paused):
+        """Holds the world still (or releases it) on whichever thread steps it."""
+        self.paused = paused
+        if self.physics_thread:
+            self.physics_thread.paused = paused
+
+    def toggle_rewind(self):
+        """Enters scrubbing at the newest recorded step, or resumes live play from the shown one."""
+        rewind = self.rewind
+        if not rewind: return
+        if rewind.cursor is None:
+            self.set_paused(True) # Stop recording before the cursor is placed
+            if not rewind.begin():
+                print("Rewind: nothing recorded yet")
+                self.set_paused(False)
+                return
+            print("Rewind: scrubbing ([ / ] to move, R to resume)")
+        else:
+            self.submit_command(rewind.end)
+            self.set_paused(False)
+            print("Rewind: resumed")
+
+    def seek_rewind(self, frames):
+        """Moves the rewind cursor by `frames` recorded steps and restores that step into the world."""
+        index = self.rewind.seek(frames) if self.rewind else None
+        if index is not None:
+            self.submit_command(self.rewind.restore, index)
+
+    def _apply_quality_tier(self, tier):
+        """Pushes a QUALITY_TIERS entry to the renderer, particles and physics."""
+        renderer = self.renderer
+        renderer.show_grid = tier['grid']
+        renderer.set_text_refresh_interval(tier['text_refresh'])
+        renderer.set_render_scale(tier['render_scale'])
+        renderer.debug_draw.allowed_layers = tier['debug_layers']
+        renderer.lod.point_max_radius_px = tier['lod_point_px']
+        renderer.lod.density_min_objects = tier['lod_density_objects']
+        if self.particles:
+            self.particles.set_cap(tier['particle_cap'])
+        self.submit_command(self.physics_manager.set_solver_iterations, *tier['solver_iterations'])
+        print(f"Quality tier: {tier['name']}")
+
     def update(self, dt):
         """Update all relevant game components based on delta time."""
-        self.physics_manager.update(dt)
-        self.portal_manager.update(dt)
-        self.object_manager.update(dt)
+        if self.replica:
+            self.replica.poll()
+            self.replica_snapshot = self.replica.get_snapshot()
+            self.ui_manager.update(dt)
+            if self.particles:
+                self.particles.update(dt, self.replica_snapshot.portals)
+            return
+        if self.physics_thread:
+            # World updates happen on the physics thread
+            if self.physics_thread.error:
+                self.running = False
+            self.ui_manager.update(dt)
+            if self.particles:
+                self.particles.update(dt, self.physics_thread.get_snapshot().portals)
+            return
+        if not self.paused:
+            self.simulation.step(dt)
         self.ui_manager.update(dt)
+        if self.particles:
+            self.particles.update(dt, self.portal_manager.get_all_portals())
 
 
     def render(self):
         """Gather current game state and pass it to the renderer."""
         if not self.renderer: return
-
+        if self.physics_thread or self.replica:
+            self._render_snapshot()
+            return
+
+        visible_objects, visible_portals = self._get_visible_entities()
+        ghosts = [ObjectSnapshot.ghost_of(*pose) for pose in self.portal_manager.get_ghost_poses()]
+        if ghosts:
+            visible_objects = list(visible_objects) + ghosts
         game_state = {
-            'objects': self.object_manager.get_objects(),
-            'portals': self.portal_manager.get_all_portals(),
+            'objects': visible_objects,
+            'portals': visible_portals,
             'ui_elements': self.ui_manager.get_elements(),
             'hud_info': {
-                'fps': self.clock.get_fps(),
+                # Recordings show the nominal rate so output doesn't depend on machine speed
+                'fps': 1.0 / self.fixed_dt if self.recorder else self.clock.get_fps(),
                 'obj_count': self.object_manager.get_count(),
                 'portal_count': self.portal_manager.get_portal_count(),
                 'gravity_on': self.physics_manager.get_gravity_state(),
+                'quality': self.quality.get_name() if self.quality else None,
+                'rewind': self.rewind.get_label() if self.rewind else None,
             },
             'debug_mode': self.debug_mode,
             'physics_world': self.physics_manager.world if self.debug_mode else None,
+            'physics_geometry': self.physics_manager.body_geometry,
+            'portal_view_source': self.physics_manager.get_entities_in_aabb,
+            'particles': self.particles,
+            'frame_time': self.frame_time,
+            'emitters': self.spawner.get_markers(),
             'debug_info': self._get_debug_info() if self.debug_mode else {},
-            'portal_preview_line': self.portal_manager.get_creation_preview_line()
+            'portal_preview_line': self.portal_manager.get_creation_preview_line(self.input_manager.mouse_pos)
+        }
+        self.renderer.render_all(game_state)
+
+
+    def _render_snapshot(self):
+        """Renders the physics thread's latest snapshot (or the viewer's). Never touches the Box2D world."""
+        snapshot = self.replica_snapshot if self.replica else self.physics_thread.get_snapshot()
+        objects, portals = snapshot.objects, snapshot.portals
+        world_bounds = self.physics_manager.world_bounds
+        if world_bounds and not self.camera.contains_bounds(world_bounds):
+            # No broadphase on this thread; cull snapshot positions against the view instead
+            (x0, y0), (x1, y1) = self.camera.get_view_aabb(CAMERA_CULL_MARGIN)
+            objects = [o for o in objects if x0 <= o.position[0] <= x1 and y0 <= o.position[1] <= y1]
+            portals = [p for p in portals if self._portal_in_view(p, x0, y0, x1, y1)]
+        if snapshot.ghosts:
+            objects = list(objects) + list(snapshot.ghosts)
+        game_state = {
+            'objects': objects,
+            'portals': portals,
+            'ui_elements': self.ui_manager.get_elements(),
+            'hud_info': {
+                'fps': self.clock.get_fps(),
+                'obj_count': snapshot.obj_count,
+                'portal_count': snapshot.portal_count,
+                'gravity_on': snapshot.gravity_on,
+                'quality': self.quality.get_name() if self.quality else None,
+                'rewind': self.rewind.get_label() if self.rewind else None,
+            },
+            'debug_mode': self.debug_mode,
+            'physics_world': None, # Wireframes would read the world mid-step
+            'portal_view_source': snapshot.get_entities_in_aabb,
+            'particles': self.particles,
+            'frame_time': self.frame_time,
+            'emitters': snapshot.emitters,
+            'debug_info': self._get_snapshot_debug_info(snapshot) if self.debug_mode else {},
+            'portal_preview_line': self.portal_manager.get_preview_line_from(snapshot.creation_start,
+                                                                             self.input_manager.mouse_pos)
         }
         self.renderer.render_all(game_state)
 
+    @staticmethod
+    def _portal_in_view(portal, x0, y0, x1, y1):
+        """Whether any part of a portal snapshot can reach into a world-space view box."""
+        reach = math.hypot(portal.size[0], portal.size[1]) / 2
+        x, y = portal.position
+        return x0 - reach <= x <= x1 + reach and y0 - reach <= y <= y1 + reach
+
+    def _get_snapshot_debug_info(self, snapshot):
+        stats = snapshot.stats
+        return {
+            "Mouse Pos": self.input_manager.mouse_pos,
+            "Mouse Vel": self.input_manager.mouse_rel,
+            "Physics Step": f"#{snapshot.step} (replica: {self.replica.get_status()})" if self.replica
+                            else f"#{snapshot.step} ({stats['step_ms']:.1f} ms, threaded)",
+            "Bodies": stats['bodies'],
+            "Contacts": stats['contacts'],
+            "Dragging": stats['dragging'] if stats['dragging'] is not None else "None",
+            "Portal Creating": snapshot.creation_start is not None,
+            "Spawner": self._get_spawner_info(stats.get('spawner')),
+            "Teleport Queue": stats['teleport_queue'],
+            "Ghosts": stats.get('ghosts', "N/A"),
+            "Text Cache": f"{text_cache.hits} hit / {text_cache.misses} miss ({len(text_cache)})",
+            "Startup": f"{self.time_to_first_frame_ms:.0f} ms to first frame" if self.time_to_first_frame_ms else "N/A",
+            "Portal Views": self._get_portal_view_info(),
+            "Quality": f"{self.quality.get_name()} ({self.quality.get_average_ms():.1f} ms work)" if self.quality else "fixed",
+            "Particles": f"{self.particles.count}/{self.particles.cap} ({self.particles.dropped} dropped)" if self.particles else "off",
+            "Rewind": self._get_rewind_info(),
+            "LOD": "{full} full / {points} px / {tiles} tiles".format(**self.renderer.lod.last_counts),
+        }
+
+    def _get_visible_entities(self):
+        """Objects and portals inside the viewport. Uses a broadphase query unless the whole world is on screen."""
+        world_bounds = self.physics_manager.world_bounds
+        if not self.camera or (world_bounds and self.camera.contains_bounds(world_bounds)):
+            return self.object_manager.get_objects(), self.portal_manager.get_all_portals()
+        lower, upper = self.camera.get_view_aabb(CAMERA_CULL_MARGIN)
+        return self.physics_manager.get_entities_in_aabb(lower, upper)
 
     def _get_debug_info(self):
         """Collects various pieces of information for the debug overlay text."""
@@ -221,15 +467,58 @@ class Game:
             "Bodies": len(self.physics_manager.world.bodies) if self.physics_manager.world else 'N/A',
             "Joints": len(self.physics_manager.world.joints) if self.physics_manager.world else 'N/A',
             "Contacts": self.physics_manager.world.contactCount if self.physics_manager.world else 'N/A',
+            "Broadphase": self._get_broadphase_info(),
+            "Debug Layers": " ".join(name for name, on in self.renderer.debug_draw.layers.items() if on) or "none",
             "Dragging": self.object_manager.selected_object.id if self.object_manager.selected_object else "None",
             "Portal Creating": self.portal_manager.creation_state['active'],
+            "Spawner": self._get_spawner_info(),
             "Teleport Queue": len(self.portal_manager.teleport_queue),
+            "Ghosts": self.physics_manager.ghosts.get_info(),
+            "Portal Views": self._get_portal_view_info(),
+            "Quality": f"{self.quality.get_name()} ({self.quality.get_average_ms():.1f} ms work)" if self.quality else "fixed",
+            "Particles": f"{self.particles.count}/{self.particles.cap} ({self.particles.dropped} dropped)" if self.particles else "off",
+            "Rewind": self._get_rewind_info(),
+            "LOD": "{full} full / {points} px / {tiles} tiles".format(**self.renderer.lod.last_counts),
+            "Camera": f"({self.camera.offset_x:.1f}, {self.camera.offset_y:.1f}) x{self.camera.zoom:.2f}",
+            "Text Cache": f"{text_cache.hits} hit / {text_cache.misses} miss ({len(text_cache)})",
+            "Startup": f"{self.time_to_first_frame_ms:.0f} ms to first frame" if self.time_to_first_frame_ms else "N/A",
         }
         return info
 
+    def _get_spawner_info(self, counts=None):
+        """`counts` is (emitters, spawned, waiting) from a snapshot; read the spawner directly otherwise."""
+        if counts is None:
+            spawner = self.spawner
+            counts = (len(spawner.emitters), spawner.last_spawned, spawner.waiting)
+        return "{} emitters, {}/frame, {} waiting".format(*counts)
+
+    def _get_rewind_info(self):
+        rewind = self.rewind
+        if rewind is None: return "off"
+        return f"{len(rewind.frames)}/{rewind.max_frames} frames, {rewind.nbytes / (1024 * 1024):.1f} MB"
+
+    def _get_portal_view_info(self):
+        views = self.renderer.portal_views
+        if views is None: return "off"
+        return f"{views.last_rendered} drawn / {views.last_reused} cached"
+
+    def _get_broadphase_info(self):
+        try:
+            broad_phase = self.physics_manager.world.contactManager.broadPhase
+            return f"{broad_phase.proxyCount} proxies, tree height {broad_phase.treeHeight}"
+        except Exception:
+            return 'N/A'
+
     def cleanup(self):
         """Perform cleanup operations when the game exits."""
         print("Cleaning up...")
-        pygame.mixer.quit()
-        pygame.quit()
+        if self.control_server:
+            self.control_server.stop()
+        if self.replica:
+            self.replica.close()
+        if self.physics_thread:
+            self.physics_thread.stop()
+        if self.recorder:
+            self.recorder.close()
+        pygame.quit() # Quits whichever modules were initialized
         print("Cleanup complete. Exiting.")
\ No newline at end of file
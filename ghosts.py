@@ -0,0 +1,72 @@
+from settings import Box2D, USER_DATA_GHOST, PORTAL_GHOST_POOL_SIZE
+
+class GhostPool:
+    """Kinematic stand-ins for objects straddling a portal, reused rather than created per crossing.
+
+    A ghost has the object's shape and sits where the part of the object that
+    is already through the portal would be, so it pushes bodies on the exit
+    side. Kinematic bodies never collide with static ones, so a ghost inside
+    the exit wall is harmless. Released ghosts are deactivated, which takes
+    them out of the broadphase, and kept per shape; at most `max_idle` are kept
+    in all, the rest are destroyed straight away. Shapes are keyed by fixture
+    geometry read from the bodies themselves, so an object whose fixtures were
+    rebuilt never gets a ghost of its old shape. Use only on the thread that
+    steps the world, and never from inside a contact callback (the world is
+    locked there).
+    """
+    def __init__(self, world, max_idle=PORTAL_GHOST_POOL_SIZE):
+        self.world = world
+        self.max_idle = max_idle
+        self._idle = {} # shape key -> [inactive body]
+        self.idle_count = 0
+        self.active_count = 0
+        self.created = 0
+
+    @staticmethod
+    def _shape_key(body):
+        """Hashable geometry and material of a body's fixtures."""
+        key = []
+        for fixture in body.fixtures:
+            shape = fixture.shape
+            if isinstance(shape, Box2D.b2CircleShape):
+                geometry = (shape.radius, tuple(shape.pos))
+            else:
+                geometry = tuple(tuple(vertex) for vertex in shape.vertices)
+            key.append((geometry, fixture.friction, fixture.restitution))
+        return tuple(key)
+
+    def acquire(self, obj, position, angle):
+        """Returns an active ghost shaped like `obj`, placed at `position`/`angle`."""
+        key = self._shape_key(obj.body)
+        idle = self._idle.get(key)
+        if idle:
+            body = idle.pop()
+            self.idle_count -= 1
+            body.transform = (position, angle) # Before activating, so the proxies are created in place
+            body.active = True
+        else:
+            body = self.world.CreateKinematicBody(position=position, angle=angle)
+            for fixture in obj.body.fixtures:
+                body.CreateFixture(shape=fixture.shape, friction=fixture.friction, restitution=fixture.restitution)
+            self.created += 1
+        body.userData = {'type': USER_DATA_GHOST, 'object_instance': obj}
+        self.active_count += 1
+        return body
+
+    def release(self, body):
+        """Parks a ghost for reuse, filed under its own fixtures (or destroys it now when the pool is full)."""
+        self.active_count -= 1
+        if self.idle_count >= self.max_idle:
+            # Directly, not via PhysicsManager.destroy_body: pool bodies never enter its queue
+            body.userData = None # Not left for the contact listener to read during DestroyBody
+            self.world.DestroyBody(body)
+            return
+        body.active = False
+        body.linearVelocity = (0.0, 0.0)
+        body.angularVelocity = 0.0
+        body.userData = {'type': USER_DATA_GHOST, 'object_instance': None}
+        self._idle.setdefault(self._shape_key(body), []).append(body)
+        self.idle_count += 1
+
+    def get_info(self):
+        return f"{self.active_count} active, {self.idle_count} idle, {self.created} created"
@@ -2,7 +2,8 @@ import pygame
 # Import Portal specifically for type checking later
 from portals import Portal
 # Import settings to access the new constant
-from settings import to_box2d, MIN_PORTAL_DRAG_DISTANCE
+from settings import (to_box2d, scalar_to_box2d, MIN_PORTAL_DRAG_DISTANCE, CAMERA_ZOOM_STEP,
+                      CAMERA_PAN_SPEED, DEBUG_LAYER_KEYS, SPAWN_FLOOD_COUNT, REWIND_SCRUB_FAST)
 import math # For distance calculation if needed (we'll use squared)
 
 class InputManager:
@@ -12,29 +13,38 @@ class InputManager:
         self.prev_mouse_pos = (0, 0)
         self.mouse_rel = (0, 0)
         self.mouse_pressed = {1: False, 2: False, 3: False}
+        try:
+            self.mouse_pos = pygame.mouse.get_pos() # Until the first motion event arrives
+        except pygame.error:
+            pass
 
     def process_inputs(self):
-        """Processes all Pygame events for a frame and updates input state."""
+        """Processes all Pygame events for a frame and updates input state.
+
+        Mouse motion is coalesced: only the frame's last MOUSEMOTION is
+        dispatched (UI hover, drag, pan), with `mouse_rel` holding the motion
+        accumulated over the whole frame (used for throw velocity). Button
+        events use their own `pos`, so no event needs pygame.mouse.get_pos().
+        """
+        events = pygame.event.get()
 
+        # Pre-scan: accumulated motion and the index of the last motion event
         self.prev_mouse_pos = self.mouse_pos
-        try:
-            current_mouse_pos = pygame.mouse.get_pos()
-            if (isinstance(current_mouse_pos, tuple) and isinstance(self.prev_mouse_pos, tuple) and
-                len(current_mouse_pos) == 2 and len(self.prev_mouse_pos) == 2):
-                dx = current_mouse_pos[0] - self.prev_mouse_pos[0]
-                dy = current_mouse_pos[1] - self.prev_mouse_pos[1]
-                self.mouse_rel = (dx, dy)
-                self.mouse_pos = current_mouse_pos
-            else:
-                self.mouse_rel = (0, 0)
-                if isinstance(current_mouse_pos, tuple) and len(current_mouse_pos) == 2:
-                    self.mouse_pos = current_mouse_pos
-        except Exception as e:
-            self.mouse_rel = (0, 0)
-            print(f"Warning: Error updating mouse position: {e}")
+        rel_x = rel_y = 0
+        last_motion = -1
+        for index, event in enumerate(events):
+            if event.type == pygame.MOUSEMOTION:
+                rel_x += event.rel[0]
+                rel_y += event.rel[1]
+                last_motion = index
+        self.mouse_rel = (rel_x, rel_y)
+        if last_motion >= 0:
+            self.mouse_pos = events[last_motion].pos
 
         # --- Event Loop ---
-        for event in pygame.event.get():
+        for index, event in enumerate(events):
+            if event.type == pygame.MOUSEMOTION and index != last_motion:
+                continue # Superseded by a later motion event this frame
             if event.type == pygame.QUIT:
                 self.game.running = False
                 return
@@ -44,15 +54,31 @@ class InputManager:
                     self.game.running = False
                     return
                 if event.key == pygame.K_g:
-                    self.game.physics_manager.toggle_gravity()
+                    self.game.submit_command(self.game.physics_manager.toggle_gravity)
                 if event.key == pygame.K_d:
                     self.game.debug_mode = not self.game.debug_mode
                     print(f"Debug mode: {'ON' if self.game.debug_mode else 'OFF'}")
+                if self.game.debug_mode and event.key in DEBUG_LAYER_KEYS:
+                    layer = DEBUG_LAYER_KEYS[event.key]
+                    enabled = self.game.renderer.debug_draw.toggle_layer(layer)
+                    print(f"Debug layer '{layer}': {'ON' if enabled else 'OFF'}")
+                if event.key == pygame.K_HOME:
+                    self.game.camera.reset()
+                if event.key == pygame.K_F2:
+                    renderer = self.game.renderer
+                    renderer.set_dirty_rect_mode(not renderer.dirty_rect_mode)
+                    print(f"Dirty-rect rendering: {'ON' if renderer.dirty_rect_mode else 'OFF'}")
 
                 if event.key == pygame.K_c:
-                    self.game.object_manager.create_object('circle', self.mouse_pos)
+                    self.game.submit_command(self.game.object_manager.create_object_at, 'circle', self._to_world(self.mouse_pos))
                 if event.key == pygame.K_b:
-                    self.game.object_manager.create_object('box', self.mouse_pos)
+                    self.game.submit_command(self.game.object_manager.create_object_at, 'box', self._to_world(self.mouse_pos))
+                if event.key == pygame.K_e:
+                    self.game.submit_command(self.game.spawner.toggle_emitter_at, self._to_world(self.mouse_pos))
+                if event.key == pygame.K_f:
+                    self._flood_view()
+                if event.key == pygame.K_r:
+                    self.game.toggle_rewind()
             
             ui_handled = self.game.ui_manager.handle_event(event)
 
@@ -60,63 +86,134 @@ class InputManager:
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     self.mouse_pressed[event.button] = True
                     if event.button == 1:
-                        obj_to_drag = self.game.object_manager.get_object_at(self.mouse_pos)
-                        if obj_to_drag:
-                            self.game.object_manager.start_drag(obj_to_drag, self.mouse_pos)
-                        else:
-                            # Start portal creation, it implicitly stores the start_pos_pygame now
-                            self.game.portal_manager.start_portal_creation(self.mouse_pos)
-
+                        self.game.submit_command(self._on_left_press, self._to_world(event.pos))
                     elif event.button == 3:
-                        # --- MODIFIED: Right-click handling ---
-                        if self.game.portal_manager.creation_state['active']:
-                             self.game.portal_manager.cancel_portal_creation()
-                        else:
-                             obj_to_delete = self.game.object_manager.get_object_at(self.mouse_pos)
-                             if obj_to_delete:
-                                  self.game.object_manager.delete_object(obj_to_delete)
-                             else:
-                                  # --- ADDED: Check for portal deletion if no object found ---
-                                  # Use physics manager directly to query sensors
-                                  potential_portal = self.game.physics_manager.get_body_at_pygame_point(
-                                      self.mouse_pos, include_sensors=True
-                                  )
-                                  # Check if the result is actually a Portal instance
-                                  if isinstance(potential_portal, Portal):
-                                      # Found a portal, delete its pair
-                                      print(f"Input: Deleting portal pair {potential_portal.pair_id} via right-click.")
-                                      self.game.portal_manager.delete_portal_pair(potential_portal.pair_id)
-                                  # --- End of Added Portal Deletion Check ---
-                             
+                        self.game.submit_command(self._on_right_press, self._to_world(event.pos))
+
                 elif event.type == pygame.MOUSEBUTTONUP:
                     button = event.button
                     self.mouse_pressed[button] = False
                     if button == 1:
-                        if self.game.object_manager.selected_object:
-                            self.game.object_manager.stop_drag(apply_throw=True, mouse_vel_pygame=self.mouse_rel)
-                        elif self.game.portal_manager.creation_state['active']:
-                             # --- MODIFIED: Check minimum distance before finishing ---
-                             start_pos = self.game.portal_manager.creation_state.get('start_pos_pygame')
-                             end_pos = self.mouse_pos
-                             if start_pos:
-                                 dx = end_pos[0] - start_pos[0]
-                                 dy = end_pos[1] - start_pos[1]
-                                 # Use squared distance to avoid sqrt calculation
-                                 distance_sq = dx*dx + dy*dy
-                                 min_dist_sq = MIN_PORTAL_DRAG_DISTANCE ** 2
-
-                                 if distance_sq > min_dist_sq:
-                                     # Sufficient distance, finish creation
-                                     self.game.portal_manager.finish_portal_creation(end_pos)
-                                 else:
-                                     # Drag was too short, cancel silently or with a log
-                                     # print("Portal drag too short, creation cancelled.")
-                                     self.game.portal_manager.cancel_portal_creation()
-                             else:
-                                 # Should not happen if state is active, but cancel defensively
-                                 self.game.portal_manager.cancel_portal_creation()
-                             # --- End of Modified Minimum Distance Check ---
+                        rel_x, rel_y = self.mouse_rel
+                        throw_vel = (scalar_to_box2d(rel_x), -scalar_to_box2d(rel_y))
+                        self.game.submit_command(self._on_left_release, self._to_world(event.pos), throw_vel,
+                                                 scalar_to_box2d(MIN_PORTAL_DRAG_DISTANCE))
+
+                elif event.type == pygame.MOUSEWHEEL:
+                    # Zoom around the cursor
+                    self.game.camera.zoom_at(self.mouse_pos, CAMERA_ZOOM_STEP ** event.y)
 
             if event.type == pygame.MOUSEMOTION:
-                 if self.game.object_manager.mouse_joint:
-                      self.game.object_manager.update_drag(self.mouse_pos)
+                 if self.mouse_pressed.get(2):
+                      # Middle-button drag pans the view by the whole frame's motion
+                      self.game.camera.pan_pixels(-self.mouse_rel[0], -self.mouse_rel[1])
+                 if self.mouse_pressed.get(1):
+                      self.game.submit_command(self._on_drag_motion, self._to_world(self.mouse_pos))
+
+        self._pan_camera_with_keys()
+        self._scrub_rewind_with_keys()
+
+    def _pan_camera_with_keys(self):
+        """Pans the camera while arrow keys are held."""
+        keys = pygame.key.get_pressed()
+        dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+        dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+        if dx or dy:
+            step = CAMERA_PAN_SPEED * self.game.clock.get_time() / 1000.0
+            self.game.camera.pan_pixels(dx * step, dy * step)
+
+    def _scrub_rewind_with_keys(self):
+        """Steps through the rewind buffer while [ or ] is held (Shift for REWIND_SCRUB_FAST steps per frame)."""
+        rewind = self.game.rewind
+        if not rewind or rewind.cursor is None: return
+        keys = pygame.key.get_pressed()
+        direction = keys[pygame.K_RIGHTBRACKET] - keys[pygame.K_LEFTBRACKET]
+        if direction:
+            fast = pygame.key.get_mods() & pygame.KMOD_SHIFT
+            self.game.seek_rewind(direction * (REWIND_SCRUB_FAST if fast else 1))
+
+    def _flood_view(self):
+        """Fills the visible part of the world with SPAWN_FLOOD_COUNT objects in one frame."""
+        (x0, y0), (x1, y1) = self.game.camera.get_view_aabb()
+        bounds = self.game.physics_manager.world_bounds
+        if bounds:
+            margin = 1.0 # Meters kept clear of the walls
+            x0, y0 = max(x0, bounds[0] + margin), max(y0, bounds[1] + margin)
+            x1, y1 = min(x1, bounds[2] - margin), min(y1, bounds[3] - margin)
+        if x1 <= x0 or y1 <= y0: return
+        self.game.submit_command(self.game.spawner.flood, (x0, y0), (x1, y1), SPAWN_FLOOD_COUNT)
+
+    @staticmethod
+    def _to_world(pos_pygame):
+        """Screen -> world point as a plain tuple. Done here on the main thread, which owns the camera."""
+        position = to_box2d(pos_pygame)
+        return (position[0], position[1])
+
+    # --- World actions. Run via Game.submit_command, i.e. on the physics thread when it is enabled.
+    # They take world coordinates only: the camera is panned and zoomed by the main thread. ---
+
+    def _on_left_press(self, mouse_pos):
+        """Starts dragging the object under the cursor, or starts portal creation."""
+        obj_to_drag = self.game.object_manager.get_object_at_point(mouse_pos)
+        if obj_to_drag:
+            self.game.object_manager.start_drag(obj_to_drag, mouse_pos)
+        else:
+            # Start portal creation, it stores the snapped start_pos_box2d now
+            self.game.portal_manager.start_portal_creation(mouse_pos)
+
+    def _on_right_press(self, mouse_pos):
+        """Cancels portal creation, or deletes the object / portal pair under the cursor."""
+        # --- MODIFIED: Right-click handling ---
+        if self.game.portal_manager.creation_state['active']:
+             self.game.portal_manager.cancel_portal_creation()
+        else:
+             obj_to_delete = self.game.object_manager.get_object_at_point(mouse_pos)
+             if obj_to_delete:
+                  self.game.object_manager.delete_object(obj_to_delete)
+             else:
+                  # --- ADDED: Check for portal deletion if no object found ---
+                  # Use physics manager directly to query sensors
+                  potential_portal = self.game.physics_manager.get_body_at_point(
+                      mouse_pos, include_sensors=True
+                  )
+                  # Check if the result is actually a Portal instance
+                  if isinstance(potential_portal, Portal):
+                      # Found a portal, delete its pair
+                      print(f"Input: Deleting portal pair {potential_portal.pair_id} via right-click.")
+                      self.game.portal_manager.delete_portal_pair(potential_portal.pair_id)
+                  # --- End of Added Portal Deletion Check ---
+
+    def _on_left_release(self, mouse_pos, throw_vel, min_drag_distance):
+        """Throws a dragged object or finishes portal creation.
+
+        `throw_vel` and `min_drag_distance` are the frame's mouse motion and
+        MIN_PORTAL_DRAG_DISTANCE, already converted to meters by the caller.
+        """
+        if self.game.object_manager.selected_object:
+            self.game.object_manager.stop_drag(apply_throw=True, mouse_vel_box2d=throw_vel)
+        elif self.game.portal_manager.creation_state['active']:
+             # --- MODIFIED: Check minimum distance before finishing ---
+             start_pos = self.game.portal_manager.creation_state.get('start_pos_box2d')
+             end_pos = mouse_pos
+             if start_pos is not None:
+                 dx = end_pos[0] - start_pos[0]
+                 dy = end_pos[1] - start_pos[1]
+                 # Use squared distance to avoid sqrt calculation
+                 distance_sq = dx*dx + dy*dy
+                 min_dist_sq = min_drag_distance ** 2
+
+                 if distance_sq > min_dist_sq:
+                     # Sufficient distance, finish creation
+                     self.game.portal_manager.finish_portal_creation(end_pos)
+                 else:
+                     # Drag was too short, cancel silently or with a log
+                     # print("Portal drag too short, creation cancelled.")
+                     self.game.portal_manager.cancel_portal_creation()
+             else:
+                 # Should not happen if state is active, but cancel defensively
+                 self.game.portal_manager.cancel_portal_creation()
+             # --- End of Modified Minimum Distance Check ---
+
+    def _on_drag_motion(self, mouse_pos):
+        if self.game.object_manager.mouse_joint:
+            self.game.object_manager.update_drag(mouse_pos)
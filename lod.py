@@ -0,0 +1,119 @@
+import pygame
+from settings import (COLOR_GRID, COLOR_TEXT, LOD_POINT_MAX_RADIUS_PX, LOD_DENSITY_MIN_OBJECTS,
+                      LOD_DENSITY_TILE_PX, LOD_DENSITY_TILE_MIN_COUNT)
+try:
+    import numpy # Optional: vectorized point writes through surfarray
+except ImportError:
+    numpy = None
+
+DENSITY_RAMP_STEPS = 16
+
+class LevelOfDetail:
+    """Chooses how much detail each visible object gets, based on on-screen size and crowding.
+
+    - Objects whose on-screen radius is at most `point_max_radius_px` become
+      single pixels, written in one batch (surfarray with numpy, else PixelArray).
+    - When at least `density_min_objects` objects are visible, screen tiles
+      with `density_tile_min_count` or more objects are collapsed into one
+      shaded density rect. Their objects are not drawn individually.
+    Everything else is drawn normally (sprites).
+    """
+    def __init__(self):
+        self.enabled = True
+        self.point_max_radius_px = LOD_POINT_MAX_RADIUS_PX
+        self.density_min_objects = LOD_DENSITY_MIN_OBJECTS
+        self.density_tile_px = LOD_DENSITY_TILE_PX
+        self.density_tile_min_count = LOD_DENSITY_TILE_MIN_COUNT
+        self._density_ramp = [COLOR_GRID.lerp(COLOR_TEXT, (i + 1) / DENSITY_RAMP_STEPS)
+                              for i in range(DENSITY_RAMP_STEPS)]
+        self._mapped_colors = {} # color tuple -> mapped int for the target surface format
+        self.last_counts = {'full': 0, 'points': 0, 'tiles': 0}
+
+    def plan(self, objects, screen_size):
+        """Splits objects into (full_detail_objects, points, tiles).
+
+        points: [(x, y, color_key)], tiles: [(rect, object_count)].
+        """
+        if not self.enabled:
+            return objects, [], []
+        width, height = screen_size
+        small_radius = self.point_max_radius_px
+        collapse = len(objects) >= self.density_min_objects
+        tile = self.density_tile_px
+
+        entries = [] # (obj, x, y, is_point)
+        tile_counts = {}
+        for obj in objects:
+            if not obj.is_drawable():
+                continue
+            spec = obj.get_sprite_spec()
+            x, y = obj.get_pygame_pos()
+            if spec is None:
+                entries.append((obj, x, y, False))
+                continue
+            dims = spec[1]
+            radius_px = dims[0] if len(dims) == 1 else max(dims) / 2
+            entries.append((obj, x, y, radius_px <= small_radius))
+            if collapse:
+                key = (x // tile, y // tile)
+                tile_counts[key] = tile_counts.get(key, 0) + 1
+
+        dense = set()
+        tiles = []
+        if collapse:
+            min_count = self.density_tile_min_count
+            for key, count in tile_counts.items():
+                if count >= min_count:
+                    dense.add(key)
+                    tiles.append((pygame.Rect(key[0] * tile, key[1] * tile, tile, tile), count))
+
+        full, points = [], []
+        for obj, x, y, is_point in entries:
+            if dense and (x // tile, y // tile) in dense:
+                continue
+            if is_point:
+                if 0 <= x < width and 0 <= y < height:
+                    points.append((x, y, obj.color_key))
+            else:
+                full.append(obj)
+        self.last_counts = {'full': len(full), 'points': len(points), 'tiles': len(tiles)}
+        return full, points, tiles
+
+    def draw_points(self, surface, points):
+        """Writes one pixel per point in a single locked batch."""
+        if not points: return
+        if numpy is not None:
+            xs = numpy.fromiter((p[0] for p in points), dtype=numpy.intp, count=len(points))
+            ys = numpy.fromiter((p[1] for p in points), dtype=numpy.intp, count=len(points))
+            colors = numpy.fromiter((self._map(surface, p[2]) for p in points), dtype=numpy.int64, count=len(points))
+            pixels = pygame.surfarray.pixels2d(surface)
+            try:
+                pixels[xs, ys] = colors
+            finally:
+                del pixels # Unlocks the surface
+            return
+        pixel_array = pygame.PixelArray(surface)
+        try:
+            for x, y, color_key in points:
+                pixel_array[x, y] = self._map(surface, color_key)
+        finally:
+            pixel_array.close()
+
+    def draw_tiles(self, surface, tiles):
+        """Fills each dense tile with a shade proportional to its object count."""
+        if not tiles: return
+        ramp = self._density_ramp
+        scale = DENSITY_RAMP_STEPS / (self.density_tile_min_count * 4)
+        for rect, count in tiles:
+            surface.fill(ramp[min(DENSITY_RAMP_STEPS - 1, int(count * scale))], rect)
+
+    def _map(self, surface, color_key):
+        mapped = self._mapped_colors.get(color_key)
+        if mapped is None:
+            mapped = surface.map_rgb(color_key)
+            self._mapped_colors[color_key] = mapped
+        return mapped
+
+    def invalidate_surface_format(self):
+        """Call if the target surface's pixel format changes (e.g. display mode change)."""
+        self._mapped_colors.clear()
@@ -1,5 +1,8 @@
+import time
+_launch_time = time.perf_counter() # Start of the startup timings, before pygame/Box2D are imported
 import sys
 import os
+import argparse
 import traceback # Import traceback for detailed error reporting
 
 # --- Path Setup ---
@@ -21,7 +24,16 @@ except Exception as e:
     print(f"Warning: Error during path setup - {e}")
     # Continue anyway, hoping Python finds the modules
 
-# --- Import Game Class ---
+# --- Import Game Class (timed: pygame, Box2D and the game modules dominate cold start) ---
+from startup import StartupTimer
+startup_timer = StartupTimer(_launch_time)
+try:
+    import pygame
+    startup_timer.mark("import pygame")
+    import Box2D
+    startup_timer.mark("import Box2D")
+except ImportError:
+    pass # Reported below
 try:
     # Attempt to import using package structure (preferred)
     from game import Game
@@ -39,10 +51,42 @@ except Exception as e:
     print(f"FATAL ERROR: An unexpected error occurred importing Game class: {e}")
     traceback.print_exc()
     sys.exit(1)
+startup_timer.mark("import game modules")
+
+
+def parse_args(argv=None):
+    """Command line options; with none given the game runs interactively as before."""
+    parser = argparse.ArgumentParser(description="Portals2D - Minimalist Physics Sandbox")
+    parser.add_argument('--headless', action='store_true',
+                        help="Render offscreen without opening a window.")
+    parser.add_argument('--record', metavar='DIR',
+                        help="Write every frame to DIR as a PNG sequence.")
+    parser.add_argument('--encode', metavar='FILE',
+                        help="Pipe raw frames to the external encoder (CAPTURE_ENCODER_CMD) writing FILE.")
+    parser.add_argument('--fps', type=int, default=None,
+                        help="Fixed simulation/recording rate; frames are stepped at 1/FPS regardless of real time.")
+    parser.add_argument('--frames', type=int, default=None,
+                        help="Stop after this many frames.")
+    parser.add_argument('--threaded-physics', action='store_true',
+                        help="Step physics on a worker thread and render its snapshots.")
+    parser.add_argument('--rewind', action='store_true',
+                        help="Record recent history so R can pause and scrub back through it.")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="Print a breakdown of the startup time (imports, init phases, first frame) on exit.")
+    parser.add_argument('--control-port', type=int, metavar='PORT', default=None,
+                        help="Serve the JSON-RPC control interface on 127.0.0.1:PORT (0 picks a free port).")
+    parser.add_argument('--control-socket', metavar='PATH', default=None,
+                        help="Serve the JSON-RPC control interface on a Unix socket at PATH.")
+    parser.add_argument('--serve', type=int, metavar='PORT', default=None,
+                        help="Run the simulation headless (no window) and stream it to viewers on UDP PORT.")
+    parser.add_argument('--connect', metavar='HOST:PORT', default=None,
+                        help="Watch a --serve server instead of simulating locally.")
+    return parser.parse_args(argv)
 
 
 # --- Main Execution Guard ---
 if __name__ == '__main__':
+    args = parse_args()
     print("-" * 30)
     print(" Starting Portals2D ")
     print("-" * 30)
@@ -69,13 +113,52 @@ if __name__ == '__main__':
         print("Please install missing dependencies and try again.")
         sys.exit(1)
 
+    control_server = None
+    if args.control_port is not None or args.control_socket:
+        from control_server import ControlServer
+        control_server = ControlServer(port=args.control_port, socket_path=args.control_socket)
+
+    # --- Headless replication server: no pygame display, no Game ---
+    if args.serve is not None:
+        from replication import HeadlessServer
+        try:
+            server = HeadlessServer(args.serve, control_server=control_server, max_steps=args.frames)
+        except OSError as e:
+            print(f"ERROR: Could not open replication port {args.serve}: {e}")
+            sys.exit(1)
+        server.run()
+        sys.exit(0)
+
     # --- Run the Game ---
     main_game = None # Initialize to None
     try:
         # Instantiate the main game class
-        main_game = Game()
+        recorder = None
+        fixed_fps = args.fps
+        if args.record or args.encode:
+            from capture import FrameRecorder
+            from settings import WIDTH, HEIGHT, CAPTURE_FPS
+            fixed_fps = fixed_fps or CAPTURE_FPS # Recordings are always fixed-rate
+            recorder = FrameRecorder((WIDTH, HEIGHT), output_dir=args.record,
+                                     encoder_output=args.encode, fps=fixed_fps)
+        game_options = {}
+        if args.threaded_physics:
+            game_options['threaded_physics'] = True
+        if args.rewind:
+            game_options['rewind'] = True
+        if control_server:
+            game_options['control_server'] = control_server
+        if args.connect:
+            from replication import ReplicationClient
+            host, _, port = args.connect.rpartition(':')
+            game_options['replica'] = ReplicationClient(host or '127.0.0.1', int(port))
+        main_game = Game(headless=args.headless, recorder=recorder,
+                         fixed_fps=fixed_fps, max_frames=args.frames,
+                         startup_timer=startup_timer, **game_options)
         # Run the game loop (blocking call until game exits)
         main_game.run()
+        if args.startup_report:
+            print(main_game.startup.report())
 
     except Exception as e:
         # Catch any unexpected errors during game initialization or runtime
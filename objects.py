@@ -1,22 +1,23 @@
-import pygame
 import Box2D # For b2Vec2
 import math
+from collections.abc import Sequence
 from settings import (PPM, to_pygame, to_box2d, scalar_to_pygame, scalar_to_box2d,
-                      COLOR_CIRCLE, COLOR_SQUARE, COLOR_TRIANGLE,
+                      COLOR_CIRCLE, COLOR_SQUARE, COLOR_TRIANGLE, COLOR_OBJECT_DEFAULT,
                       DEFAULT_CIRCLE_RADIUS, DEFAULT_BOX_SIZE,
                       COLOR_BACKGROUND) # Add COLOR_TRIANGLE
-from utils import get_body_vertices_pygame
+from physics import get_body_vertices_pygame
 
 class GameObject:
     """Base class for objects in the game."""
     _id_counter = 0
-    def __init__(self, shape_type, position_box2d, angle_rad=0.0, color=pygame.Color("gray")):
+    def __init__(self, shape_type, position_box2d, angle_rad=0.0, color=COLOR_OBJECT_DEFAULT):
         self.id = GameObject._id_counter
         GameObject._id_counter += 1
         self.shape_type = shape_type
         self.position = Box2D.b2Vec2(position_box2d)
         self.angle = angle_rad
         self.color = color
+        self.color_key = tuple(color) # Hashable form of the color for sprite lookup
         self.body = None
         self.teleporting = False
         self.marked_for_deletion = False
@@ -32,13 +33,34 @@ class GameObject:
     def draw(self, surface, renderer):
         """Placeholder draw method - subclasses should implement."""
         if self.body and not self.marked_for_deletion and not self.teleporting:
-            pos_pygame = to_pygame(self.position)
-            pygame.draw.circle(surface, self.color, pos_pygame, 5)
+            renderer.draw_dot(surface, self.color, to_pygame(self.position), 5)
 
     def get_pygame_pos(self):
         """Returns the center position in Pygame coordinates."""
         return to_pygame(self.position)
 
+    def is_drawable(self):
+        return bool(self.body) and not self.marked_for_deletion and not self.teleporting
+
+    def get_sprite_spec(self):
+        """(shape, pixel dims, color tuple) used as the SpriteAtlas key, or None if not sprite-drawn."""
+        return None
+
+    def get_bounding_radius(self):
+        """Radius (meters) of a circle enclosing the shape at any rotation."""
+        return 5 / PPM
+
+    def get_screen_rect(self):
+        """Screen-space (x, y, w, h) bounds of what draw() touches, or None when nothing is drawn."""
+        if not self.body or self.marked_for_deletion or self.teleporting:
+            return None
+        x, y = to_pygame(self.position)
+        r = scalar_to_pygame(self.get_bounding_radius()) + 2 # Margin for rounding/outline
+        return (x - r, y - r, 2 * r, 2 * r)
+
+    def is_awake(self):
+        return bool(self.body and self.body.awake)
+
     def schedule_deletion(self):
         """Marks the object for deletion and tells physics manager to remove body."""
         self.marked_for_deletion = True
@@ -50,8 +72,18 @@ class Circle(GameObject):
         super().__init__('circle', position_box2d, angle_rad, color)
         self.radius = radius
 
+    def get_bounding_radius(self):
+        return self.radius
+
+    def get_sprite_spec(self):
+        # Pixel size follows the camera zoom, so the spec is rebuilt rather than cached
+        return ('circle', (scalar_to_pygame(self.radius),), self.color_key)
+
     def draw(self, surface, renderer):
         if self.body and not self.marked_for_deletion and not self.teleporting:
+            if renderer.sprite_atlas is not None:
+                renderer.draw_sprite(surface, self)
+                return
             pos_pygame = to_pygame(self.position)
             radius_pygame = scalar_to_pygame(self.radius)
             renderer.draw_circle(surface, self.color, pos_pygame, radius_pygame, self.angle)
@@ -61,35 +93,133 @@ class Box(GameObject):
         super().__init__('box', position_box2d, angle_rad, color)
         self.size = size
 
+    def get_bounding_radius(self):
+        return math.hypot(self.size[0], self.size[1]) / 2
+
+    def get_sprite_spec(self):
+        dims = (scalar_to_pygame(self.size[0]), scalar_to_pygame(self.size[1]))
+        return ('box', dims, self.color_key)
+
     def draw(self, surface, renderer):
         if self.body and not self.marked_for_deletion and not self.teleporting:
+            if renderer.sprite_atlas is not None:
+                renderer.draw_sprite(surface, self)
+                return
             vertices_pygame = get_body_vertices_pygame(self.body)
             if vertices_pygame:
                  renderer.draw_polygon(surface, self.color, vertices_pygame)
             else:
                  pos_pygame = to_pygame(self.position)
                  size_pygame = (scalar_to_pygame(self.size[0]), scalar_to_pygame(self.size[1]))
-                 pygame.draw.rect(surface, self.color, (*pos_pygame, *size_pygame))
+                 renderer.draw_rect(surface, self.color, (*pos_pygame, *size_pygame))
+
+
+class ObjectListView(Sequence):
+    """Read-only view over the store's dense object list (no copy)."""
+    __slots__ = ('_items',)
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class ObjectStore:
+    """Objects keyed by id with a dense iteration order.
+
+    Membership is an O(1) dict lookup, removal is an O(1) swap-remove, and
+    objects scheduled for deletion are tracked separately so that flushing
+    them costs nothing on frames where nothing was deleted.
+    """
+    def __init__(self):
+        self._items = []
+        self._index = {} # obj.id -> position in _items
+        self._pending_removal = []
+        self._view = ObjectListView(self._items)
+        self.version = 0 # Bumped whenever the set or order of stored objects changes
+
+    def add(self, game_object):
+        self._index[game_object.id] = len(self._items)
+        self._items.append(game_object)
+        self.version += 1
+
+    def get(self, obj_id):
+        idx = self._index.get(obj_id)
+        return self._items[idx] if idx is not None else None
+
+    def remove(self, game_object):
+        """Swap-removes an object immediately. Returns False if it was not stored."""
+        idx = self._index.pop(game_object.id, None)
+        if idx is None: return False
+        self.version += 1
+        last = self._items.pop()
+        if last is not game_object:
+            self._items[idx] = last
+            self._index[last.id] = idx
+        return True
+
+    def mark_removed(self, game_object):
+        """Queues an object for removal on the next flush."""
+        self._pending_removal.append(game_object)
+        self.version += 1
+
+    @property
+    def dirty(self):
+        return bool(self._pending_removal)
+
+    def flush(self):
+        """Removes all queued objects. Returns the number removed."""
+        if not self._pending_removal: return 0
+        removed = 0
+        for game_object in self._pending_removal:
+            if self.remove(game_object):
+                removed += 1
+        self._pending_removal.clear()
+        return removed
+
+    def view(self):
+        return self._view
+
+    def __contains__(self, game_object):
+        idx = self._index.get(game_object.id)
+        return idx is not None and self._items[idx] is game_object
+
+    def __len__(self):
+        return len(self._items)
 
 
 class ObjectManager:
     def __init__(self, physics_manager):
-        self.objects = []
+        self.store = ObjectStore()
         self.physics_manager = physics_manager
         self.selected_object = None
         self.mouse_joint = None
         
+    @property
+    def objects(self):
+         """Read-only view of live objects, in the store's dense order."""
+         return self.store.view()
+
     def set_physics_manager(self, manager):
          """Allows setting physics manager after initialization if needed."""
          self.physics_manager = manager
 
     def create_object(self, obj_type, position_pygame, angle_rad=0.0):
         """Creates, adds to list, and creates physics body for a new game object."""
+        return self.create_object_at(obj_type, to_box2d(position_pygame), angle_rad)
+
+    def create_object_at(self, obj_type, position_box2d, angle_rad=0.0):
+        """World-space create_object, for queued input commands (no camera read off the main thread)."""
         if not self.physics_manager:
              print("Error: PhysicsManager not set in ObjectManager.")
              return None
 
-        position_box2d = to_box2d(position_pygame)
         obj = None
         if obj_type == 'circle':
             obj = Circle(position_box2d, angle_rad=angle_rad)
@@ -97,18 +227,49 @@ class ObjectManager:
              obj = Box(position_box2d, angle_rad=angle_rad)
 
         if obj:
-            self.objects.append(obj)
+            self.store.add(obj)
             body_created = self.physics_manager.add_object(obj)
             if not body_created:
                  print(f"Warning: Failed to create physics body for new {obj_type}. Removing object.")
-                 self.objects.remove(obj)
+                 self.store.remove(obj)
                  return None
         return obj
 
+    def create_objects(self, specs, ids=None):
+        """Bulk version of create_object for spawners. Positions are already in world units.
+
+        `specs` is an iterable of (obj_type, position_box2d, angle_rad, velocity_box2d).
+        `ids`, if given, holds one object id per spec to reuse instead of new ones
+        (rewind brings deleted objects back under their old ids). Returns the created objects.
+        """
+        if not self.physics_manager:
+             print("Error: PhysicsManager not set in ObjectManager.")
+             return []
+
+        new_objects = []
+        velocities = []
+        for index, (obj_type, position_box2d, angle_rad, velocity) in enumerate(specs):
+            if obj_type == 'circle':
+                obj = Circle(position_box2d, angle_rad=angle_rad)
+            elif obj_type == 'box':
+                obj = Box(position_box2d, angle_rad=angle_rad)
+            else:
+                continue
+            if ids is not None:
+                obj.id = ids[index]
+            new_objects.append(obj)
+            velocities.append(velocity)
+
+        created = self.physics_manager.add_objects(new_objects, velocities)
+        for obj in created:
+            self.store.add(obj)
+        return created
+
     def delete_object(self, game_object):
         """Schedules an object and its physics body for deletion."""
-        if game_object and game_object in self.objects and not game_object.marked_for_deletion:
+        if game_object and game_object in self.store and not game_object.marked_for_deletion:
             game_object.schedule_deletion()
+            self.store.mark_removed(game_object)
             if game_object.body:
                 self.physics_manager.destroy_body(game_object.body)
 
@@ -116,22 +277,31 @@ class ObjectManager:
                 self.stop_drag()
 
     def cleanup_deleted_objects(self):
-        """Removes objects marked for deletion from the main list."""
-        live_objects = [obj for obj in self.objects if not obj.marked_for_deletion]
-        deleted_count = len(self.objects) - len(live_objects)
-        if deleted_count > 0:
-            pass
-        self.objects = live_objects
+        """Removes objects marked for deletion from the store. No-op on quiet frames."""
+        if not self.store.dirty: return 0
+        return self.store.flush()
 
     def get_object_at(self, pos_pygame):
         """Finds a dynamic object at Pygame coordinates using physics query."""
+        return self.get_object_at_point(to_box2d(pos_pygame))
+
+    def get_object_at_point(self, pos_box2d):
+        """Finds a dynamic object at a world-space point."""
         if not self.physics_manager: return None
-        found = self.physics_manager.get_body_at_pygame_point(pos_pygame, include_sensors=False)
+        found = self.physics_manager.get_body_at_point(pos_box2d, include_sensors=False)
         if isinstance(found, GameObject):
              return found
         return None
 
-    def start_drag(self, game_object, mouse_pos_pygame):
+    def delete_objects_in_rect(self, rect_pygame):
+        """Deletes every object whose shape overlaps a Pygame-space rectangle. Returns the count."""
+        if not self.physics_manager: return 0
+        targets = self.physics_manager.get_objects_in_pygame_rect(rect_pygame)
+        for game_object in targets:
+            self.delete_object(game_object)
+        return len(targets)
+
+    def start_drag(self, game_object, mouse_pos_box2d):
         """Initiates dragging of an object using a Box2D mouse joint."""
         if not self.physics_manager or not self.physics_manager.world: return
         if game_object and game_object.body and not self.mouse_joint:
@@ -147,8 +317,6 @@ class ObjectManager:
                  ground_body = self.physics_manager.world.CreateStaticBody(position=(0,0))
                  self.physics_manager.world.groundBody = ground_body
 
-            mouse_pos_box2d = to_box2d(mouse_pos_pygame)
-
             try:
                 joint_def = Box2D.b2MouseJointDef(
                     bodyA=ground_body,
@@ -166,17 +334,19 @@ class ObjectManager:
                  self.mouse_joint = None
                  self.selected_object = None
 
-    def update_drag(self, mouse_pos_pygame):
-        """Updates the target of the active mouse joint."""
+    def update_drag(self, mouse_pos_box2d):
+        """Updates the target of the active mouse joint (world coordinates)."""
         if self.mouse_joint:
-            mouse_pos_box2d = to_box2d(mouse_pos_pygame)
             try:
                 self.mouse_joint.target = mouse_pos_box2d
             except Exception as e:
                  print(f"Error updating mouse joint target: {e}")
 
-    def stop_drag(self, apply_throw=False, mouse_vel_pygame=(0,0)):
-        """Stops dragging, destroys the mouse joint, optionally applies throw impulse."""
+    def stop_drag(self, apply_throw=False, mouse_vel_box2d=(0,0)):
+        """Stops dragging, destroys the mouse joint, optionally applies throw impulse.
+
+        `mouse_vel_box2d` is the cursor's motion converted to meters (y up) by the caller.
+        """
         if not self.physics_manager or not self.mouse_joint:
              self.selected_object = None
              return
@@ -194,17 +364,15 @@ class ObjectManager:
         if apply_throw and current_dragged_object and current_dragged_object.body:
             mass = current_dragged_object.body.mass
             throw_factor = 0.1
-            impulse_pygame_x = mouse_vel_pygame[0] * throw_factor * mass
-            impulse_pygame_y = mouse_vel_pygame[1] * throw_factor * mass
-            throw_impulse_pygame = (impulse_pygame_x, impulse_pygame_y)
-
-            if abs(throw_impulse_pygame[0]) > 0.1 or abs(throw_impulse_pygame[1]) > 0.1:
-                 mouse_pos_pygame = pygame.mouse.get_pos()
-                 center_pygame = current_dragged_object.get_pygame_pos()
-                 self.physics_manager.apply_impulse_to_object(
+            throw_impulse = (mouse_vel_box2d[0] * throw_factor * mass,
+                             mouse_vel_box2d[1] * throw_factor * mass)
+
+            min_impulse = 0.1 / PPM # A tenth of a pixel-impulse at the default zoom
+            if abs(throw_impulse[0]) > min_impulse or abs(throw_impulse[1]) > min_impulse:
+                 self.physics_manager.apply_impulse(
                       current_dragged_object,
-                      throw_impulse_pygame,
-                      center_pygame
+                      throw_impulse,
+                      current_dragged_object.body.position
                  )
 
     def update(self, dt):
@@ -212,8 +380,12 @@ class ObjectManager:
         self.cleanup_deleted_objects()
 
     def get_objects(self):
-         """Returns a copy of the objects list for safe iteration."""
-         return list(self.objects)
+         """Returns a read-only view of the objects. Copy it before creating or
+         deleting objects while iterating."""
+         return self.store.view()
+
+    def get_object_by_id(self, obj_id):
+         return self.store.get(obj_id)
 
     def get_count(self):
-         return len(self.objects)
\ No newline at end of file
+         return len(self.store)
\ No newline at end of file
@@ -0,0 +1,225 @@
+import math
+from collections import deque
+import pygame
+from settings import (PPM, HEIGHT, COLOR_BACKGROUND, COLOR_TEXT, PARTICLE_CAPACITY, PARTICLE_SOFT_LIMIT,
+                      PARTICLE_TELEPORT_BURST, PARTICLE_AMBIENT_RATE, PARTICLE_LIFETIME,
+                      PARTICLE_SPEED, PARTICLE_DAMPING, PARTICLE_SIZE_PX, get_active_camera)
+try:
+    import numpy # Required: particle state lives in preallocated arrays
+except ImportError:
+    numpy = None
+
+PARTICLES_AVAILABLE = numpy is not None
+MAX_PALETTE_COLORS = 256
+
+class ParticleSystem:
+    """Pooled, NumPy-backed particles for portal and teleport effects.
+
+    Live particles are packed at the front of preallocated arrays (position and
+    velocity in meters, age, lifetime, palette index), so integration, expiry
+    and projection are whole-array operations and spawning only writes into the
+    free tail. `cap` (at most `capacity`) can be lowered at runtime. Above
+    `soft_limit` of the cap, ambient emission stops and teleport bursts shrink
+    to the room left, so a teleport storm never costs more than drawing `cap`
+    particles. Teleport events may arrive from the physics thread; they are
+    queued and emitted on the next `update`.
+    """
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.cap = capacity
+        self.soft_limit = PARTICLE_SOFT_LIMIT
+        self.count = 0
+        self.position = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.velocity = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.age = numpy.zeros(capacity, dtype=numpy.float32)
+        self.lifetime = numpy.ones(capacity, dtype=numpy.float32)
+        self.color_index = numpy.zeros(capacity, dtype=numpy.uint8)
+        self._palette = [] # RGB tuples, indexed by color_index
+        self._palette_index = {}
+        self._portal_shades = {} # portal color -> darker particle color
+        self._palette_array = numpy.zeros((1, 3), dtype=numpy.float32)
+        self._background = numpy.array(tuple(COLOR_BACKGROUND)[:3], dtype=numpy.float32)
+        self._rng = numpy.random.default_rng(seed) # Seeded so recordings are reproducible
+        self._bursts = deque() # Queued teleport events; append/popleft are thread-safe
+        self._ambient_accumulator = 0.0
+        self.dropped = 0 # Particles not spawned because of the cap (for the debug overlay)
+
+    def set_cap(self, cap):
+        """Changes the live particle limit. Drops the oldest particles if over it."""
+        self.cap = max(0, min(self.capacity, int(cap)))
+        if self.count > self.cap:
+            drop = self.count - self.cap
+            self._keep(numpy.arange(drop, self.count))
+
+    def clear(self):
+        self.count = 0
+        self._bursts.clear()
+
+    # --- Emitters ---
+
+    def on_teleport(self, obj, entry_portal, exit_portal, entry_pos, exit_pos):
+        """PortalManager teleport listener: a burst at both portal mouths."""
+        self._bursts.append((entry_pos, self._portal_color(entry_portal.color)))
+        self._bursts.append((exit_pos, getattr(obj, 'color', exit_portal.color)))
+
+    def _room(self, wanted, ambient=False):
+        """How many of `wanted` particles may spawn now, degrading as the pool fills up."""
+        free = self.cap - self.count
+        if free <= 0 or wanted <= 0:
+            return 0
+        soft = int(self.cap * self.soft_limit)
+        if self.count >= soft:
+            if ambient:
+                return 0
+            # Scale bursts by the share of the reserve that is still free
+            wanted = int(math.ceil(wanted * free / max(1, self.cap - soft)))
+        return min(wanted, free)
+
+    def _emit_burst(self, pos, color):
+        n = self._room(PARTICLE_TELEPORT_BURST)
+        self.dropped += PARTICLE_TELEPORT_BURST - n
+        if not n: return
+        rng = self._rng
+        angles = rng.uniform(0.0, 2 * math.pi, n)
+        speeds = rng.uniform(0.3, 1.0, n) * PARTICLE_SPEED
+        velocity = numpy.stack((numpy.cos(angles) * speeds, numpy.sin(angles) * speeds), axis=1)
+        position = numpy.empty((n, 2), dtype=numpy.float32)
+        position[:, 0] = pos[0]
+        position[:, 1] = pos[1]
+        self._spawn(position, velocity, rng.uniform(0.5, 1.0, n) * PARTICLE_LIFETIME, self._color(color))
+
+    def _emit_ambient(self, portals, dt):
+        """Slow drift out of both faces of every portal, PARTICLE_AMBIENT_RATE per portal per second."""
+        if not portals:
+            self._ambient_accumulator = 0.0
+            return
+        self._ambient_accumulator += PARTICLE_AMBIENT_RATE * dt * len(portals)
+        wanted = int(self._ambient_accumulator)
+        self._ambient_accumulator -= wanted
+        n = self._room(wanted, ambient=True)
+        if not n: return
+        rng = self._rng
+        chosen = rng.integers(0, len(portals), n)
+        px = numpy.empty(n, dtype=numpy.float32)
+        py = numpy.empty(n, dtype=numpy.float32)
+        angle = numpy.empty(n, dtype=numpy.float32)
+        half_height = numpy.empty(n, dtype=numpy.float32)
+        colors = numpy.empty(n, dtype=numpy.uint8)
+        for i, index in enumerate(chosen):
+            portal = portals[index]
+            px[i], py[i] = portal.position[0], portal.position[1]
+            angle[i] = portal.angle
+            half_height[i] = portal.size[1] / 2
+            colors[i] = self._color(self._portal_color(portal.color))
+        c, s = numpy.cos(angle), numpy.sin(angle)
+        # Local frame: x is the portal normal, y runs along its mouth
+        along = rng.uniform(-1.0, 1.0, n) * half_height
+        side = numpy.where(rng.random(n) < 0.5, -1.0, 1.0)
+        normal_speed = side * rng.uniform(0.1, 0.3, n) * PARTICLE_SPEED
+        drift = rng.uniform(-0.05, 0.05, n) * PARTICLE_SPEED
+        position = numpy.stack((px - s * along, py + c * along), axis=1)
+        velocity = numpy.stack((c * normal_speed - s * drift, s * normal_speed + c * drift), axis=1)
+        self._spawn(position, velocity, rng.uniform(0.6, 1.0, n) * PARTICLE_LIFETIME * 1.5, colors)
+
+    def _spawn(self, position, velocity, lifetime, color_index):
+        start = self.count
+        end = start + len(position)
+        self.position[start:end] = position
+        self.velocity[start:end] = velocity
+        self.age[start:end] = 0.0
+        self.lifetime[start:end] = lifetime
+        self.color_index[start:end] = color_index
+        self.count = end
+
+    def _portal_color(self, color):
+        """Portal colors are pale pastels; darken them so their particles show on the background."""
+        key = tuple(color)
+        shade = self._portal_shades.get(key)
+        if shade is None:
+            shade = self._portal_shades[key] = tuple(pygame.Color(*key).lerp(COLOR_TEXT, 0.4))
+        return shade
+
+    def _color(self, color):
+        key = tuple(color)[:3]
+        index = self._palette_index.get(key)
+        if index is None:
+            if len(self._palette) >= MAX_PALETTE_COLORS:
+                return 0
+            index = len(self._palette)
+            self._palette.append(key)
+            self._palette_index[key] = index
+            self._palette_array = numpy.array(self._palette, dtype=numpy.float32)
+        return index
+
+    # --- Simulation ---
+
+    def update(self, dt, portals=()):
+        """Emits queued bursts and ambient particles, then integrates and expires the pool."""
+        while self._bursts:
+            pos, color = self._bursts.popleft()
+            self._emit_burst(pos, color)
+        self._emit_ambient(portals, dt)
+
+        n = self.count
+        if not n: return
+        velocity = self.velocity[:n]
+        velocity *= math.exp(-PARTICLE_DAMPING * dt)
+        self.position[:n] += velocity * dt
+        self.age[:n] += dt
+        alive = self.age[:n] < self.lifetime[:n]
+        if not alive.all():
+            self._keep(numpy.flatnonzero(alive))
+
+    def _keep(self, indices):
+        """Packs the particles at `indices` (ascending) to the front of the arrays."""
+        n = len(indices)
+        for array in (self.position, self.velocity, self.age, self.lifetime, self.color_index):
+            array[:n] = array[indices]
+        self.count = n
+
+    # --- Rendering ---
+
+    def _projection(self):
+        camera = get_active_camera()
+        if camera is not None:
+            return camera.scale, camera.offset_x, camera.offset_y, camera.screen_height
+        return PPM, 0.0, 0.0, HEIGHT
+
+    def _screen_coords(self):
+        scale, offset_x, offset_y, screen_height = self._projection()
+        n = self.count
+        xs = ((self.position[:n, 0] - offset_x) * scale).astype(numpy.intp)
+        ys = (screen_height - (self.position[:n, 1] - offset_y) * scale).astype(numpy.intp)
+        return xs, ys
+
+    def get_screen_rect(self):
+        """Screen bounds of all live particles (for dirty-rect tracking), or None."""
+        if not self.count: return None
+        xs, ys = self._screen_coords()
+        x0, y0 = int(xs.min()), int(ys.min())
+        return pygame.Rect(x0, y0, int(xs.max()) - x0 + PARTICLE_SIZE_PX, int(ys.max()) - y0 + PARTICLE_SIZE_PX)
+
+    def draw(self, surface, renderer=None):
+        """Writes every particle as a small square in one locked batch, fading toward the background."""
+        if not self.count: return
+        n = self.count
+        xs, ys = self._screen_coords()
+        fade = (self.age[:n] / self.lifetime[:n])[:, None]
+        rgb = (self._palette_array[self.color_index[:n]] * (1.0 - fade) + self._background * fade).astype(numpy.uint8)
+
+        clip = surface.get_clip()
+        x0, y0, x1, y1 = clip.left, clip.top, clip.right, clip.bottom
+        try:
+            pixels = pygame.surfarray.pixels3d(surface)
+        except (ValueError, pygame.error):
+            for x, y, color in zip(xs, ys, rgb): # Surface format without a 3D pixel view
+                surface.fill(tuple(color), (int(x), int(y), PARTICLE_SIZE_PX, PARTICLE_SIZE_PX))
+            return
+        try:
+            for dx in range(PARTICLE_SIZE_PX):
+                for dy in range(PARTICLE_SIZE_PX):
+                    px, py = xs + dx, ys + dy
+                    inside = (px >= x0) & (px < x1) & (py >= y0) & (py < y1)
+                    pixels[px[inside], py[inside]] = rgb[inside]
+        finally:
+            del pixels # Unlocks the surface
@@ -2,17 +2,71 @@ import Box2D
 import math
 from settings import (PPM, TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS,
                       GRAVITY, USER_DATA_OBJECT, USER_DATA_PORTAL, USER_DATA_WALL,
-                      DEFAULT_PORTAL_WIDTH, DEFAULT_PORTAL_HEIGHT,
-                      to_box2d)
-from utils import is_sensor
+                      DEFAULT_PORTAL_WIDTH, DEFAULT_PORTAL_HEIGHT, PORTAL_SURFACE_CELL,
+                      to_pygame, to_box2d, scalar_to_box2d)
+from ghosts import GhostPool
+
+def get_body_vertices_pygame(body):
+    """Gets world vertices of a polygon body in Pygame coordinates."""
+    vertices_pygame = []
+    if not body: return vertices_pygame
+
+    for fixture in body.fixtures:
+        shape = fixture.shape
+        # Check if it's a polygon shape
+        if hasattr(shape, 'vertices') and isinstance(shape.vertices, (list, tuple)):
+            try:
+                # Transform vertices from local body coordinates to world coordinates
+                vertices_box2d = [(body.transform * v) for v in shape.vertices]
+                # Convert world coordinates (meters) to Pygame coordinates (pixels)
+                vertices_pygame = [to_pygame(v) for v in vertices_box2d]
+                # Assuming the first polygon fixture defines the renderable shape
+                break
+            except Exception as e:
+                 print(f"Error transforming vertices for body {body}: {e}")
+                 return [] # Return empty on error
+    return vertices_pygame
+
+def is_sensor(fixture):
+    """Safely checks if a Box2D fixture is a sensor, handling different Box2D-py API versions."""
+    try:
+        # Try property access (older Box2D-py versions)
+        return fixture.isSensor
+    except AttributeError:
+        try:
+            # Try method call (some Box2D-py versions)
+            return fixture.IsSensor()
+        except AttributeError:
+            try:
+                # Try fixture def property with different casing
+                return fixture.sensor
+            except AttributeError:
+                # If all checks fail, use getters if available
+                try:
+                    return fixture.GetFilterData().isSensor
+                except:
+                    # Last resort - check through userData if available
+                    if hasattr(fixture, 'userData') and fixture.userData and isinstance(fixture.userData, dict):
+                        return fixture.userData.get('isSensor', False)
+                    # If all checks fail, assume it's not a sensor
+                    print(f"Warning: Could not determine if fixture is sensor: {fixture}")
+                    return False
+
 
 class PortalContactListener(Box2D.b2ContactListener):
-    """Listens for collisions, specifically involving portals."""
+    """Listens for collisions, specifically involving portals.
+
+    Box2D calls these in the middle of a step, with the world locked, so they
+    only record which objects overlap which portal sensors. PortalManager acts
+    on that after the step.
+    """
     def __init__(self, portal_manager):
         super(PortalContactListener, self).__init__()
         self.portal_manager = portal_manager
 
-    def BeginContact(self, contact):
+    @staticmethod
+    def _portal_and_object(contact):
+        """(portal, object) for a contact between a portal sensor and a dynamic object, else (None, None)."""
         fixture_a = contact.fixtureA
         fixture_b = contact.fixtureB
         body_a = fixture_a.body
@@ -21,41 +75,311 @@ class PortalContactListener(Box2D.b2ContactListener):
         user_data_a = body_a.userData if body_a.userData else {}
         user_data_b = body_b.userData if body_b.userData else {}
 
-        portal = None
-        obj = None
-        portal_fixture = None
-        obj_fixture = None
-
         if is_sensor(fixture_a) and user_data_a.get('type') == USER_DATA_PORTAL \
            and body_b.type == Box2D.b2_dynamicBody and user_data_b.get('type') == USER_DATA_OBJECT:
-            portal = user_data_a.get('portal_instance')
-            obj = user_data_b.get('object_instance')
-            portal_fixture = fixture_a
-            obj_fixture = fixture_b
+            return user_data_a.get('portal_instance'), user_data_b.get('object_instance')
         elif is_sensor(fixture_b) and user_data_b.get('type') == USER_DATA_PORTAL \
              and body_a.type == Box2D.b2_dynamicBody and user_data_a.get('type') == USER_DATA_OBJECT:
-            portal = user_data_b.get('portal_instance')
-            obj = user_data_a.get('object_instance')
-            portal_fixture = fixture_b
-            obj_fixture = fixture_a
+            return user_data_b.get('portal_instance'), user_data_a.get('object_instance')
+        return None, None
 
+    def BeginContact(self, contact):
+        portal, obj = self._portal_and_object(contact)
         if portal and obj and portal.linked_portal and obj.body:
-            portal_center_world = portal.body.worldCenter
-            object_center_world = obj.body.worldCenter
-            relative_pos = object_center_world - portal_center_world
-            relative_vel = obj.body.GetLinearVelocityFromWorldPoint(object_center_world)
-
-            dot_product = relative_pos.dot(relative_vel)
-            
-            last_exit_pos = getattr(portal.linked_portal, 'last_exit_pos', {}).get(obj.id)
-            
-            if last_exit_pos:
-                distance_from_exit = (object_center_world - last_exit_pos).length
-                if distance_from_exit < 0.5:
-                    return
-            
-            if dot_product < 0:
-                self.portal_manager.queue_teleportation(obj, portal)
+            self.portal_manager.begin_straddle(obj, portal)
+
+    def EndContact(self, contact):
+        portal, obj = self._portal_and_object(contact)
+        if portal and obj:
+            self.portal_manager.end_straddle(obj, portal)
+
+
+class WallPortalContactListener(PortalContactListener):
+    """PortalContactListener that also lets objects through the wall behind a wall-mounted portal.
+
+    Box2D calls PreSolve for every touching contact on every step, so
+    PhysicsManager only installs this listener while something is near such a
+    portal (PortalManager.wall_portals_in_use).
+    """
+    def PreSolve(self, contact, old_manifold):
+        body_a = contact.fixtureA.body
+        body_b = contact.fixtureB.body
+        if body_a.type == Box2D.b2_staticBody:
+            wall, other = body_a, body_b
+        elif body_b.type == Box2D.b2_staticBody:
+            wall, other = body_b, body_a
+        else:
+            return # Object/object contacts, the bulk of them
+        if other.type != Box2D.b2_dynamicBody or not wall.userData or wall.userData.get('type') != USER_DATA_WALL:
+            return
+        count = contact.manifold.pointCount
+        if count and self.portal_manager.in_wall_mouth(contact.worldManifold.points[:count]):
+            contact.enabled = False # Only for this step; Box2D re-enables contacts before each PreSolve
+
+
+def describe_body_geometry(body):
+    """Snapshot of a body's fixtures for debug drawing, read once instead of every frame.
+
+    Returns (is_dynamic, bounding_radius, fixtures) where fixtures is a tuple of
+    ('polygon', is_sensor, local_vertices) or ('circle', is_sensor, (x, y, r)).
+    Shapes are never edited after creation here, so the snapshot stays valid
+    until the body is destroyed.
+    """
+    fixtures = []
+    radius = 0.0
+    for fixture in body.fixtures:
+        shape = fixture.shape
+        sensor = bool(is_sensor(fixture))
+        if isinstance(shape, Box2D.b2PolygonShape):
+            vertices = tuple((v[0], v[1]) for v in shape.vertices)
+            fixtures.append(('polygon', sensor, vertices))
+            radius = max([radius] + [math.hypot(x, y) for x, y in vertices])
+        elif isinstance(shape, Box2D.b2CircleShape):
+            x, y = shape.pos[0], shape.pos[1]
+            fixtures.append(('circle', sensor, (x, y, shape.radius)))
+            radius = max(radius, math.hypot(x, y) + shape.radius)
+    return body.type == Box2D.b2_dynamicBody, radius, tuple(fixtures)
+
+
+class _FixtureQueryCallback(Box2D.b2QueryCallback):
+    """Reusable AABB query callback collecting distinct bodies (optionally point-tested)."""
+    def __init__(self):
+        super(_FixtureQueryCallback, self).__init__()
+        self.bodies = []
+        self._seen = set()
+        self.reset()
+
+    def reset(self, include_sensors=False, point=None, first_only=False):
+        self.include_sensors = include_sensors
+        self.point = point
+        self.first_only = first_only
+        self.bodies.clear()
+        self._seen.clear()
+
+    def ReportFixture(self, fixture):
+        if not self.include_sensors and is_sensor(fixture):
+            return True
+        if self.point is not None and not fixture.TestPoint(self.point):
+            return True
+        body = fixture.body
+        if body not in self._seen:
+            self._seen.add(body)
+            self.bodies.append(body)
+        return not self.first_only
+
+
+class _RayCastCallback(Box2D.b2RayCastCallback):
+    """Reusable raycast callback; keeps either the closest hit or every hit."""
+    def __init__(self):
+        super(_RayCastCallback, self).__init__()
+        self.hits = []
+        self.reset()
+
+    def reset(self, include_sensors=False, closest=True):
+        self.include_sensors = include_sensors
+        self.closest = closest
+        self.hits.clear()
+
+    def ReportFixture(self, fixture, point, normal, fraction):
+        if not self.include_sensors and is_sensor(fixture):
+            return -1.0 # Ignore this fixture, continue the ray
+        hit = (fixture.body, Box2D.b2Vec2(point), Box2D.b2Vec2(normal), fraction)
+        if self.closest:
+            self.hits[:] = [hit]
+            return fraction # Clip the ray to this hit
+        self.hits.append(hit)
+        return 1.0 # Keep going, report everything along the ray
+
+
+class PhysicsQuery:
+    """Spatial queries against the world's broadphase, reusing one callback of each kind.
+
+    All coordinates are Box2D meters. Queries return lists of bodies; use
+    `instances_of` / `ids_of` to map them back to game objects or portals.
+    """
+    POINT_EPSILON = 0.001
+
+    def __init__(self, world):
+        self.world = world
+        self._fixture_cb = _FixtureQueryCallback()
+        self._ray_cb = _RayCastCallback()
+        self._aabb = Box2D.b2AABB()
+        self._probe_circle = Box2D.b2CircleShape(radius=1.0)
+        self._probe_box = Box2D.b2PolygonShape(box=(1.0, 1.0))
+        self._probe_transform = Box2D.b2Transform()
+        self._probe_transform.SetIdentity()
+
+    def _run_aabb(self, lower_x, lower_y, upper_x, upper_y):
+        self._aabb.lowerBound = (lower_x, lower_y)
+        self._aabb.upperBound = (upper_x, upper_y)
+        self.world.QueryAABB(self._fixture_cb, self._aabb)
+        return list(self._fixture_cb.bodies)
+
+    def point(self, point_box2d, include_sensors=False, first_only=True):
+        """Bodies whose fixtures contain the point."""
+        x, y = point_box2d[0], point_box2d[1]
+        eps = self.POINT_EPSILON
+        self._fixture_cb.reset(include_sensors, Box2D.b2Vec2(x, y), first_only)
+        return self._run_aabb(x - eps, y - eps, x + eps, y + eps)
+
+    def aabb(self, lower_box2d, upper_box2d, include_sensors=False):
+        """Bodies with a fixture whose broadphase AABB overlaps the box."""
+        lower_x, upper_x = sorted((lower_box2d[0], upper_box2d[0]))
+        lower_y, upper_y = sorted((lower_box2d[1], upper_box2d[1]))
+        self._fixture_cb.reset(include_sensors)
+        return self._run_aabb(lower_x, lower_y, upper_x, upper_y)
+
+    def rect(self, lower_box2d, upper_box2d, include_sensors=False):
+        """Bodies with a fixture overlapping the box (exact shape distance test, unlike `aabb`)."""
+        lower_x, upper_x = sorted((lower_box2d[0], upper_box2d[0]))
+        lower_y, upper_y = sorted((lower_box2d[1], upper_box2d[1]))
+        self._fixture_cb.reset(include_sensors)
+        candidates = self._run_aabb(lower_x, lower_y, upper_x, upper_y)
+        half_w, half_h = (upper_x - lower_x) / 2, (upper_y - lower_y) / 2
+        if half_w <= 0.0 or half_h <= 0.0:
+            return [] # Box2D asserts on degenerate polygons
+        self._probe_box.SetAsBox(half_w, half_h)
+        self._probe_transform.position = (lower_x + half_w, lower_y + half_h)
+        return self._overlapping(candidates, self._probe_box, include_sensors)
+
+    def radius(self, center_box2d, radius, include_sensors=False):
+        """Bodies with a fixture overlapping the circle (exact shape distance test)."""
+        cx, cy = center_box2d[0], center_box2d[1]
+        self._fixture_cb.reset(include_sensors)
+        candidates = self._run_aabb(cx - radius, cy - radius, cx + radius, cy + radius)
+        self._probe_circle.radius = radius
+        self._probe_transform.position = (cx, cy)
+        return self._overlapping(candidates, self._probe_circle, include_sensors)
+
+    def _overlapping(self, candidates, probe, include_sensors):
+        """Broadphase candidates with a fixture touching `probe` placed at the probe transform."""
+        hits = []
+        for body in candidates:
+            transform = body.transform
+            for fixture in body.fixtures:
+                if not include_sensors and is_sensor(fixture):
+                    continue
+                result = Box2D.b2Distance(shapeA=fixture.shape, shapeB=probe,
+                                          transformA=transform, transformB=self._probe_transform,
+                                          useRadii=True)
+                if result.distance <= 0.0:
+                    hits.append(body)
+                    break
+        return hits
+
+    def raycast(self, start_box2d, end_box2d, include_sensors=False, closest=True):
+        """Returns a list of (body, point, normal, fraction); only the nearest hit when closest=True."""
+        if (start_box2d[0] - end_box2d[0]) ** 2 + (start_box2d[1] - end_box2d[1]) ** 2 <= 0.0:
+            return [] # Box2D asserts on zero-length rays
+        self._ray_cb.reset(include_sensors, closest)
+        self.world.RayCast(self._ray_cb, start_box2d, end_box2d)
+        return list(self._ray_cb.hits)
+
+    @staticmethod
+    def instances_of(bodies, kind=USER_DATA_OBJECT):
+        """Maps bodies to their GameObject (kind=USER_DATA_OBJECT) or Portal instances."""
+        key = 'object_instance' if kind == USER_DATA_OBJECT else 'portal_instance'
+        instances = []
+        for body in bodies:
+            user_data = body.userData
+            if isinstance(user_data, dict) and user_data.get('type') == kind:
+                instance = user_data.get(key)
+                if instance is not None:
+                    instances.append(instance)
+        return instances
+
+    @staticmethod
+    def ids_of(bodies, kind=USER_DATA_OBJECT):
+        return [instance.id for instance in PhysicsQuery.instances_of(bodies, kind)]
+
+
+class SurfaceIndex:
+    """Edges of every static, non-sensor fixture, bucketed in a uniform grid.
+
+    Static bodies never move, so the edges are collected once by `rebuild`
+    (called again only when static geometry is added or destroyed). Queries
+    then test just the edges in the cells around the point, however complex the
+    level is, and touch only Python data, so the main thread can run them while
+    the physics thread steps the world.
+    """
+    def __init__(self, world, cell_size=PORTAL_SURFACE_CELL):
+        self.world = world
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cy) -> [edge index]
+        self.edges = [] # (ax, ay, dx, dy, nx, ny, length, two_sided); (dx, dy) is the unit direction a->b
+        self._last_query = None # (key, result) of the latest snap, for a cursor that has not moved
+
+    def rebuild(self):
+        """Re-collects the edges of all static fixtures. Run on the thread that owns the world."""
+        edges = []
+        for body in self.world.bodies:
+            if body.type != Box2D.b2_staticBody: continue
+            transform = body.transform
+            for fixture in body.fixtures:
+                if is_sensor(fixture): continue
+                shape = fixture.shape
+                if isinstance(shape, Box2D.b2PolygonShape):
+                    points = [transform * v for v in shape.vertices]
+                    segments, two_sided = zip(points, points[1:] + points[:1]), False # CCW, normals face out
+                elif isinstance(shape, (Box2D.b2EdgeShape, Box2D.b2ChainShape)):
+                    points = [transform * v for v in shape.vertices]
+                    segments, two_sided = zip(points, points[1:]), True
+                else:
+                    continue # Portals need a flat surface
+                for a, b in segments:
+                    dx, dy = b[0] - a[0], b[1] - a[1]
+                    length = math.hypot(dx, dy)
+                    if length <= 0.0: continue
+                    dx, dy = dx / length, dy / length
+                    edges.append((a[0], a[1], dx, dy, dy, -dx, length, two_sided))
+
+        cells, size = {}, self.cell_size
+        for index, (ax, ay, dx, dy, _, _, length, _) in enumerate(edges):
+            bx, by = ax + dx * length, ay + dy * length
+            for cx in range(int(math.floor(min(ax, bx) / size)), int(math.floor(max(ax, bx) / size)) + 1):
+                for cy in range(int(math.floor(min(ay, by) / size)), int(math.floor(max(ay, by) / size)) + 1):
+                    cells.setdefault((cx, cy), []).append(index)
+        self.edges, self.cells, self._last_query = edges, cells, None # Swapped in whole for readers on other threads
+
+    def snap(self, point_box2d, max_distance, span):
+        """Nearest spot within `max_distance` where a flat surface has room for `span` meters.
+
+        Returns ((x, y), normal_angle) with the normal pointing away from the
+        surface, toward the point, or None when no surface qualifies.
+        """
+        px, py = point_box2d[0], point_box2d[1]
+        key = (px, py, max_distance, span)
+        last = self._last_query
+        if last is not None and last[0] == key:
+            return last[1]
+
+        edges, cells, size = self.edges, self.cells, self.cell_size
+        seen = set()
+        best, best_d2 = None, max_distance * max_distance
+        half = span / 2
+        home_x, home_y = int(math.floor(px / size)), int(math.floor(py / size))
+        for ring in range(int(math.ceil(max_distance / size)) + 1):
+            if ring and best is not None and best_d2 <= ((ring - 1) * size) ** 2:
+                break # Every cell from this ring out is farther than the best hit
+            for cx in range(home_x - ring, home_x + ring + 1):
+                step = 1 if abs(cx - home_x) == ring else 2 * ring # Only the ring's border cells
+                for cy in range(home_y - ring, home_y + ring + 1, step):
+                    for index in cells.get((cx, cy), ()):
+                        if index in seen: continue
+                        seen.add(index)
+                        ax, ay, dx, dy, nx, ny, length, two_sided = edges[index]
+                        if length < span: continue
+                        rx, ry = px - ax, py - ay
+                        if rx * nx + ry * ny < 0.0:
+                            if not two_sided: continue # Behind a solid face
+                            nx, ny = -nx, -ny
+                        t = min(max(rx * dx + ry * dy, half), length - half) # Keep the whole portal on the edge
+                        qx, qy = ax + dx * t, ay + dy * t
+                        d2 = (px - qx) ** 2 + (py - qy) ** 2
+                        if d2 <= best_d2:
+                            best, best_d2 = ((qx, qy), math.atan2(ny, nx)), d2
+        self._last_query = (key, best)
+        return best
 
 
 class PhysicsManager:
@@ -69,8 +393,24 @@ class PhysicsManager:
         self.object_manager = object_manager
         self.portal_manager = portal_manager
         self.contact_listener = PortalContactListener(self.portal_manager)
+        self.wall_contact_listener = WallPortalContactListener(self.portal_manager)
         self.world.contactListener = self.contact_listener
-        self.bodies_to_destroy = []
+        self._active_listener = self.contact_listener
+        self.bodies_to_destroy = {} # Insertion-ordered set: body -> None
+        self.query = PhysicsQuery(self.world)
+        self.surfaces = SurfaceIndex(self.world) # Static edges for portal placement
+        self.ghosts = GhostPool(self.world) # Exit-side bodies of objects straddling a portal
+        self.world_bounds = None # (min_x, min_y, max_x, max_y) meters, set by add_boundaries
+        self.body_geometry = {} # b2Body -> describe_body_geometry() result, for the debug overlay
+        self.velocity_iterations = VELOCITY_ITERATIONS
+        self.position_iterations = POSITION_ITERATIONS
+        self._bulk_shapes = {} # (shape_type, dims) -> (fixture def, geometry), shared by add_objects
+
+    def _cache_geometry(self, body):
+        try:
+            self.body_geometry[body] = describe_body_geometry(body)
+        except Exception as e:
+            print(f"Warning: Could not cache body geometry: {e}")
 
     def add_object(self, game_object):
         """Creates a Box2D body for a game object."""
@@ -104,12 +444,70 @@ class PhysicsManager:
                 body.CreateFixture(fixture_def)
             except Exception as e:
                  print(f"Error creating Box2D fixture for object: {e}")
-                 self.bodies_to_destroy.append(body)
+                 self.bodies_to_destroy[body] = None
                  return None
 
+        self._cache_geometry(body)
         game_object.body = body
         return body
 
+    def _object_shape(self, game_object):
+        """Shape of a game object's fixture, or None for unknown types."""
+        if game_object.shape_type == 'circle':
+            return Box2D.b2CircleShape(radius=game_object.radius)
+        if game_object.shape_type == 'box':
+            return Box2D.b2PolygonShape(box=(game_object.size[0] / 2, game_object.size[1] / 2))
+        return None
+
+    def add_objects(self, game_objects, velocities=None):
+        """Creates Box2D bodies for many game objects at once (emitters, flood fill).
+
+        Gives the same bodies as add_object, but one body def is reused, and the
+        fixture def and debug geometry are shared by every object of the same
+        shape and size. `velocities` optionally holds an initial linear velocity
+        (meters/second) per object. Returns the objects that got a body.
+        """
+        body_def = Box2D.b2BodyDef()
+        body_def.type = Box2D.b2_dynamicBody
+        created = []
+        failed = 0
+        for index, game_object in enumerate(game_objects):
+            key = (game_object.shape_type, getattr(game_object, 'radius', None), getattr(game_object, 'size', None))
+            shared = self._bulk_shapes.get(key)
+            if shared is None:
+                shape = self._object_shape(game_object)
+                if shape is None:
+                    failed += 1
+                    continue
+                fixture_def = Box2D.b2FixtureDef(shape=shape, density=1.0, friction=0.3, restitution=0.3)
+                shared = self._bulk_shapes[key] = [fixture_def, None]
+            fixture_def, geometry = shared
+
+            body_def.position = game_object.position
+            body_def.angle = game_object.angle
+            body_def.linearVelocity = velocities[index] if velocities else (0, 0)
+            body_def.userData = {'type': USER_DATA_OBJECT, 'object_instance': game_object}
+            try:
+                body = self.world.CreateBody(body_def)
+            except Exception:
+                failed += 1
+                continue
+            try:
+                body.CreateFixture(fixture_def)
+            except Exception:
+                self.bodies_to_destroy[body] = None
+                failed += 1
+                continue
+
+            if geometry is None: # Body-local, so every body of this shape can share it
+                geometry = shared[1] = describe_body_geometry(body)
+            self.body_geometry[body] = geometry
+            game_object.body = body
+            created.append(game_object)
+        if failed:
+            print(f"Warning: Failed to create {failed} of {len(game_objects)} physics bodies.")
+        return created
+
     def add_portal(self, portal):
         """Creates a Box2D sensor body for a portal."""
         if not portal: return None
@@ -131,9 +529,10 @@ class PhysicsManager:
             body.CreateFixture(fixture_def)
         except Exception as e:
             print(f"Error creating Box2D fixture for portal: {e}")
-            self.bodies_to_destroy.append(body)
+            self.bodies_to_destroy[body] = None
             return None
 
+        self._cache_geometry(body)
         portal.body = body
         return body
 
@@ -141,53 +540,58 @@ class PhysicsManager:
         """Creates static bodies for the screen edges."""
         wall_data = {'type': USER_DATA_WALL}
         boundary_thickness = 0.1
+        self.world_bounds = (0.0, 0.0, width_m, height_m)
         try:
-            self.world.CreateStaticBody(
-                position=(width_m / 2, -boundary_thickness),
-                shapes=Box2D.b2PolygonShape(box=(width_m / 2, boundary_thickness)),
-                userData=wall_data
-            )
-            self.world.CreateStaticBody(
-                position=(width_m / 2, height_m + boundary_thickness),
-                shapes=Box2D.b2PolygonShape(box=(width_m / 2, boundary_thickness)),
-                userData=wall_data
-            )
-            self.world.CreateStaticBody(
-                position=(-boundary_thickness, height_m / 2),
-                shapes=Box2D.b2PolygonShape(box=(boundary_thickness, height_m / 2)),
-                userData=wall_data
-            )
-            self.world.CreateStaticBody(
-                position=(width_m + boundary_thickness, height_m / 2),
-                shapes=Box2D.b2PolygonShape(box=(boundary_thickness, height_m / 2)),
-                userData=wall_data
+            walls = (
+                ((width_m / 2, -boundary_thickness), (width_m / 2, boundary_thickness)),
+                ((width_m / 2, height_m + boundary_thickness), (width_m / 2, boundary_thickness)),
+                ((-boundary_thickness, height_m / 2), (boundary_thickness, height_m / 2)),
+                ((width_m + boundary_thickness, height_m / 2), (boundary_thickness, height_m / 2)),
             )
+            for position, half_extents in walls:
+                body = self.world.CreateStaticBody(
+                    position=position,
+                    shapes=Box2D.b2PolygonShape(box=half_extents),
+                    userData=wall_data
+                )
+                self._cache_geometry(body)
+            self.surfaces.rebuild()
             if not hasattr(self.world, 'groundBody'):
                  self.world.groundBody = self.world.CreateStaticBody(position=(0, 0), userData={'type': 'ground_joint_anchor'})
 
         except Exception as e:
              print(f"Error creating boundaries: {e}")
 
-    def update(self, dt):
-        """Steps the physics world and processes pending actions."""
+    def update(self, dt=TIME_STEP):
+        """Steps the physics world by `dt` seconds and processes pending actions."""
         destroyed_this_frame = 0
         bodies_remaining = []
+        surfaces_changed = False
+        # Only bodies created in this world are queued, each once, and nothing else
+        # destroys them (the ghost pool destroys only its own), so no world.bodies scan
         for body in self.bodies_to_destroy:
+            self.body_geometry.pop(body, None)
             try:
-                body_found = False
-                for world_body in self.world.bodies:
-                     if world_body == body:
-                          body_found = True
-                          break
-                if body_found:
-                    self.world.DestroyBody(body)
-                    destroyed_this_frame += 1
+                if body.type == Box2D.b2_staticBody and not all(is_sensor(f) for f in body.fixtures):
+                    surfaces_changed = True
+                # pybox2d frees userData before Box2D sends EndContact for the body's
+                # contacts, and the contact listener reads it; clear it first
+                body.userData = None
+                self.world.DestroyBody(body)
+                destroyed_this_frame += 1
             except Exception as e:
-                 pass
+                 print(f"Error destroying Box2D body: {e}")
         self.bodies_to_destroy.clear()
+        if surfaces_changed:
+            self.surfaces.rebuild()
+
+        listener = self.wall_contact_listener if self.portal_manager.wall_portals_in_use() else self.contact_listener
+        if listener is not self._active_listener:
+            self.world.contactListener = listener
+            self._active_listener = listener
 
         try:
-            self.world.Step(TIME_STEP, VELOCITY_ITERATIONS, POSITION_ITERATIONS)
+            self.world.Step(dt, self.velocity_iterations, self.position_iterations)
             self.world.ClearForces()
         except Exception as e:
              print(f"Error during Box2D world step: {e}")
@@ -196,8 +600,14 @@ class PhysicsManager:
             if obj and obj.body:
                 obj.update_from_physics()
 
+        self.portal_manager.update_straddles(self)
         self.portal_manager.process_teleportation_queue(self)
 
+    def set_solver_iterations(self, velocity_iterations, position_iterations):
+        """Sets the constraint solver iteration counts used by each step (fewer is faster, less stable)."""
+        self.velocity_iterations = velocity_iterations
+        self.position_iterations = position_iterations
+
     def toggle_gravity(self):
         """Toggles gravity ON/OFF and wakes bodies."""
         current_gravity_y = self.world.gravity.y
@@ -218,7 +628,7 @@ class PhysicsManager:
         """Applies force to an object's physics body in world coordinates."""
         if game_object and game_object.body:
             body = game_object.body
-            force_vector_box2d = (force_vector_pygame[0] / PPM, -force_vector_pygame[1] / PPM)
+            force_vector_box2d = (scalar_to_box2d(force_vector_pygame[0]), -scalar_to_box2d(force_vector_pygame[1]))
             point_box2d = to_box2d(point_pygame)
             try:
                 body.ApplyForce(force_vector_box2d, point_box2d, True)
@@ -227,12 +637,14 @@ class PhysicsManager:
 
     def apply_impulse_to_object(self, game_object, impulse_vector_pygame, point_pygame):
         """Applies impulse (mass * velocity change) to an object's physics body."""
+        impulse_vector_box2d = (scalar_to_box2d(impulse_vector_pygame[0]), -scalar_to_box2d(impulse_vector_pygame[1]))
+        self.apply_impulse(game_object, impulse_vector_box2d, to_box2d(point_pygame))
+
+    def apply_impulse(self, game_object, impulse_box2d, point_box2d):
+        """World-space apply_impulse_to_object; safe on the physics thread as it reads no camera."""
         if game_object and game_object.body:
-            body = game_object.body
-            impulse_vector_box2d = (impulse_vector_pygame[0] / PPM, -impulse_vector_pygame[1] / PPM)
-            point_box2d = to_box2d(point_pygame)
             try:
-                body.ApplyLinearImpulse(impulse_vector_box2d, point_box2d, True)
+                game_object.body.ApplyLinearImpulse(impulse_box2d, point_box2d, True)
             except Exception as e:
                  print(f"Error applying impulse: {e}")
 
@@ -249,69 +661,66 @@ class PhysicsManager:
 
     def get_body_at_pygame_point(self, point_pygame, include_sensors=False):
         """Finds a body (optionally sensor) whose fixture contains the given Pygame screen point."""
-        try:
-            point_box2d = to_box2d(point_pygame)
-            
-            if not isinstance(point_box2d, Box2D.b2Vec2):
-                point_box2d = Box2D.b2Vec2(point_box2d[0], point_box2d[1])
-            
-            offset = 0.001
-            lower_x = point_box2d.x - offset
-            lower_y = point_box2d.y - offset
-            upper_x = point_box2d.x + offset
-            upper_y = point_box2d.y + offset
-            
-            aabb = Box2D.b2AABB(
-                lowerBound=(lower_x, lower_y),
-                upperBound=(upper_x, upper_y)
-            )
-
-            selected_game_object = None
-
-            class PointQueryCallback(Box2D.b2QueryCallback):
-                def __init__(self, point, include_sensors):
-                    super(PointQueryCallback, self).__init__()
-                    self.point = point
-                    self.fixture = None
-                    self.include_sensors = include_sensors
-
-                def ReportFixture(self, fixture):
-                    body = fixture.body
-                    is_fixture_sensor = is_sensor(fixture)
-                    if is_fixture_sensor and not self.include_sensors:
-                         return True
+        return self.get_body_at_point(to_box2d(point_pygame), include_sensors)
 
-                    if fixture.TestPoint(self.point):
-                        self.fixture = fixture
-                        return False
-                    else:
-                        return True
+    def get_body_at_point(self, point_box2d, include_sensors=False):
+        """World-space get_body_at_pygame_point: the object (or portal) whose fixture contains the point."""
+        try:
+            bodies = self.query.point(point_box2d, include_sensors=include_sensors)
+        except Exception as e:
+            print(f"Error in get_body_at_point: {e}")
+            return None
 
-            query = PointQueryCallback(point_box2d, include_sensors)
-            try:
-                self.world.QueryAABB(query, aabb)
-            except Exception as e:
-                print(f"Error during QueryAABB: {e}")
-                return None
+        for body in bodies:
+            if body.userData and isinstance(body.userData, dict):
+                if body.userData.get('type') == USER_DATA_OBJECT:
+                    return body.userData.get('object_instance')
+                elif body.userData.get('type') == USER_DATA_PORTAL and include_sensors:
+                    return body.userData.get('portal_instance')
+        return None
+
+    def get_entities_in_aabb(self, lower_box2d, upper_box2d):
+        """Broadphase lookup of (objects, portals) overlapping a world-space box, e.g. the viewport."""
+        bodies = self.query.aabb(lower_box2d, upper_box2d, include_sensors=True)
+        return (PhysicsQuery.instances_of(bodies, USER_DATA_OBJECT),
+                PhysicsQuery.instances_of(bodies, USER_DATA_PORTAL))
+
+    def get_objects_in_pygame_rect(self, rect_pygame, as_ids=False):
+        """Returns the game objects (or their ids) whose fixtures overlap a Pygame-space rectangle."""
+        x, y, w, h = rect_pygame
+        try:
+            bodies = self.query.rect(to_box2d((x, y + h)), to_box2d((x + w, y)))
+        except Exception as e:
+            print(f"Error querying rectangle {rect_pygame}: {e}")
+            return []
+        return PhysicsQuery.ids_of(bodies) if as_ids else PhysicsQuery.instances_of(bodies)
 
-            if query.fixture:
-                body = query.fixture.body
-                if body.userData and isinstance(body.userData, dict):
-                     if body.userData.get('type') == USER_DATA_OBJECT:
-                        selected_game_object = body.userData.get('object_instance')
-                     elif body.userData.get('type') == USER_DATA_PORTAL and include_sensors:
-                          selected_game_object = body.userData.get('portal_instance')
+    def get_objects_in_pygame_radius(self, center_pygame, radius_pygame, as_ids=False):
+        """Returns the game objects (or their ids) overlapping a Pygame-space circle."""
+        try:
+            bodies = self.query.radius(to_box2d(center_pygame), scalar_to_box2d(radius_pygame))
+        except Exception as e:
+            print(f"Error querying radius at {center_pygame}: {e}")
+            return []
+        return PhysicsQuery.ids_of(bodies) if as_ids else PhysicsQuery.instances_of(bodies)
 
+    def raycast_pygame(self, start_pygame, end_pygame, include_sensors=False):
+        """Closest non-sensor hit along a Pygame-space segment as (body, point_box2d, normal, fraction), or None."""
+        try:
+            hits = self.query.raycast(to_box2d(start_pygame), to_box2d(end_pygame), include_sensors)
         except Exception as e:
-            print(f"Error in get_body_at_pygame_point: {e}")
+            print(f"Error during raycast: {e}")
             return None
-        
-        return selected_game_object
+        return hits[0] if hits else None
+
+    def find_surface(self, point_box2d, max_distance, span):
+        """Nearest wall spot with room for `span` meters: ((x, y), normal_angle), or None. See SurfaceIndex.snap."""
+        return self.surfaces.snap(point_box2d, max_distance, span)
 
     def destroy_body(self, body):
         """Safely schedule a body for destruction on the next physics step."""
-        if body and body not in self.bodies_to_destroy:
-             self.bodies_to_destroy.append(body)
+        if body:
+             self.bodies_to_destroy[body] = None
 
     def get_gravity_state(self):
         """Returns True if gravity is ON, False otherwise."""
@@ -0,0 +1,209 @@
+import math
+import pygame
+from settings import (PPM, COLOR_BACKGROUND, COLOR_TEXT, PORTAL_VIEW_RADIUS, PORTAL_VIEW_MAX_DEPTH,
+                      PORTAL_VIEW_BUDGET, PORTAL_VIEW_TINT, get_active_camera)
+from sprites import SpriteAtlas
+
+class _PortalView:
+    """Cached view surface of one portal."""
+    __slots__ = ('surface', 'signature', 'version', 'last_render', 'last_used')
+
+    def __init__(self):
+        self.surface = None
+        self.signature = None
+        self.version = 0
+        self.last_render = -1
+        self.last_used = -1
+
+
+def _compose(outer, inner):
+    """Rigid transform p -> outer(inner(p)). Transforms are (tx, ty, cos, sin, angle)."""
+    ox, oy, oc, os_, oa = outer
+    ix, iy, ic, is_, ia = inner
+    return (ox + oc * ix - os_ * iy, oy + os_ * ix + oc * iy,
+            oc * ic - os_ * is_, os_ * ic + oc * is_, oa + ia)
+
+
+def _apply(transform, x, y):
+    tx, ty, c, s, _ = transform
+    return tx + c * x - s * y, ty + s * x + c * y
+
+
+def _portal_transform(x, y, angle, linked_pose):
+    """Maps the region around the linked portal onto this portal (inverse of the teleport mapping)."""
+    lx, ly, linked_angle = linked_pose
+    rotation = angle - linked_angle + math.pi
+    c, s = math.cos(rotation), math.sin(rotation)
+    return (x - (c * lx - s * ly), y - (s * lx + c * ly), c, s, rotation)
+
+
+class PortalViewCache:
+    """Offscreen "window" surfaces showing what is around each portal's linked portal.
+
+    The circle of `radius` meters around the linked portal is mapped through the
+    pair's relative transform, so an object about to come out of the linked
+    portal is seen next to this one. Views are drawn in screen orientation
+    straight from atlas sprites (no surface rotation) and cached per portal.
+    A view is redrawn only when the signature of its source region (ids and
+    pixel-quantized poses) changes, and at most `budget` views are redrawn per
+    frame, stalest first; the rest keep their last image. Portals inside a
+    source region show their own views down to `max_depth` levels.
+    """
+    def __init__(self, sprite_atlas=None, radius=PORTAL_VIEW_RADIUS,
+                 max_depth=PORTAL_VIEW_MAX_DEPTH, budget=PORTAL_VIEW_BUDGET):
+        self.sprite_atlas = sprite_atlas if sprite_atlas is not None else SpriteAtlas()
+        self.radius = radius
+        self.max_depth = max_depth
+        self.budget = budget
+        self._views = {} # portal id -> _PortalView
+        self._masks = {} # pixel radius -> circular alpha mask
+        self._frame = 0
+        self.last_rendered = 0 # Views redrawn last frame
+        self.last_reused = 0   # Views served from cache last frame
+
+    def clear(self):
+        self._views.clear()
+
+    def update(self, portals, source):
+        """Refreshes the views of the visible `portals`.
+
+        `source(lower, upper)` returns (objects, portals) overlapping a world box.
+        Returns [(portal_id, surface, screen_rect, version)] in draw order.
+        """
+        self._frame += 1
+        camera = get_active_camera()
+        scale = camera.scale if camera else PPM
+        radius_px = int(self.radius * scale)
+        if radius_px < 4 or source is None:
+            return [] # Too small to show anything useful at this zoom
+
+        pending = [] # (view, portal, draws, signature)
+        for portal in portals:
+            linked_pose = portal.get_linked_pose()
+            if linked_pose is None: continue
+            x, y = portal.position[0], portal.position[1]
+            transform = _portal_transform(x, y, portal.angle, linked_pose)
+            draws = []
+            signature = [scale, linked_pose]
+            self._gather(source, transform, linked_pose, (x, y), self.max_depth, scale, draws, signature)
+            signature = tuple(signature)
+
+            view = self._views.get(portal.id)
+            if view is None:
+                view = self._views[portal.id] = _PortalView()
+            view.last_used = self._frame
+            if view.surface is None or view.signature != signature:
+                pending.append((view, portal, draws, signature))
+
+        # Stalest views first, so a busy scene still refreshes every view eventually
+        pending.sort(key=lambda item: item[0].last_render)
+        for view, portal, draws, signature in pending[:self.budget]:
+            view.surface = self._render(portal, draws, radius_px, scale)
+            view.signature = signature
+            view.version += 1
+            view.last_render = self._frame
+        self.last_rendered = min(len(pending), self.budget)
+
+        results = []
+        for portal in portals:
+            view = self._views.get(portal.id)
+            if view is None or view.last_used != self._frame or view.surface is None:
+                continue
+            cx, cy = portal.get_pygame_pos()
+            size = view.surface.get_width()
+            rect = pygame.Rect(cx - size // 2, cy - size // 2, size, size)
+            results.append((portal.id, view.surface, rect, view.version))
+        self.last_reused = len(results) - self.last_rendered
+
+        # Forget views of portals that are gone or off screen
+        for portal_id in [pid for pid, view in self._views.items() if view.last_used != self._frame]:
+            del self._views[portal_id]
+        return results
+
+    def _gather(self, source, transform, linked_pose, window_center, depth, scale, draws, signature):
+        """Appends the mapped draw commands for one source region (and nested views) to `draws`."""
+        radius = self.radius
+        lx, ly = linked_pose[0], linked_pose[1]
+        objects, portals = source((lx - radius, ly - radius), (lx + radius, ly + radius))
+        wx, wy = window_center
+        rotation = transform[4]
+
+        portal_draws = []
+        for other in portals:
+            ox, oy = other.position[0], other.position[1]
+            mx, my = _apply(transform, ox, oy)
+            if (mx - wx) ** 2 + (my - wy) ** 2 > (radius + max(other.size)) ** 2:
+                continue
+            signature.append(('p', other.id))
+            other_linked = other.get_linked_pose() if depth > 1 else None
+            if other_linked is not None:
+                draws.append(('window', mx, my, other.color))
+                nested = _compose(transform, _portal_transform(ox, oy, other.angle, other_linked))
+                self._gather(source, nested, other_linked, (mx, my), depth - 1, scale, draws, signature)
+            portal_draws.append(('portal', mx, my, other.angle + rotation, other.size, other.color))
+        draws.extend(portal_draws)
+
+        for obj in objects:
+            if not obj.is_drawable(): continue
+            spec = obj.get_sprite_spec()
+            if spec is None: continue
+            ox, oy = obj.position[0], obj.position[1]
+            mx, my = _apply(transform, ox, oy)
+            if (mx - wx) ** 2 + (my - wy) ** 2 > (radius + obj.get_bounding_radius()) ** 2:
+                continue
+            signature.append((obj.id, int(ox * scale), int(oy * scale), int(obj.angle * 100)))
+            draws.append(('object', mx, my, obj.angle + rotation, spec))
+
+    def _render(self, portal, draws, radius_px, scale):
+        """Draws one view into a fresh circular surface centered on the portal."""
+        size = 2 * radius_px + 1
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        center = (radius_px, radius_px)
+        px, py = portal.position[0], portal.position[1]
+        pygame.draw.circle(surface, COLOR_BACKGROUND.lerp(portal.color, PORTAL_VIEW_TINT), center, radius_px)
+
+        def to_view(x, y):
+            return int(radius_px + (x - px) * scale), int(radius_px - (y - py) * scale)
+
+        blits = []
+        for draw in draws:
+            kind = draw[0]
+            if kind == 'object':
+                _, x, y, angle, spec = draw
+                sprite, half = self.sprite_atlas.get(spec, angle)
+                vx, vy = to_view(x, y)
+                blits.append((sprite, (vx - half, vy - half)))
+                continue
+            if blits: # Keep layer order: flush pending sprites before primitives
+                surface.blits(blits, doreturn=False)
+                blits = []
+            if kind == 'window':
+                _, x, y, color = draw
+                pygame.draw.circle(surface, COLOR_BACKGROUND.lerp(color, PORTAL_VIEW_TINT),
+                                   to_view(x, y), radius_px)
+            elif kind == 'portal':
+                _, x, y, angle, (width, height), color = draw
+                c, s = math.cos(angle), math.sin(angle)
+                hw, hh = width / 2, height / 2
+                vertices = [to_view(x + vx * c - vy * s, y + vx * s + vy * c)
+                            for vx, vy in ((-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh))]
+                pygame.draw.polygon(surface, color, vertices)
+        if blits:
+            surface.blits(blits, doreturn=False)
+
+        surface.blit(self._get_mask(radius_px), (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        pygame.draw.circle(surface, portal.color.lerp(COLOR_TEXT, 0.5), center, radius_px, 2)
+        return surface
+
+    def _get_mask(self, radius_px):
+        """Opaque white disc on transparent black; multiplying by it clips a view to its circle."""
+        mask = self._masks.get(radius_px)
+        if mask is None:
+            size = 2 * radius_px + 1
+            mask = pygame.Surface((size, size), pygame.SRCALPHA)
+            mask.fill((0, 0, 0, 0))
+            pygame.draw.circle(mask, (255, 255, 255, 255), (radius_px, radius_px), radius_px)
+            if len(self._masks) > 16:
+                self._masks.clear()
+            self._masks[radius_px] = mask
+        return mask
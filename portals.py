@@ -1,9 +1,10 @@
-import pygame
 import math
+import time
 from settings import (Box2D, to_pygame, to_box2d, scalar_to_pygame,
                       PORTAL_COLORS, DEFAULT_PORTAL_HEIGHT, DEFAULT_PORTAL_WIDTH,
-                      PORTAL_COOLDOWN)
-from utils import get_body_vertices_pygame
+                      PORTAL_COOLDOWN, PORTAL_SNAP_DISTANCE, PORTAL_MAX_HOPS, TIME_STEP)
+from physics import get_body_vertices_pygame
+from transit import TransitGraph
 
 class Portal:
     """Represents one end of a portal pair."""
@@ -13,6 +14,7 @@ class Portal:
         Portal._id_counter += 1
         self.position = Box2D.b2Vec2(position_box2d)
         self.angle = angle_rad
+        self.normal = (math.cos(angle_rad), math.sin(angle_rad)) # Direction the portal faces
         self.color = color
         self.pair_id = pair_id
         self.body = None
@@ -22,7 +24,7 @@ class Portal:
 
         self.cooldown_end_times = {}
         self.cooldown_duration = PORTAL_COOLDOWN
-        self.last_exit_pos = {}
+        self.on_wall = False # Flat against a wall (set when the pair is created); see in_wall_mouth
 
     def link(self, other_portal):
         """Establish a two-way link between portals."""
@@ -34,15 +36,46 @@ class Portal:
         """Get center position in Pygame coordinates."""
         return to_pygame(self.position)
 
+    def get_linked_pose(self):
+        """(x, y, angle) of the linked portal in meters/radians, or None when unlinked."""
+        linked = self.linked_portal
+        if not linked or linked.marked_for_deletion:
+            return None
+        return (linked.position.x, linked.position.y, linked.angle)
+
+    def depth_of(self, point):
+        """Signed distance (meters) of a world point in front of the portal's center plane; negative behind it."""
+        nx, ny = self.normal
+        return (point[0] - self.position.x) * nx + (point[1] - self.position.y) * ny
+
+    def get_screen_rect(self):
+        """Screen-space (x, y, w, h) bounds of the portal at any rotation (for dirty-rect tracking)."""
+        if not self.body or self.marked_for_deletion:
+            return None
+        x, y = self.get_pygame_pos()
+        r = scalar_to_pygame(math.hypot(self.size[0], self.size[1]) / 2) + 3
+        return (x - r, y - r, 2 * r, 2 * r)
+
     def get_exit_transform(self, entry_obj_body):
         """Calculate exit position, angle, linear and angular velocity for an entering object body."""
         if not self.linked_portal or not entry_obj_body:
             print("Warning: get_exit_transform called without linked portal or body.")
             return entry_obj_body.position, entry_obj_body.angle, entry_obj_body.linearVelocity, entry_obj_body.angularVelocity
 
+        return self.map_to_exit(entry_obj_body.worldCenter, entry_obj_body.angle, entry_obj_body.linearVelocity,
+                                entry_obj_body.angularVelocity)
+
+    def map_to_exit(self, center, angle, velocity, angular_velocity):
+        """Same as get_exit_transform for a pose given as values (b2Vec2 center and velocity),
+        so chained hops and ghosts can be worked out without moving the body.
+
+        A plain rigid transform: a point just behind this portal comes out just in
+        front of the linked one, so an object swapped as its center crosses keeps
+        its place and speed.
+        """
         exit_portal = self.linked_portal
 
-        relative_pos = entry_obj_body.worldCenter - self.body.worldCenter
+        relative_pos = center - self.body.worldCenter
         relative_angle = exit_portal.angle - self.angle + math.pi
 
         cos_a = math.cos(relative_angle)
@@ -53,33 +86,13 @@ class Portal:
 
         exit_position = exit_portal.body.worldCenter + rotated_relative_pos
 
-        exit_angle = entry_obj_body.angle + relative_angle
+        exit_angle = angle + relative_angle
 
-        entry_vel = entry_obj_body.linearVelocity
-        exit_vel_x = entry_vel.x * cos_a - entry_vel.y * sin_a
-        exit_vel_y = entry_vel.x * sin_a + entry_vel.y * cos_a
+        exit_vel_x = velocity.x * cos_a - velocity.y * sin_a
+        exit_vel_y = velocity.x * sin_a + velocity.y * cos_a
         exit_velocity = Box2D.b2Vec2(exit_vel_x, exit_vel_y)
 
-        exit_angular_velocity = entry_obj_body.angularVelocity
-
-        # Improved safety offset calculation
-        exit_normal = exit_portal.body.GetWorldVector((0, 1))
-        
-        # Increase safety offset to prevent immediate re-entry
-        safety_offset_distance = 0.2  # Increased from 0.05
-        
-        # Apply velocity-based additional offset
-        velocity_magnitude = exit_velocity.length
-        if velocity_magnitude > 0.1:
-            # Add extra offset in the direction of motion to prevent bouncing back
-            vel_direction = Box2D.b2Vec2(exit_velocity)
-            if vel_direction.length > 0:
-                vel_direction.Normalize()
-                # Add velocity-based offset
-                exit_position += vel_direction * min(velocity_magnitude * 0.05, 0.1)
-        
-        # Final position offset
-        exit_position += exit_normal * safety_offset_distance
+        exit_angular_velocity = angular_velocity
 
         return exit_position, exit_angle, exit_velocity, exit_angular_velocity
 
@@ -92,7 +105,7 @@ class Portal:
              else:
                  pos_pygame = self.get_pygame_pos()
                  size_pygame = (scalar_to_pygame(self.size[0]), scalar_to_pygame(self.size[1]))
-                 pygame.draw.rect(surface, self.color, (*pos_pygame, *size_pygame), 2)
+                 renderer.draw_rect(surface, self.color, (*pos_pygame, *size_pygame), 2)
 
     def update_cooldowns(self, current_time):
         """Remove expired cooldown entries."""
@@ -117,49 +130,169 @@ class Portal:
         self.marked_for_deletion = True
 
 
+class PortalRegistry:
+    """Incrementally maintained index of live portals.
+
+    Keeps a dense list of portals (for iteration/drawing), a body -> portal map
+    and a pair_id -> pair map. Only create/delete touch the indexes, so per-frame
+    reads are O(1) and return a cached tuple rather than a freshly built list.
+    """
+    def __init__(self):
+        self.pairs = {}
+        self._portals = []
+        self._index = {}
+        self._by_body = {}
+        self._view = ()
+        self._view_dirty = False
+        self.version = 0 # Bumped on every create/delete, so derived data (TransitGraph) knows to rebuild
+
+    def add_pair(self, pair_id, portal_a, portal_b):
+        """Registers both ends of a pair. Bodies must already be created."""
+        self.pairs[pair_id] = [portal_a, portal_b]
+        for portal in (portal_a, portal_b):
+            self._index[portal] = len(self._portals)
+            self._portals.append(portal)
+            if portal.body:
+                self._by_body[portal.body] = portal
+        self._view_dirty = True
+        self.version += 1
+
+    def remove_pair(self, pair_id):
+        """Unregisters a pair, returning it (or None if unknown). O(1) swap-remove."""
+        pair = self.pairs.pop(pair_id, None)
+        if not pair: return None
+        for portal in pair:
+            idx = self._index.pop(portal, None)
+            if idx is not None:
+                last = self._portals.pop()
+                if last is not portal:
+                    self._portals[idx] = last
+                    self._index[last] = idx
+            if portal.body:
+                self._by_body.pop(portal.body, None)
+        self._view_dirty = True
+        self.version += 1
+        return pair
+
+    def get_pair(self, pair_id):
+        return self.pairs.get(pair_id)
+
+    def get_portal_for_body(self, body):
+        return self._by_body.get(body)
+
+    def get_portals(self):
+        """Returns a cached tuple of live portals, rebuilt only after a change."""
+        if self._view_dirty:
+            self._view = tuple(self._portals)
+            self._view_dirty = False
+        return self._view
+
+    def __len__(self):
+        return len(self._portals)
+
+    def __contains__(self, portal):
+        return portal in self._index
+
+
 class PortalManager:
     def __init__(self, physics_manager):
-        self.portal_pairs = {}
+        self.registry = PortalRegistry()
+        self.portal_pairs = self.registry.pairs # pair_id -> [portal_a, portal_b], kept by the registry
+        self.transit = TransitGraph() # Chained hops; rebuilt from the registry when portals change
+        self._cooling_portals = set() # Portals with at least one active cooldown entry
+        self.time_source = None # Callable returning seconds; None uses the real-time clock
         self.next_pair_id = 0
         self.physics_manager = physics_manager
         self.teleport_queue = []
-        self.creation_state = {'active': False, 'start_pos_pygame': None, 'start_angle': None} # For drag creation
+        self.straddles = {} # (obj, portal) -> side it came in from: 1 in front of the portal, -1 behind
+        self._ghosts = {} # (obj, portal) -> ghost body showing the part of obj already through
+        self._wall_portals = () # Linked portals with on_wall set, for the wall contact listener
+        self._wall_portals_version = None
+        self.teleport_listeners = [] # fn(obj, entry_portal, exit_portal, entry_pos, exit_pos), called after each teleport
+        self.creation_state = {'active': False, 'start_pos_box2d': None, 'start_angle': None} # For drag creation
 
     def set_physics_manager(self, manager):
         self.physics_manager = manager
 
-    def start_portal_creation(self, start_pos_pygame):
-        """Initiates the portal creation drag sequence."""
+    def add_teleport_listener(self, listener):
+        """Registers a callback for completed teleports. Positions are (x, y) in meters.
+        Runs on whichever thread steps physics."""
+        self.teleport_listeners.append(listener)
+
+    def remove_teleport_listener(self, listener):
+        if listener in self.teleport_listeners:
+            self.teleport_listeners.remove(listener)
+
+    def get_time(self):
+        """Current time in seconds for cooldowns (simulation clock if one is set)."""
+        if self.time_source:
+            return self.time_source()
+        return time.perf_counter()
+
+    def find_placement(self, position_box2d):
+        """Where a portal clicked at `position_box2d` would go: ((x, y), angle) on the nearest wall, or None.
+
+        The portal lies flat against the wall with its long side along it, and its
+        angle is the wall normal, so objects come out facing away from the wall.
+        Spots overlapping an existing portal are refused.
+        """
+        placement = self._surface_placement(position_box2d)
+        if placement is None: return None
+        (x, y), _ = placement
+        for portal in self.registry.get_portals():
+            if (portal.position.x - x) ** 2 + (portal.position.y - y) ** 2 < DEFAULT_PORTAL_HEIGHT ** 2:
+                return None
+        return placement
+
+    def _surface_placement(self, position_box2d):
+        if not self.physics_manager: return None
+        placement = self.physics_manager.find_surface(position_box2d, PORTAL_SNAP_DISTANCE, DEFAULT_PORTAL_HEIGHT)
+        if placement is None: return None
+        (x, y), angle = placement
+        offset = DEFAULT_PORTAL_WIDTH / 2 # The whole sensor in front of the wall, so objects reach it before the wall
+        return (x + math.cos(angle) * offset, y + math.sin(angle) * offset), angle
+
+    def _is_on_wall(self, portal):
+        """Whether a portal sits where find_placement would put one, flat against a wall and facing out."""
+        placement = self._surface_placement(portal.position)
+        if placement is None: return False
+        (x, y), angle = placement
+        close = (x - portal.position.x) ** 2 + (y - portal.position.y) ** 2 < (DEFAULT_PORTAL_WIDTH / 4) ** 2
+        return close and math.cos(angle - portal.angle) > 0.99
+
+    def start_portal_creation(self, start_pos_box2d):
+        """Initiates the portal creation drag sequence at the wall nearest the cursor (world coordinates)."""
         if not self.physics_manager: return False
-        valid_surface_found = True
-        surface_angle = 0.0
+        placement = self.find_placement(start_pos_box2d)
 
-        if valid_surface_found:
+        if placement:
+            surface_pos, surface_angle = placement
             self.creation_state['active'] = True
-            self.creation_state['start_pos_pygame'] = start_pos_pygame
+            self.creation_state['start_pos_box2d'] = surface_pos
             self.creation_state['start_angle'] = surface_angle
             return True
         else:
+            print("No free wall near the cursor for a portal.")
             return False
 
 
-    def finish_portal_creation(self, end_pos_pygame):
-        """Completes portal creation, creating the pair."""
+    def finish_portal_creation(self, end_pos_box2d):
+        """Completes portal creation at the wall nearest `end_pos_box2d`, creating the pair."""
         if not self.creation_state['active'] or not self.physics_manager:
             self.cancel_portal_creation()
             return
 
-        start_pos_pygame = self.creation_state['start_pos_pygame']
+        start_pos_box2d = self.creation_state['start_pos_box2d']
         start_angle = self.creation_state['start_angle']
 
-        valid_end_surface = True
-        end_angle = math.pi / 2
-
-        if valid_end_surface and start_pos_pygame:
-            start_pos_box2d = to_box2d(start_pos_pygame)
-            end_pos_box2d = to_box2d(end_pos_pygame)
-
-            self._create_pair(start_pos_box2d, start_angle, end_pos_box2d, end_angle)
+        placement = self.find_placement(end_pos_box2d)
+        if placement and start_pos_box2d is not None:
+            end_pos_box2d, end_angle = placement
+            if (end_pos_box2d[0] - start_pos_box2d[0]) ** 2 + (end_pos_box2d[1] - start_pos_box2d[1]) ** 2 \
+                    < DEFAULT_PORTAL_HEIGHT ** 2:
+                print("Portal ends would overlap.")
+            else:
+                self._create_pair(start_pos_box2d, start_angle, end_pos_box2d, end_angle)
         else:
              print("Invalid end surface or start position lost.")
 
@@ -168,15 +301,19 @@ class PortalManager:
     def cancel_portal_creation(self):
          """Resets the portal creation state."""
          self.creation_state['active'] = False
-         self.creation_state['start_pos_pygame'] = None
+         self.creation_state['start_pos_box2d'] = None
          self.creation_state['start_angle'] = None
 
 
+    def create_pair(self, pos1_box2d, angle1_rad, pos2_box2d, angle2_rad):
+        """Creates a linked portal pair at world positions (meters). Returns the pair id, or None."""
+        return self._create_pair(pos1_box2d, angle1_rad, pos2_box2d, angle2_rad)
+
     def _create_pair(self, pos1_box2d, angle1_rad, pos2_box2d, angle2_rad):
         """Internal helper to create a linked pair and their physics bodies."""
         if not self.physics_manager:
             print("Error: Cannot create portal pair without PhysicsManager.")
-            return
+            return None
 
         pair_id = self.next_pair_id
         color = PORTAL_COLORS[pair_id % len(PORTAL_COLORS)]
@@ -185,67 +322,179 @@ class PortalManager:
         portal2 = Portal(pos2_box2d, angle2_rad, color, pair_id)
 
         portal1.link(portal2)
+        portal1.on_wall = self._is_on_wall(portal1)
+        portal2.on_wall = self._is_on_wall(portal2)
 
         body1_created = self.physics_manager.add_portal(portal1)
         body2_created = self.physics_manager.add_portal(portal2)
 
         if body1_created and body2_created:
-            self.portal_pairs[pair_id] = [portal1, portal2]
+            self.registry.add_pair(pair_id, portal1, portal2)
             self.next_pair_id += 1
             print(f"Created portal pair {pair_id}")
-        else:
-            print(f"Failed to create physics bodies for portal pair {pair_id}. Aborting.")
-            if body1_created and portal1.body: self.physics_manager.destroy_body(portal1.body)
-            if body2_created and portal2.body: self.physics_manager.destroy_body(portal2.body)
+            return pair_id
+        print(f"Failed to create physics bodies for portal pair {pair_id}. Aborting.")
+        if body1_created and portal1.body: self.physics_manager.destroy_body(portal1.body)
+        if body2_created and portal2.body: self.physics_manager.destroy_body(portal2.body)
+        return None
 
 
     def delete_portal_pair(self, pair_id):
          """Deletes a portal pair and schedules their bodies for destruction."""
-         if pair_id in self.portal_pairs:
-              portal_a, portal_b = self.portal_pairs[pair_id]
+         pair = self.registry.remove_pair(pair_id)
+         if pair:
+              portal_a, portal_b = pair
               portal_a.schedule_deletion()
               portal_b.schedule_deletion()
+              self._cooling_portals.discard(portal_a)
+              self._cooling_portals.discard(portal_b)
               if portal_a.body: self.physics_manager.destroy_body(portal_a.body)
               if portal_b.body: self.physics_manager.destroy_body(portal_b.body)
-              del self.portal_pairs[pair_id]
               print(f"Deleted portal pair {pair_id}")
 
-    def cleanup_deleted_portals(self):
-         """Removes portal pairs where portals are marked for deletion."""
-         ids_to_remove = [pid for pid, pair in self.portal_pairs.items() if pair[0].marked_for_deletion or pair[1].marked_for_deletion]
-         for pid in ids_to_remove:
-              if pid in self.portal_pairs:
-                   del self.portal_pairs[pid]
-
-
     def get_all_portals(self):
-        """Returns a flat list of all active, individual portal instances."""
-        all_portals = []
-        for pair in self.portal_pairs.values():
-            if pair[0] and not pair[0].marked_for_deletion: all_portals.append(pair[0])
-            if pair[1] and not pair[1].marked_for_deletion: all_portals.append(pair[1])
-        return all_portals
+        """Returns a cached tuple of all active, individual portal instances."""
+        return self.registry.get_portals()
+
+    def get_portal_for_body(self, body):
+        """Looks up the portal owning a Box2D body, or None."""
+        return self.registry.get_portal_for_body(body)
 
     def queue_teleportation(self, obj, entry_portal):
         """Add object and entry portal to the queue for processing after physics step."""
-        current_time = pygame.time.get_ticks() / 1000.0
         exit_portal = entry_portal.linked_portal
 
         if not obj or not obj.body or not exit_portal:
             return
-        if not exit_portal.can_teleport(obj.id, current_time):
-            return
 
         if (obj, entry_portal) not in self.teleport_queue:
             self.teleport_queue.append((obj, entry_portal))
             obj.teleporting = True
 
+    # --- Straddling: objects part-way through a portal ---
+
+    def begin_straddle(self, obj, portal):
+        """Notes that `obj` started overlapping `portal`. Called from the contact listener, so it
+        only reads the bodies. The side is taken from where the center was a step ago, so an
+        object fast enough to be past the center plane already still counts as coming in."""
+        body = obj.body
+        velocity = body.linearVelocity
+        nx, ny = portal.normal
+        depth = portal.depth_of(body.worldCenter) - (velocity.x * nx + velocity.y * ny) * TIME_STEP
+        self.straddles.setdefault((obj, portal), 1 if depth >= 0 else -1) # Kept if a teleport already set it
+
+    def end_straddle(self, obj, portal):
+        """Notes that `obj` stopped overlapping `portal` (contact listener; its ghost goes next update)."""
+        self.straddles.pop((obj, portal), None)
+
+    def update_straddles(self, physics_manager):
+        """After each step: queues the objects whose center crossed a portal they straddle, and
+        moves a ghost along with each one that is partly through.
+
+        The ghost is a kinematic copy of the object placed where the object would be
+        on the other side, so whatever is by the exit portal gets pushed by the part
+        that is already through. Ghosts come from physics_manager.ghosts (a pool).
+        """
+        ghosts = self._ghosts
+        pool = physics_manager.ghosts
+        straddles = self.straddles
+        if ghosts:
+            for key in [key for key in ghosts if key not in straddles]:
+                pool.release(ghosts.pop(key))
+        if not straddles: return
+
+        for key, side in list(straddles.items()):
+            obj, portal = key
+            body = obj.body
+            if body is None or obj.marked_for_deletion or portal.marked_for_deletion or not portal.linked_portal:
+                del straddles[key]
+                if key in ghosts: pool.release(ghosts.pop(key))
+                continue
+            if obj.teleporting: continue # Already queued through another portal
+
+            center = body.worldCenter
+            depth = portal.depth_of(center) * side
+            if depth < 0 or depth >= obj.get_bounding_radius():
+                if key in ghosts: pool.release(ghosts.pop(key)) # Crossed, or not through yet
+                if depth < 0:
+                    del straddles[key]
+                    self.teleport_queue.append((obj, portal))
+                    obj.teleporting = True
+                continue
+
+            position, angle, velocity, angular_velocity = portal.map_to_exit(
+                center, body.angle, body.linearVelocity, body.angularVelocity)
+            ghost = ghosts.get(key)
+            if ghost is None:
+                ghosts[key] = ghost = pool.acquire(obj, position, angle)
+            else:
+                ghost.transform = (position, angle)
+            ghost.linearVelocity = velocity # Kinematic: carried through the next step, and used for contact response
+            ghost.angularVelocity = angular_velocity
+
+    def reset_straddles(self):
+        """Re-reads straddle sides from where the objects are now and parks every ghost.
+
+        For bodies moved by hand (rewind): their contacts with portal sensors
+        carry over, so no new BeginContact would correct the recorded sides.
+        """
+        pool = self.physics_manager.ghosts if self.physics_manager else None
+        for ghost in self._ghosts.values():
+            if pool: pool.release(ghost)
+        self._ghosts.clear()
+        for obj, portal in list(self.straddles):
+            if obj.body is None or obj.marked_for_deletion or portal.marked_for_deletion:
+                del self.straddles[(obj, portal)]
+            else:
+                self.straddles[(obj, portal)] = 1 if portal.depth_of(obj.body.worldCenter) >= 0 else -1
+
+    def get_ghost_poses(self):
+        """(obj, (x, y), angle) for every active ghost, for drawing objects on both sides of a portal."""
+        return [(obj, (ghost.position.x, ghost.position.y), ghost.angle) for (obj, _), ghost in self._ghosts.items()]
+
+    def get_wall_portals(self):
+        """Cached tuple of linked portals mounted flat on a wall."""
+        if self._wall_portals_version != self.registry.version:
+            self._wall_portals = tuple(portal for portal in self.registry.get_portals()
+                                       if portal.on_wall and portal.linked_portal)
+            self._wall_portals_version = self.registry.version
+        return self._wall_portals
+
+    def wall_portals_in_use(self):
+        """Whether any body is near a wall-mounted portal. Box2D keeps a contact for every body whose
+        bounding box, stretched along its motion, overlaps the sensor, so this turns true a few
+        steps before an object can reach the wall behind it."""
+        for portal in self.get_wall_portals():
+            if portal.body and next(iter(portal.body.contacts_gen), None) is not None:
+                return True
+        return False
+
+    def in_wall_mouth(self, points):
+        """True if all the (x, y) contact points lie on the wall behind one wall-mounted portal.
+
+        WallPortalContactListener then switches off that wall contact, so objects
+        can move into the wall through the portal's opening. Runs inside the step
+        (world locked) and only reads portal data.
+        """
+        for portal in self.get_wall_portals():
+            nx, ny = portal.normal
+            px, py = portal.position.x, portal.position.y
+            half = portal.size[1] / 2
+            for x, y in points:
+                dx, dy = x - px, y - py
+                depth = dx * nx + dy * ny
+                if depth > 0 or depth < -half or abs(dy * nx - dx * ny) > half: break
+            else:
+                return True
+        return False
+
     def process_teleportation_queue(self, physics_manager):
-        """Handles actual teleportation for items in the queue."""
+        """Handles actual teleportation for items in the queue, up to PORTAL_MAX_HOPS chained hops each."""
         if not self.teleport_queue: return
 
         processed_objects_this_frame = set()
-        current_time = pygame.time.get_ticks() / 1000.0
+        current_time = self.get_time()
+        self.transit.refresh(self.registry)
 
         for obj, entry_portal in self.teleport_queue:
             if obj in processed_objects_this_frame or not obj or obj.marked_for_deletion or not obj.body:
@@ -257,22 +506,37 @@ class PortalManager:
                  obj.teleporting = False # Reset flag if cannot teleport
                  continue # Skip if no valid exit portal
 
-            if not exit_portal.can_teleport(obj.id, current_time):
-                 obj.teleporting = False # Reset flag
-                 continue # Skip if on cooldown
-
-            # Get the transforms
-            exit_pos, exit_angle, exit_vel, exit_ang_vel = entry_portal.get_exit_transform(obj.body)
-            
-            # Store last exit position to help with anti-oscillation logic
-            exit_portal.last_exit_pos[obj.id] = Box2D.b2Vec2(exit_pos)
-            entry_portal.last_exit_pos[obj.id] = Box2D.b2Vec2(exit_pos)  # Store in both portals
+            body = obj.body
+            position, angle = Box2D.b2Vec2(body.worldCenter), body.angle
+            velocity, angular_velocity = body.linearVelocity, body.angularVelocity
+
+            # Follow the chain: an exit that lands straight in another portal goes on through it now.
+            # Nothing is committed until the body has moved; `cooling` stands in for the hops' cooldowns.
+            hops = [] # (entry portal, exit portal, entry_pos, exit_pos) per teleport
+            portal, visited, cooling = entry_portal, None, set()
+            while True:
+                exit_portal = portal.linked_portal
+                entry_pos = (position.x, position.y)
+                position, angle, velocity, angular_velocity = portal.map_to_exit(position, angle, velocity, angular_velocity)
+                hops.append((portal, exit_portal, entry_pos, (position.x, position.y)))
+                cooling.add(portal)
+                cooling.add(exit_portal)
+
+                if len(hops) >= PORTAL_MAX_HOPS: break
+                next_portal = self.transit.next_hop(portal, obj, position, angle, velocity, current_time, cooling)
+                if next_portal is None: break
+                if portal in self.transit.looping:
+                    if visited is None:
+                        visited = {hop[0] for hop in hops}
+                    if next_portal in visited: break # Would go round the same portals forever
+                    visited.add(next_portal)
+                portal = next_portal
 
             try:
-                obj.body.transform = (Box2D.b2Vec2(exit_pos), exit_angle)
-                obj.body.linearVelocity = exit_vel
-                obj.body.angularVelocity = exit_ang_vel
-                obj.body.awake = True
+                body.transform = (position, angle)
+                body.linearVelocity = velocity
+                body.angularVelocity = angular_velocity
+                body.awake = True
             except Exception as e:
                  print(f"FATAL ERROR during teleport body transform: {e}")
                  obj.teleporting = False
@@ -280,29 +544,67 @@ class PortalManager:
 
             obj.update_from_physics()
 
-            # Apply cooldown to both portals
-            exit_portal.start_cooldown(obj.id, current_time)
+            # Cooldown on both portals of each hop; it only keeps chained hops from going straight back
+            for _, hop_exit, _, _ in hops:
+                hop_exit.start_cooldown(obj.id, current_time)
+            self._cooling_portals.update(cooling)
+
+            # The object now straddles the exit, having come out in front of it; set the side
+            # here, since a contact it already had with that sensor would not begin again
+            if self.transit.overlaps(obj, exit_portal, position, angle):
+                self.straddles[(obj, exit_portal)] = 1 if exit_portal.depth_of(position) >= 0 else -1
 
             obj.teleporting = False
             processed_objects_this_frame.add(obj)
 
+            for hop_entry, hop_exit, entry_pos, exit_pos in hops:
+                for listener in self.teleport_listeners:
+                    try:
+                        listener(obj, hop_entry, hop_exit, entry_pos, exit_pos)
+                    except Exception as e:
+                        print(f"Error in teleport listener: {e}")
+
         self.teleport_queue.clear()
 
 
     def update(self, dt):
         """Update portal states, like cooldowns."""
-        current_time = pygame.time.get_ticks() / 1000.0
-        for portal in self.get_all_portals():
+        if not self._cooling_portals: return
+        current_time = self.get_time()
+        for portal in list(self._cooling_portals):
              portal.update_cooldowns(current_time)
-        self.cleanup_deleted_portals()
+             if not portal.cooldown_end_times:
+                  self._cooling_portals.discard(portal)
 
 
-    def get_creation_preview_line(self):
-        """Return start/end points (Pygame coords) for rendering the portal creation line."""
-        if self.creation_state['active'] and self.creation_state['start_pos_pygame']:
-            return self.creation_state['start_pos_pygame'], pygame.mouse.get_pos()
-        return None
+    def clear_cooldowns(self):
+        """Drops every cooldown (before restoring saved ones)."""
+        for portal in self.get_all_portals():
+            portal.cooldown_end_times.clear()
+        self._cooling_portals.clear()
+
+    def set_cooldown(self, portal, obj_id, end_time):
+        """Restores one cooldown entry on a single portal (start_cooldown covers both ends)."""
+        portal.cooldown_end_times[obj_id] = end_time
+        self._cooling_portals.add(portal)
+
+    def get_creation_preview_line(self, cursor_pygame):
+        """Return start/end points (Pygame coords) for rendering the portal creation line.
+
+        The line ends where the second portal would snap, or at the cursor when
+        there is no wall for it. Cheap enough to call every frame (see SurfaceIndex),
+        and safe from the render thread: it reads no portal or Box2D state.
+        """
+        if not self.creation_state['active']: return None
+        return self.get_preview_line_from(self.creation_state['start_pos_box2d'], cursor_pygame)
+
+    def get_preview_line_from(self, start_pos_box2d, cursor_pygame):
+        """get_creation_preview_line for a given start, e.g. the one in a physics snapshot."""
+        if start_pos_box2d is None: return None
+        placement = self._surface_placement(to_box2d(cursor_pygame))
+        end_pos = to_pygame(placement[0]) if placement else cursor_pygame
+        return to_pygame(start_pos_box2d), end_pos
 
     def get_portal_count(self):
         """Returns the number of individual portals active."""
-        return len(self.get_all_portals())
\ No newline at end of file
+        return len(self.registry)
\ No newline at end of file
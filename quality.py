@@ -0,0 +1,76 @@
+from collections import deque
+from settings import (FPS, QUALITY_TIERS, QUALITY_WINDOW_FRAMES, QUALITY_DOWNGRADE_RATIO,
+                      QUALITY_UPGRADE_RATIO, QUALITY_UPGRADE_DELAY, QUALITY_COOLDOWN)
+
+class QualityGovernor:
+    """Picks a quality tier from rolling frame work times.
+
+    Work time is what a frame spends in input, update and render, without the
+    clock's sleep. When its average over a full window exceeds
+    `downgrade_ratio` of the frame budget, the governor drops one tier. When
+    the average stays below `upgrade_ratio` for `upgrade_delay` seconds, it
+    climbs one tier. After every change the window is cleared and no decision
+    is made for `cooldown` seconds. Together with the gap between the two
+    ratios, this keeps it from flip-flopping between tiers. The caller applies
+    the tier (see Game._apply_quality_tier).
+    """
+    def __init__(self, tiers=QUALITY_TIERS, target_fps=FPS, window=QUALITY_WINDOW_FRAMES,
+                 downgrade_ratio=QUALITY_DOWNGRADE_RATIO, upgrade_ratio=QUALITY_UPGRADE_RATIO,
+                 upgrade_delay=QUALITY_UPGRADE_DELAY, cooldown=QUALITY_COOLDOWN):
+        self.tiers = tiers
+        self.tier_index = 0
+        self.budget_ms = 1000.0 / target_fps
+        self.downgrade_ratio = downgrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.upgrade_delay = upgrade_delay
+        self.cooldown = cooldown
+        self.enabled = True
+        self._samples = deque(maxlen=window)
+        self._total = 0.0
+        self._hold_until = 0.0
+        self._fast_since = None
+
+    def get_tier(self):
+        return self.tiers[self.tier_index]
+
+    def get_name(self):
+        return self.get_tier()['name']
+
+    def get_average_ms(self):
+        return self._total / len(self._samples) if self._samples else 0.0
+
+    def record_frame(self, work_ms, now):
+        """Adds one frame's work time (ms) at time `now` (s). Returns the new tier if it changed, else None."""
+        samples = self._samples
+        if len(samples) == samples.maxlen:
+            self._total -= samples[0]
+        samples.append(work_ms)
+        self._total += work_ms
+
+        if not self.enabled or now < self._hold_until or len(samples) < samples.maxlen:
+            return None
+        average = self._total / len(samples)
+        if average > self.budget_ms * self.downgrade_ratio:
+            if self.tier_index < len(self.tiers) - 1:
+                return self._change(self.tier_index + 1, now)
+            self._fast_since = None
+        elif average < self.budget_ms * self.upgrade_ratio and self.tier_index > 0:
+            if self._fast_since is None:
+                self._fast_since = now
+            elif now - self._fast_since >= self.upgrade_delay:
+                return self._change(self.tier_index - 1, now)
+        else:
+            self._fast_since = None
+        return None
+
+    def set_tier(self, index, now=0.0):
+        """Forces a tier (e.g. from a setting or a key); the governor keeps adapting from there."""
+        return self._change(max(0, min(len(self.tiers) - 1, index)), now)
+
+    def _change(self, index, now):
+        self.tier_index = index
+        self._samples.clear()
+        self._total = 0.0
+        self._fast_since = None
+        self._hold_until = now + self.cooldown
+        return self.get_tier()
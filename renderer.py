@@ -2,43 +2,186 @@ import pygame
 import math
 from settings import (COLOR_BACKGROUND, COLOR_DEBUG, COLOR_TEXT, COLOR_UI_ACCENT,
                         HUD_FONT_SIZE, to_pygame, Box2D,
-                      COLOR_GRID, COLOR_PORTAL_PREVIEW, PPM, scalar_to_pygame) # Add Grid, Preview colors
-from utils import draw_text, is_sensor # Add our new utility function import
+                      COLOR_GRID, COLOR_PORTAL_PREVIEW, COLOR_EMITTER, PPM, scalar_to_pygame, # Add Grid, Preview colors
+                      USER_DATA_WALL, COLOR_WALL, GRID_SIZE,
+                      DIRTY_RECT_MODE, DIRTY_RECT_MAX_FRACTION, STATIC_LAYER_MARGIN, HUD_TEXT_REFRESH_INTERVAL,
+                      USE_SPRITE_ATLAS, PORTAL_VIEWS_ENABLED, LOD_ENABLED, LOD_DETAIL_MIN_RADIUS_PX, LOD_OUTLINE_MIN_PX)
+from utils import draw_text, ThrottledValue # Add our new utility function import
+from sprites import SpriteAtlas
+from lod import LevelOfDetail
+from debug_draw import PhysicsDebugDraw
+from portal_views import PortalViewCache
+
+EMITTER_MARKER_PX = 10 # Length of an emitter marker's direction line
 
 class Renderer:
-    def __init__(self, screen, assets):
+    def __init__(self, screen, assets, camera=None, offscreen=False):
         self.screen = screen
-        self.assets = assets # Dictionary containing loaded fonts, etc.
-        # Fallback to default system font if specific font wasn't loaded
-        self.debug_font = self.assets.get('debug_font', pygame.font.SysFont("monospace", 15))
-        self.hud_font = self.assets.get('hud_font', pygame.font.SysFont(None, HUD_FONT_SIZE)) # Use setting size
+        self.offscreen = offscreen # Render into `screen` only; never touch the display
+        self.camera = camera # Optional; the grid follows it and the background is keyed on it
+        self.assets = assets # Dictionary containing loaded fonts, etc. (filled in the background at startup)
+
+        # Pre-rasterized object sprites; None draws every object with pygame.draw primitives
+        self.sprite_atlas = SpriteAtlas() if USE_SPRITE_ATLAS else None
+
+        # Size/crowding based level of detail for objects
+        self.lod = LevelOfDetail()
+        self.lod.enabled = LOD_ENABLED
+
+        # Cached "see-through" views around portals; None disables them
+        self.portal_views = PortalViewCache(self.sprite_atlas) if PORTAL_VIEWS_ENABLED else None
+
+        # Debug overlay (wireframes, AABBs, contacts, ...) drawn from cached fixture geometry
+        self.debug_draw = PhysicsDebugDraw(camera)
+
+        # Fast-changing text values are only refreshed at this rate so their surfaces stay cached.
+        # Timed by the game's frame clock (game_state['frame_time']) so fixed-dt runs refresh
+        # them on the same frames every time; wall-clock ticks when no frame clock is given.
+        self._fps_display = ThrottledValue(HUD_TEXT_REFRESH_INTERVAL)
+        self._debug_info_display = ThrottledValue(HUD_TEXT_REFRESH_INTERVAL)
+        self._frame_time = None
+
+        # Static layer (fill + grid + static bodies) baked in world space around the view, a
+        # STATIC_LAYER_MARGIN of the view past each edge. It is rebuilt only when its key
+        # (zoom, screen size, grid) changes or the view pans off it; otherwise panning just
+        # copies a different part of it into the screen-sized background.
+        self.show_grid = True
+        self.static_world = None
+        self._static_layer = None
+        self._static_layer_origin = (0.0, 0.0) # World point at the layer's bottom-left corner
+        self._background = None
+        self._background_key = None
+        self._background_view = None # Layer pixel shown at the screen's top-left
+
+        # Reduced-resolution world rendering (see set_render_scale); dirty-rect mode is skipped below 1.0
+        self.render_scale = 1.0
+        self._scaled_target = None
+
+        # Dirty-rect mode: only regions whose contents changed are redrawn and pushed
+        self.dirty_rect_mode = DIRTY_RECT_MODE
+        self.dirty_rect_max_fraction = DIRTY_RECT_MAX_FRACTION
+        self._prev_items = {} # key -> (screen rect, render signature) from last frame
+        self._prev_view = None # Camera/screen the previous frame's rects were computed for
+        self._needs_full_redraw = True
+        self.last_dirty_rect_count = 0 # For debug overlay / profiling; -1 means full flip
+
+    @property
+    def hud_font(self):
+        return self.assets.get('hud_font')
+
+    @property
+    def debug_font(self):
+        return self.assets.get('debug_font')
+
+    def set_dirty_rect_mode(self, enabled):
+        """Enables/disables dirty-rect rendering. The next frame is always a full redraw."""
+        self.dirty_rect_mode = enabled
+        self._needs_full_redraw = True
+        self._prev_items = {}
+
+    def set_text_refresh_interval(self, interval):
+        """Sets how often (seconds) FPS and debug overlay values are re-read."""
+        self._fps_display.interval = interval
+        self._debug_info_display.interval = interval
+
+    def set_static_world(self, world):
+        """Sets the world whose static bodies are baked into the background layer."""
+        self.static_world = world
+        self.invalidate_background()
+
+    def invalidate_background(self):
+        """Forces the background layer to be rebuilt on the next frame (e.g. new static geometry)."""
+        self._background_key = None
+
+    def _background_cache_key(self):
+        scale = self.camera.scale if self.camera else None # Position is left out: panning reuses the layer
+        return (self.screen.get_size(), self.show_grid, scale)
+
+    def _get_background(self):
+        """Returns the screen-sized background, copied from the static layer when the view moved."""
+        key = self._background_cache_key()
+        view = self._static_layer_view()
+        if self._static_layer is None or key != self._background_key or view is None:
+            self._build_static_layer()
+            self._background = self._new_surface(self.screen.get_size())
+            self._background_key = key
+            self._background_view = None
+            view = self._static_layer_view()
+        if view != self._background_view:
+            self._background.blit(self._static_layer, (0, 0), (view, self.screen.get_size()))
+            self._background_view = view
+            self._needs_full_redraw = True
+        return self._background
+
+    def _static_layer_view(self):
+        """Top-left layer pixel under the screen's top-left, or None if the screen is not all on the layer."""
+        if not self.camera:
+            return (0, 0)
+        scale = self.camera.scale
+        origin_x, origin_y = self._static_layer_origin
+        screen_w, screen_h = self.screen.get_size()
+        layer_w, layer_h = self._static_layer.get_size() if self._static_layer else (0, 0)
+        x = round((self.camera.offset_x - origin_x) * scale)
+        y = layer_h - screen_h - round((self.camera.offset_y - origin_y) * scale)
+        if x < 0 or y < 0 or x + screen_w > layer_w or y + screen_h > layer_h:
+            return None
+        return (x, y)
+
+    @staticmethod
+    def _new_surface(size):
+        surface = pygame.Surface(size)
+        try:
+            surface = surface.convert()
+        except pygame.error:
+            pass # No display mode set; an unconverted surface still blits correctly
+        return surface
+
+    def _build_static_layer(self):
+        """Bakes fill, grid and static bodies for the view plus STATIC_LAYER_MARGIN around it."""
+        screen_w, screen_h = self.screen.get_size()
+        if self.camera:
+            margin_w, margin_h = int(screen_w * STATIC_LAYER_MARGIN), int(screen_h * STATIC_LAYER_MARGIN)
+            scale = self.camera.scale
+            origin = (self.camera.offset_x - margin_w / scale, self.camera.offset_y - margin_h / scale)
+            size = (screen_w + 2 * margin_w, screen_h + 2 * margin_h)
+        else:
+            scale, origin, size = PPM, (0.0, 0.0), (screen_w, screen_h)
+        layer_h = size[1]
+        def project(x, y):
+            return (int((x - origin[0]) * scale), int(layer_h - (y - origin[1]) * scale))
+
+        surface = self._new_surface(size)
+        surface.fill(COLOR_BACKGROUND)
+        if self.show_grid:
+            self._draw_grid(surface, origin, scale)
+        if self.static_world:
+            self._draw_static_bodies(surface, self.static_world, project)
+        self._static_layer = surface
+        self._static_layer_origin = origin
 
     def render_all(self, game_state):
         """Main render function, draws everything based on game state."""
         if not self.screen: return # Cannot render without a screen
-
-        # 1. Background Clear & Grid
-        self.screen.fill(COLOR_BACKGROUND)
-        self._draw_grid() # Draw subtle background grid
-
-        # 2. Render Portals (Draw portals underneath objects)
-        for portal in game_state.get('portals', []):
-            portal.draw(self.screen, self) # Delegate drawing to portal object
-
-        # 3. Render Portal Creation Preview Line
-        preview_line = game_state.get('portal_preview_line')
-        if preview_line:
-             start_pos, end_pos = preview_line
-             try: # Add error handling for drawing functions
-                 pygame.draw.line(self.screen, COLOR_PORTAL_PREVIEW, start_pos, end_pos, 3) # Thicker line
-             except Exception as e:
-                  print(f"Error drawing portal preview line: {e}")
-
-        # 4. Render Objects
-        for obj in game_state.get('objects', []):
-            # Delegate drawing to the object's draw method
-            # This allows different object types to draw themselves
-            obj.draw(self.screen, self)
+        self._frame_time = game_state.get('frame_time')
+
+        if self.dirty_rect_mode and self.render_scale >= 1.0:
+            self._render_dirty_rect_mode(game_state)
+            return
+
+        # 1-4. World layers, at reduced resolution and scaled up when render_scale < 1
+        if self.render_scale < 1.0 and self.camera:
+            target = self._get_scaled_target()
+            full_screen = self.screen
+            factor = target.get_width() / full_screen.get_width()
+            self.screen = target
+            try:
+                with self.camera.render_scaled(factor):
+                    self._draw_world(game_state, factor)
+            finally:
+                self.screen = full_screen
+            pygame.transform.scale(target, full_screen.get_size(), full_screen)
+        else:
+            self._draw_world(game_state)
 
         # 5. Render UI Elements (Buttons, HUD)
         self._draw_hud(game_state.get('hud_info', {}))
@@ -54,19 +197,269 @@ class Renderer:
             # Draw physics wireframes
             physics_world = game_state.get('physics_world')
             if physics_world:
-                self._draw_physics_debug(physics_world)
+                self._draw_physics_debug(physics_world, game_state.get('physics_geometry', {}))
             # Draw debug text info
             self._draw_debug_info(game_state.get('debug_info', {}))
 
         # 7. Flip Display to show the rendered frame
+        self._present()
+
+
+    def _update_portal_views(self, game_state):
+        """Refreshes cached portal views; returns [(portal_id, surface, screen_rect, version)]."""
+        if self.portal_views is None: return []
         try:
-            pygame.display.flip()
+            return self.portal_views.update(game_state.get('portals', []), game_state.get('portal_view_source'))
+        except Exception as e:
+            print(f"Error updating portal views: {e}")
+            return []
+
+    def _draw_world(self, game_state, pixel_scale=1.0):
+        """Draws background, portal views, portals, preview line, objects and particles onto self.screen."""
+        # 1. Background, grid and static geometry (one blit of the cached layer)
+        self.screen.blit(self._get_background(), (0, 0))
+
+        # 2. Portal views, then portals (both underneath objects)
+        for _, surface, rect, _ in self._update_portal_views(game_state):
+            self.screen.blit(surface, rect)
+        for portal in game_state.get('portals', []):
+            portal.draw(self.screen, self) # Delegate drawing to portal object
+
+        # 3. Render Portal Creation Preview Line
+        preview_line = game_state.get('portal_preview_line')
+        if preview_line:
+             start_pos, end_pos = preview_line
+             if pixel_scale != 1.0: # Mouse positions are in full-resolution screen pixels
+                 start_pos = (int(start_pos[0] * pixel_scale), int(start_pos[1] * pixel_scale))
+                 end_pos = (int(end_pos[0] * pixel_scale), int(end_pos[1] * pixel_scale))
+             try: # Add error handling for drawing functions
+                 pygame.draw.line(self.screen, COLOR_PORTAL_PREVIEW, start_pos, end_pos, 3) # Thicker line
+             except Exception as e:
+                  print(f"Error drawing portal preview line: {e}")
+        for marker in game_state.get('emitters', ()):
+            self.draw_emitter(self.screen, marker)
+
+        # 4. Render Objects
+        self._draw_objects(game_state.get('objects', []))
+        particles = game_state.get('particles')
+        if particles:
+            particles.draw(self.screen, self)
+
+    def set_render_scale(self, scale):
+        """Renders the world layers at `scale` x the screen resolution (UI stays sharp). 1.0 is native."""
+        scale = max(0.25, min(1.0, scale))
+        if scale != self.render_scale:
+            self.render_scale = scale
+            self._scaled_target = None
+            self._needs_full_redraw = True
+
+    def _get_scaled_target(self):
+        width, height = self.screen.get_size()
+        size = (max(1, int(width * self.render_scale)), max(1, int(height * self.render_scale)))
+        if self._scaled_target is None or self._scaled_target.get_size() != size:
+            self._scaled_target = pygame.Surface(size).convert(self.screen)
+        return self._scaled_target
+
+
+    # --- Dirty-Rect Rendering ---
+
+    def _collect_frame_items(self, game_state):
+        """Builds the layer-ordered list of (key, rect, signature, always_dirty, draw) for this frame.
+
+        `draw` is called as draw(surface, renderer). Items without a screen rect
+        (e.g. hidden while teleporting) are left out, so their old area gets repaired.
+        Objects are drawn as one layer through the LOD/sprite batch: their items
+        have draw None, and the second return value is (index -> object, ids of the
+        full-detail objects, LOD points).
+        An object whose pose matches last frame's (e.g. asleep) keeps its cached rect.
+        """
+        items = []
+        for portal_id, surface, rect, version in self._update_portal_views(game_state):
+            draw = lambda target, renderer, v=surface, r=rect: target.blit(v, r)
+            items.append((('portal_view', portal_id), rect, version, False, draw))
+        for portal in game_state.get('portals', []):
+            rect = portal.get_screen_rect()
+            if rect:
+                items.append((('portal', portal.id), pygame.Rect(rect), None, False, portal.draw))
+
+        preview_line = game_state.get('portal_preview_line')
+        if preview_line:
+            (x1, y1), (x2, y2) = preview_line
+            rect = pygame.Rect(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1).inflate(6, 6)
+            draw = lambda surface, renderer, a=(x1, y1), b=(x2, y2): pygame.draw.line(surface, COLOR_PORTAL_PREVIEW, a, b, 3)
+            items.append((('preview',), rect, (x1, y1, x2, y2), False, draw))
+
+        for marker in game_state.get('emitters', ()):
+            x, y = to_pygame((marker[1], marker[2]))
+            r = EMITTER_MARKER_PX + 2
+            draw = lambda surface, renderer, m=marker: renderer.draw_emitter(surface, m)
+            items.append((('emitter', marker[0]), pygame.Rect(x - r, y - r, 2 * r, 2 * r), (x, y, marker[4]), False, draw))
+
+        camera = self.camera
+        view = (self.screen.get_size(), camera.offset_x, camera.offset_y, camera.scale) if camera else None
+        prev = self._prev_items if view == self._prev_view else {}
+        self._prev_view = view
+        object_items, objects = [], []
+        for obj in game_state.get('objects', []):
+            position = obj.position
+            pose = (position[0], position[1], obj.angle)
+            old = prev.get(('object', obj.id))
+            if old is not None and old[1] == pose and obj.is_drawable():
+                rect = old[0]
+            else:
+                rect = obj.get_screen_rect()
+                if not rect: continue
+                rect = pygame.Rect(rect)
+            object_items.append((('object', obj.id), rect, pose, False, None))
+            objects.append(obj)
+        full, points, tiles = self.lod.plan(objects, self.screen.get_size())
+        for rect, count in tiles: # Dense tiles, under the objects
+            draw = lambda surface, renderer, t=(rect, count): renderer.lod.draw_tiles(surface, [t])
+            items.append((('tile', rect.topleft), rect, count, False, draw))
+        frame_objects = dict(zip(range(len(items), len(items) + len(objects)), objects))
+        items += object_items
+
+        particles = game_state.get('particles')
+        rect = particles.get_screen_rect() if particles else None
+        if rect:
+            items.append((('particles',), rect, None, True, particles.draw))
+
+        if self.hud_font:
+            for index, (text, pos) in enumerate(self._hud_lines(game_state.get('hud_info', {}))):
+                rect = pygame.Rect(pos, self.hud_font.size(text))
+                draw = lambda surface, renderer, t=text, p=pos: draw_text(surface, t, p, self.hud_font, COLOR_TEXT)
+                items.append((('hud', index), rect, text, False, draw))
+
+        for element in game_state.get('ui_elements', []):
+            if getattr(element, 'visible', True) and hasattr(element, 'rect'):
+                signature = element.get_render_signature() if hasattr(element, 'get_render_signature') else None
+                items.append((('ui', id(element)), element.rect.inflate(2, 2), signature, False, element.draw))
+        return items, (frame_objects, {id(obj) for obj in full}, points)
+
+    def _compute_dirty_rects(self, items):
+        """Diffs this frame's items against the previous frame. Returns the rects to repair."""
+        prev = self._prev_items
+        current = {}
+        dirty = []
+        for key, rect, signature, always_dirty, _ in items:
+            current[key] = (rect, signature)
+            old = prev.get(key)
+            if old is None:
+                dirty.append(rect)
+            elif always_dirty or old[0] != rect or old[1] != signature:
+                dirty.append(old[0])
+                if rect != old[0]:
+                    dirty.append(rect)
+        for key, (rect, _) in prev.items():
+            if key not in current:
+                dirty.append(rect)
+        self._prev_items = current
+        return dirty
+
+    def _render_dirty_rect_mode(self, game_state):
+        background = self._get_background()
+        items, objects = self._collect_frame_items(game_state)
+        dirty = self._compute_dirty_rects(items)
+        debug = game_state.get('debug_mode', False)
+
+        screen_rect = self.screen.get_rect()
+        dirty = [r.clip(screen_rect) for r in dirty]
+        dirty = [r for r in dirty if r.width and r.height]
+        dirty_area = sum(r.width * r.height for r in dirty)
+        too_dirty = dirty_area > self.dirty_rect_max_fraction * screen_rect.width * screen_rect.height
+
+        if self._needs_full_redraw or debug or too_dirty:
+            # Full frame: background, every item, optional debug overlay, then flip
+            self.screen.blit(background, (0, 0))
+            self._draw_items(items, range(len(items)), objects)
+            if debug:
+                physics_world = game_state.get('physics_world')
+                if physics_world:
+                    self._draw_physics_debug(physics_world, game_state.get('physics_geometry', {}))
+                self._draw_debug_info(game_state.get('debug_info', {}))
+            # The debug overlay is not tracked, so the frame after it must be full too
+            self._needs_full_redraw = debug
+            self.last_dirty_rect_count = -1
+            self._present()
+            return
+
+        self.last_dirty_rect_count = len(dirty)
+        if not dirty: return
+        item_rects = [item[1] for item in items]
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.screen.blit(background, rect, rect)
+            self._draw_items(items, rect.collidelistall(item_rects), objects, rect) # Ascending, so layer order is kept
+        self.screen.set_clip(None)
+        self._present(dirty)
+
+    def _draw_items(self, items, indices, objects, rect=None):
+        """Draws items[indices] in order; object items are batched through the LOD plan (limited to `rect`)."""
+        frame_objects, full_ids, points = objects
+        batch = []
+        for index in indices:
+            draw = items[index][4]
+            if draw is None:
+                batch.append(frame_objects[index])
+                continue
+            if batch:
+                self._draw_planned_objects(batch, full_ids, points, rect)
+                batch = []
+            draw(self.screen, self)
+        if batch:
+            self._draw_planned_objects(batch, full_ids, points, rect)
+
+    def _draw_planned_objects(self, objects, full_ids, points, rect):
+        """Draws the frame's LOD points (inside `rect`) and those of `objects` drawn in full detail."""
+        if rect is not None: # draw_points writes pixels directly, ignoring the clip
+            points = [p for p in points if rect.collidepoint(p[0], p[1])]
+        if points:
+            self.lod.draw_points(self.screen, points)
+        self._draw_full_detail([obj for obj in objects if id(obj) in full_ids])
+
+    def _present(self, rects=None):
+        """Pushes the frame to the display (whole screen, or just `rects`). No-op when offscreen."""
+        if self.offscreen: return
+        try:
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
         except pygame.error as e:
-             print(f"Error flipping display: {e}")
+            print(f"Error presenting frame: {e}")
+
+
+    def _draw_objects(self, objects):
+        """Draws objects as density tiles, single pixels or one batched sprite blit, by level of detail."""
+        objects, points, tiles = self.lod.plan(objects, self.screen.get_size())
+        self.lod.draw_tiles(self.screen, tiles)
+        if points:
+            self.lod.draw_points(self.screen, points)
+        self._draw_full_detail(objects)
+
+    def _draw_full_detail(self, objects):
+        """Draws objects with one batched sprite blit (objects without a sprite draw themselves)."""
+        if self.sprite_atlas is None:
+            for obj in objects:
+                # Delegate drawing to the object's draw method
+                # This allows different object types to draw themselves
+                obj.draw(self.screen, self)
+            return
+        sequence, fallback = self.sprite_atlas.build_blit_sequence(objects)
+        if sequence:
+            self.screen.blits(sequence, doreturn=False)
+        for obj in fallback:
+            obj.draw(self.screen, self)
 
 
     # --- Specific Drawing Methods (Called by Objects/Portals/Self) ---
 
+    def draw_sprite(self, surface, obj):
+        """Blits a single object's cached sprite (used when objects draw themselves)."""
+        sprite, half = self.sprite_atlas.get(obj.get_sprite_spec(), obj.angle)
+        x, y = obj.get_pygame_pos()
+        surface.blit(sprite, (x - half, y - half))
+
     def draw_circle(self, surface, color, pos_pygame, radius_pygame, angle_rad):
         """Draws a circle with an optional orientation line."""
         try:
@@ -75,7 +468,7 @@ class Renderer:
             pygame.draw.circle(surface, color, pos_pygame, draw_radius)
 
             # Draw orientation line if radius is large enough to see it
-            if draw_radius > 3:
+            if draw_radius > LOD_DETAIL_MIN_RADIUS_PX:
                 # Calculate end point of the line based on angle
                 # Remember Pygame's Y-axis is inverted for angle calculations
                 end_line_x = pos_pygame[0] + draw_radius * math.cos(angle_rad)
@@ -85,6 +478,14 @@ class Renderer:
         except Exception as e:
             print(f"Error drawing circle at {pos_pygame}: {e}")
 
+    def draw_dot(self, surface, color, pos_pygame, radius_pygame):
+        """Draws a plain filled circle (placeholder for objects without a shape)."""
+        pygame.draw.circle(surface, color, pos_pygame, radius_pygame)
+
+    def draw_rect(self, surface, color, rect, width=0):
+        """Draws an axis-aligned rectangle (fallback when a body has no polygon vertices)."""
+        pygame.draw.rect(surface, color, rect, width)
+
     def draw_polygon(self, surface, color, vertices_pygame):
         """Draws a filled polygon given vertices in Pygame coordinates."""
         if len(vertices_pygame) >= 3:
@@ -94,105 +495,125 @@ class Renderer:
                  print(f"Error drawing polygon with {len(vertices_pygame)} vertices: {e}")
         # else: Not enough vertices to draw a polygon
 
+    def draw_emitter(self, surface, marker):
+        """Draws an emitter as a ring with a line in its launch direction (faded when disabled)."""
+        _, x, y, direction, enabled = marker
+        center = to_pygame((x, y))
+        color = COLOR_EMITTER if enabled else COLOR_EMITTER.lerp(COLOR_BACKGROUND, 0.6)
+        end = (int(center[0] + EMITTER_MARKER_PX * math.cos(direction)),
+               int(center[1] - EMITTER_MARKER_PX * math.sin(direction)))
+        pygame.draw.circle(surface, color, center, EMITTER_MARKER_PX // 2, 2)
+        pygame.draw.line(surface, color, center, end, 2)
+
     def draw_portal(self, surface, color, vertices_pygame, angle_rad):
         """Draws a portal rectangle. (Basic version)."""
         if len(vertices_pygame) == 4:
             try:
                 # Base rectangle fill
                 pygame.draw.polygon(surface, color, vertices_pygame)
-                # Outline (slightly darker or contrasting color?)
-                outline_color = color.lerp(COLOR_TEXT, 0.5) # Mix portal color with text color
-                pygame.draw.polygon(surface, outline_color, vertices_pygame, 2) # Thickness 2
+                # Outline (slightly darker or contrasting color?), skipped when the portal is only a few pixels thick
+                thickness = min(math.dist(vertices_pygame[0], vertices_pygame[1]),
+                                math.dist(vertices_pygame[1], vertices_pygame[2]))
+                if thickness >= LOD_OUTLINE_MIN_PX:
+                    outline_color = color.lerp(COLOR_TEXT, 0.5) # Mix portal color with text color
+                    pygame.draw.polygon(surface, outline_color, vertices_pygame, 2) # Thickness 2
 
                 # TODO: Add subtle glow effect (e.g., draw larger blurred shape underneath)
-                # TODO: Add particle effects if active state is tracked
                 # TODO: Direction indicator could be a small animated chevron on exit event
 
             except Exception as e:
                 print(f"Error drawing portal with vertices {vertices_pygame}: {e}")
 
 
-    def _draw_grid(self, grid_size=50):
-        """Draws a subtle background grid."""
-        width, height = self.screen.get_size()
-        # Draw vertical lines
-        for x in range(0, width, grid_size):
-            try:
-                pygame.draw.line(self.screen, COLOR_GRID, (x, 0), (x, height), 1)
-            except Exception as e: print(f"Error drawing grid line: {e}")
-        # Draw horizontal lines
-        for y in range(0, height, grid_size):
-            try:
-                pygame.draw.line(self.screen, COLOR_GRID, (0, y), (width, y), 1)
-            except Exception as e: print(f"Error drawing grid line: {e}")
+    def _draw_grid(self, surface, origin, scale, grid_size=GRID_SIZE):
+        """Draws a subtle grid, anchored to world space, onto a layer whose bottom-left is world `origin`."""
+        width, height = surface.get_size()
+        try:
+            if not self.camera:
+                for x in range(0, width, grid_size):
+                    pygame.draw.line(surface, COLOR_GRID, (x, 0), (x, height), 1)
+                for y in range(0, height, grid_size):
+                    pygame.draw.line(surface, COLOR_GRID, (0, y), (width, y), 1)
+                return
+            # Double the world spacing while zoomed out so lines never get denser than half a cell
+            spacing_m = grid_size / PPM
+            while spacing_m * scale < grid_size / 2:
+                spacing_m *= 2
+            x0, y0 = origin
+            x = math.floor(x0 / spacing_m) * spacing_m
+            while x <= x0 + width / scale:
+                sx = int((x - x0) * scale)
+                pygame.draw.line(surface, COLOR_GRID, (sx, 0), (sx, height), 1)
+                x += spacing_m
+            y = math.floor(y0 / spacing_m) * spacing_m
+            while y <= y0 + height / scale:
+                sy = int(height - (y - y0) * scale)
+                pygame.draw.line(surface, COLOR_GRID, (0, sy), (width, sy), 1)
+                y += spacing_m
+        except Exception as e:
+            print(f"Error drawing grid: {e}")
 
+    def _draw_static_bodies(self, surface, world, project):
+        """Draws wall/static level geometry onto a layer; `project` maps world (x, y) to its pixels."""
+        try:
+            for body in world.bodies:
+                if body.type != Box2D.b2_staticBody: continue
+                user_data = body.userData if isinstance(body.userData, dict) else {}
+                if user_data.get('type') != USER_DATA_WALL: continue
+                transform = body.transform
+                for fixture in body.fixtures:
+                    shape = fixture.shape
+                    if isinstance(shape, Box2D.b2PolygonShape):
+                        vertices = [project(*(transform * v)) for v in shape.vertices]
+                        if len(vertices) >= 3:
+                            pygame.draw.polygon(surface, COLOR_WALL, vertices)
+        except Exception as e:
+            print(f"Error drawing static bodies: {e}")
 
-    def _draw_hud(self, hud_info):
-        """Draws the Heads-Up Display using the draw_text utility."""
-        if not self.hud_font: return # Cannot draw HUD without font
+
+    def _hud_lines(self, hud_info):
+        """Returns the HUD as a list of (text, top-left position) lines."""
         y_offset = 10
         x_pos = 10
         line_height = self.hud_font.get_height() + 2 # Add small spacing
 
-        # FPS Counter
-        fps_text = f"FPS: {hud_info.get('fps', 0):.0f}"
-        draw_text(self.screen, fps_text, (x_pos, y_offset), self.hud_font, COLOR_TEXT)
-        y_offset += line_height
-
-        # Object Count
-        obj_text = f"Objects: {hud_info.get('obj_count', 0)}"
-        draw_text(self.screen, obj_text, (x_pos, y_offset), self.hud_font, COLOR_TEXT)
-        y_offset += line_height
-
-        # Portal Count (Individual portals)
-        portal_text = f"Portals: {hud_info.get('portal_count', 0)}"
-        draw_text(self.screen, portal_text, (x_pos, y_offset), self.hud_font, COLOR_TEXT)
-        y_offset += line_height
-
-        # Gravity Status
         grav_status = "ON" if hud_info.get('gravity_on', False) else "OFF"
-        grav_text = f"Gravity: {grav_status}"
-        draw_text(self.screen, grav_text, (x_pos, y_offset), self.hud_font, COLOR_TEXT)
+        fps = self._fps_display.get(hud_info.get('fps', 0), self._get_text_clock())
+        texts = [
+            f"FPS: {fps:.0f}",
+            f"Objects: {hud_info.get('obj_count', 0)}",
+            f"Portals: {hud_info.get('portal_count', 0)}", # Individual portals
+            f"Gravity: {grav_status}",
+        ]
+        if hud_info.get('quality'):
+            texts.append(f"Quality: {hud_info['quality']}")
+        if hud_info.get('rewind'):
+            texts.append(f"Rewind: {hud_info['rewind']}")
+        lines = []
+        for text in texts:
+            lines.append((text, (x_pos, y_offset)))
+            y_offset += line_height
+        return lines
+
+    def _get_text_clock(self):
+        """Seconds on the clock that paces ThrottledValue refreshes."""
+        if self._frame_time is not None:
+            return self._frame_time
+        return pygame.time.get_ticks() / 1000.0
 
+    def _draw_hud(self, hud_info):
+        """Draws the Heads-Up Display using the draw_text utility."""
+        if not self.hud_font: return # Cannot draw HUD without font
+        for text, pos in self._hud_lines(hud_info):
+            draw_text(self.screen, text, pos, self.hud_font, COLOR_TEXT)
 
-    def _draw_physics_debug(self, world):
-        """Draws Box2D physics shapes (wireframes) for debugging."""
-        if not world: return
+
+    def _draw_physics_debug(self, world, geometry):
+        """Draws Box2D physics shapes (wireframes) and the other enabled debug layers."""
         try:
-            for body in world.bodies:
-                for fixture in body.fixtures:
-                    shape = fixture.shape
-                    # Use our safe is_sensor function
-                    is_fixture_sensor = is_sensor(fixture)
-                    draw_color = COLOR_DEBUG if not is_fixture_sensor else pygame.Color('cyan') # Sensors in cyan
-
-                    # Convert body transform for drawing
-                    transform = body.transform # b2Transform object
-                    try:
-                        if isinstance(shape, Box2D.b2PolygonShape):
-                            vertices = [(transform * v) for v in shape.vertices]
-                            vertices = [to_pygame(v) for v in vertices]
-                            if len(vertices) >= 2: # Need at least 2 points for lines/polygon
-                                pygame.draw.polygon(self.screen, draw_color, vertices, 1) # Wireframe only
-                        elif isinstance(shape, Box2D.b2CircleShape):
-                            center_world = transform * shape.pos # Center in world coords
-                            center_pygame = to_pygame(center_world)
-                            radius_pygame = scalar_to_pygame(shape.radius)
-                            if radius_pygame > 0:
-                                pygame.draw.circle(self.screen, draw_color, center_pygame, radius_pygame, 1) # Wireframe
-                                # Draw line for orientation
-                                angle = body.angle
-                                end_point_world = center_world + Box2D.b2Vec2(shape.radius * math.cos(angle), shape.radius * math.sin(angle))
-                                end_point_pygame = to_pygame(end_point_world)
-                                pygame.draw.line(self.screen, draw_color, center_pygame, end_point_pygame, 1)
-
-                        # TODO: Add drawing for Edge shapes, Chain shapes if used
-                    except Exception as e:
-                         # Don't halt all debug drawing for one shape error
-                         # print(f"Warning: Error drawing debug shape for body: {e}")
-                         pass # Continue to next fixture/body
+            self.debug_draw.draw(self.screen, world, geometry)
         except Exception as e:
-             print(f"Error iterating physics world bodies for debug draw: {e}")
+             print(f"Error drawing physics debug overlay: {e}")
 
 
     def _draw_debug_info(self, debug_info):
@@ -203,6 +624,7 @@ class Renderer:
          # Position debug info top-right or elsewhere as needed
          screen_width = self.screen.get_width()
          x_pos = screen_width - 260 # Adjust X based on expected text width
+         debug_info = self._debug_info_display.get(debug_info, self._get_text_clock())
 
          for key, value in debug_info.items():
               text = f"{key}: {value}"
@@ -0,0 +1,488 @@
+import math
+import socket
+import struct
+import time
+from collections import deque
+from settings import (TIME_STEP, WIDTH, HEIGHT, PPM, WORLD_WIDTH_M, WORLD_HEIGHT_M, SCENE_EMITTERS,
+                      COLOR_CIRCLE, COLOR_SQUARE, PORTAL_COLORS, DEFAULT_CIRCLE_RADIUS, DEFAULT_BOX_SIZE,
+                      DEFAULT_PORTAL_WIDTH, DEFAULT_PORTAL_HEIGHT,
+                      REPLICATION_HOST, REPLICATION_SEND_INTERVAL, REPLICATION_MAX_DATAGRAM,
+                      REPLICATION_HISTORY, REPLICATION_CLIENT_TIMEOUT, REPLICATION_INTERP_DELAY,
+                      REPLICATION_POS_MARGIN, REPLICATION_REPORT_INTERVAL)
+from simcore import Simulation
+from spawner import Emitter
+from threaded_physics import ObjectSnapshot, PortalSnapshot, WorldSnapshot
+
+# --- Wire format (little-endian). Viewers send _CLIENT_MSG; the server sends snapshot datagrams:
+# _HEADER, then `objects` _OBJECT records, `removed` object ids, and in part 0 only,
+# `pairs` _PAIR records and `removed pairs` pair ids.
+MAGIC = b'P2'
+MSG_HELLO, MSG_ACK, MSG_BYE, MSG_SNAPSHOT = 1, 2, 3, 4
+FLAG_GRAVITY = 1
+
+_CLIENT_MSG = struct.Struct('<2sBI')        # magic, type, snapshot seq (ACK)
+_HEADER = struct.Struct('<2sBBIIIHHHHHH')   # magic, type, flags, seq, baseline seq (0 = full), step,
+                                            # part, parts, objects, removed, pairs, removed pairs
+_OBJECT = struct.Struct('<IBHHH')           # id, shape code | teleport count << 4, x, y, angle
+_ID = struct.Struct('<I')
+_PAIR = struct.Struct('<IHHHHHH')           # pair id, x, y, angle of portal A, then of portal B
+
+SHAPE_CODES = {'circle': 0, 'box': 1}
+SHAPES = { # Code -> ObjectSnapshot.from_state arguments; objects are created with the default sizes
+    0: ('circle', COLOR_CIRCLE, DEFAULT_CIRCLE_RADIUS, None),
+    1: ('box', COLOR_SQUARE, None, DEFAULT_BOX_SIZE),
+}
+
+# Positions are 16-bit fixed point over the world plus a margin (about 1 mm for the default world)
+_QMAX = 0xFFFF
+_ORIGIN = -REPLICATION_POS_MARGIN
+_X_SCALE = _QMAX / (WORLD_WIDTH_M + 2 * REPLICATION_POS_MARGIN)
+_Y_SCALE = _QMAX / (WORLD_HEIGHT_M + 2 * REPLICATION_POS_MARGIN)
+_ANGLE_SCALE = 65536 / (2 * math.pi)
+
+def _quantize(value, scale):
+    q = int((value - _ORIGIN) * scale + 0.5)
+    return 0 if q < 0 else _QMAX if q > _QMAX else q
+
+def _quantize_angle(angle):
+    return int(round(angle * _ANGLE_SCALE)) & 0xFFFF
+
+def _position(qx, qy):
+    return (qx / _X_SCALE + _ORIGIN, qy / _Y_SCALE + _ORIGIN)
+
+
+class _Peer:
+    __slots__ = ('address', 'ack', 'last_seen')
+
+    def __init__(self, address, now):
+        self.address = address
+        self.ack = 0 # Last snapshot the viewer confirmed; 0 = needs a full snapshot
+        self.last_seen = now
+
+
+class ReplicationServer:
+    """Streams an authoritative Simulation to viewers over UDP.
+
+    Every `send_interval` steps the world is captured as quantized records
+    (16-bit positions and angle) keyed by object id and portal pair id. Each
+    viewer gets only the records that differ from the last snapshot it
+    acknowledged, plus the ids removed since, so sleeping objects cost nothing
+    and bandwidth follows the number of moving objects. Lost datagrams are
+    never resent: the next snapshot is simply a larger delta. Viewers sharing a
+    baseline share the encoded datagrams. Call `poll` and `update` from the
+    thread that steps the simulation.
+    """
+    def __init__(self, simulation, port, host=REPLICATION_HOST, send_interval=REPLICATION_SEND_INTERVAL):
+        self.simulation = simulation
+        self.send_interval = send_interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.peers = {} # (host, port) -> _Peer
+        self.seq = 0
+        self._history = {} # seq -> (objects, pairs) as sent; baselines for deltas, oldest first
+        self._last_send_step = None
+        self._force_send = False
+        self._teleports = {} # Object id -> teleport count (4 bits); viewers don't interpolate across a change
+        simulation.portal_manager.add_teleport_listener(self._on_teleport)
+        self.bytes_sent = 0
+        self.last_changed = 0 # Object records in the last delta (first viewer's baseline)
+
+    def close(self):
+        self.sock.close()
+
+    def poll(self):
+        """Reads viewer messages (join, acknowledgements, leave) and drops silent viewers."""
+        now = time.monotonic()
+        while True:
+            try:
+                data, address = self.sock.recvfrom(64)
+            except BlockingIOError:
+                break
+            except ConnectionResetError:
+                continue # Windows reports an earlier send to a closed port here
+            except OSError:
+                break
+            if len(data) != _CLIENT_MSG.size: continue
+            magic, kind, seq = _CLIENT_MSG.unpack(data)
+            if magic != MAGIC: continue
+            peer = self.peers.get(address)
+            if kind == MSG_HELLO:
+                if peer is None:
+                    print(f"Replication: viewer {address[0]}:{address[1]} joined")
+                peer = self.peers[address] = _Peer(address, now)
+                self._force_send = True
+            elif peer is None:
+                continue
+            elif kind == MSG_ACK:
+                peer.ack = max(peer.ack, seq)
+            elif kind == MSG_BYE:
+                del self.peers[address]
+                print(f"Replication: viewer {address[0]}:{address[1]} left")
+                continue
+            peer.last_seen = now
+        for address, peer in list(self.peers.items()):
+            if now - peer.last_seen > REPLICATION_CLIENT_TIMEOUT:
+                del self.peers[address]
+                print(f"Replication: viewer {address[0]}:{address[1]} timed out")
+
+    def update(self):
+        """Sends a snapshot to every viewer when `send_interval` steps have passed or a viewer joined."""
+        if not self.peers: return
+        step = self.simulation.step_count
+        if not self._force_send and self._last_send_step is not None \
+                and step - self._last_send_step < self.send_interval:
+            return
+        self._force_send = False
+        self._last_send_step = step
+        self.seq += 1
+        objects, pairs = self._capture()
+        self._history[self.seq] = (objects, pairs)
+        if len(self._history) > REPLICATION_HISTORY:
+            del self._history[next(iter(self._history))]
+        flags = FLAG_GRAVITY if self.simulation.physics_manager.get_gravity_state() else 0
+
+        encoded = {} # Baseline seq -> datagrams
+        for peer in self.peers.values():
+            baseline = peer.ack if peer.ack in self._history else 0
+            datagrams = encoded.get(baseline)
+            if datagrams is None:
+                datagrams = encoded[baseline] = self._encode(baseline, objects, pairs, flags, step)
+            for datagram in datagrams:
+                try:
+                    self.sock.sendto(datagram, peer.address)
+                    self.bytes_sent += len(datagram)
+                except OSError:
+                    break # Socket buffer full or viewer gone; the next delta catches up
+
+    def get_status(self):
+        return f"{len(self.peers)} viewer(s), snapshot #{self.seq}, {self.last_changed} objects in last delta"
+
+    def _on_teleport(self, obj, entry_portal, exit_portal, entry_pos, exit_pos):
+        self._teleports[obj.id] = (self._teleports.get(obj.id, 0) + 1) & 0x0F
+
+    def _capture(self):
+        objects = {}
+        teleports = self._teleports
+        for obj in self.simulation.object_manager.get_objects():
+            body = obj.body
+            code = SHAPE_CODES.get(obj.shape_type)
+            if body is None or obj.marked_for_deletion or code is None: continue
+            position = body.position
+            objects[obj.id] = (code | teleports.get(obj.id, 0) << 4, _quantize(position.x, _X_SCALE),
+                               _quantize(position.y, _Y_SCALE), _quantize_angle(body.angle))
+        if len(teleports) > 2 * len(objects) + 64: # Forget deleted objects now and then
+            self._teleports = {obj_id: count for obj_id, count in teleports.items() if obj_id in objects}
+        pairs = {}
+        for pair_id, portals in self.simulation.portal_manager.portal_pairs.items():
+            record = []
+            for portal in portals:
+                record.extend((_quantize(portal.position.x, _X_SCALE), _quantize(portal.position.y, _Y_SCALE),
+                               _quantize_angle(portal.angle)))
+            if len(record) == 6:
+                pairs[pair_id] = tuple(record)
+        return objects, pairs
+
+    def _encode(self, baseline, objects, pairs, flags, step):
+        if baseline:
+            base_objects, base_pairs = self._history[baseline]
+            changed = [(obj_id, record) for obj_id, record in objects.items() if base_objects.get(obj_id) != record]
+            removed = [obj_id for obj_id in base_objects if obj_id not in objects]
+            changed_pairs = [(pair_id, record) for pair_id, record in pairs.items() if base_pairs.get(pair_id) != record]
+            removed_pairs = [pair_id for pair_id in base_pairs if pair_id not in pairs]
+        else:
+            changed, removed = list(objects.items()), []
+            changed_pairs, removed_pairs = list(pairs.items()), []
+        self.last_changed = len(changed)
+
+        portal_data = b''.join([_PAIR.pack(pair_id, *record) for pair_id, record in changed_pairs] +
+                               [_ID.pack(pair_id) for pair_id in removed_pairs])
+        records = [_OBJECT.pack(obj_id, *record) for obj_id, record in changed]
+        removed_records = [_ID.pack(obj_id) for obj_id in removed]
+
+        # Greedily fill datagrams; part 0 also carries the portal records
+        room = REPLICATION_MAX_DATAGRAM - _HEADER.size
+        parts = [] # (object records, removed records)
+        current_objects, current_removed = [], []
+        free = room - len(portal_data)
+        for record in records:
+            if free < _OBJECT.size and (current_objects or parts or portal_data):
+                parts.append((current_objects, current_removed))
+                current_objects, free = [], room
+            current_objects.append(record)
+            free -= _OBJECT.size
+        for record in removed_records:
+            if free < _ID.size and (current_objects or current_removed or parts or portal_data):
+                parts.append((current_objects, current_removed))
+                current_objects, current_removed, free = [], [], room
+            current_removed.append(record)
+            free -= _ID.size
+        parts.append((current_objects, current_removed))
+
+        datagrams = []
+        for index, (part_objects, part_removed) in enumerate(parts):
+            first = index == 0
+            header = _HEADER.pack(MAGIC, MSG_SNAPSHOT, flags, self.seq, baseline, step, index, len(parts),
+                                  len(part_objects), len(part_removed),
+                                  len(changed_pairs) if first else 0, len(removed_pairs) if first else 0)
+            datagrams.append(b''.join([header, *part_objects, *part_removed, portal_data if first else b'']))
+        return datagrams
+
+
+class ReplicationClient:
+    """Receives a ReplicationServer stream and turns it into interpolated WorldSnapshots.
+
+    Completed snapshots are rebuilt from their baseline, kept for later deltas,
+    and acknowledged. Drawing runs REPLICATION_INTERP_DELAY behind the newest
+    snapshot, blending the two snapshots around that time. Objects whose
+    teleport count changed are not blended, so they jump instead of sliding
+    across the world.
+    """
+    HELLO_INTERVAL = 1.0 # Seconds without snapshots before (re)sending HELLO
+    MAX_PENDING = 8      # Partially received snapshots kept while waiting for their other parts
+
+    def __init__(self, host, port, delay=REPLICATION_INTERP_DELAY):
+        self.server = (host, port)
+        self.delay = delay
+        self.sock = None
+        self.latest_seq = 0
+        self._pending = {} # seq -> {part index: datagram}
+        self._states = {}  # seq -> (objects, pairs); delta baselines, oldest first
+        self._buffer = deque(maxlen=32) # (server time, step, objects, pairs, flags) for interpolation
+        self._offset = None # Local clock minus server clock (the smallest seen, i.e. least delayed)
+        self._last_received = 0.0
+        self._last_hello = 0.0
+        self._portal_key = None
+        self._portals = ()
+        self._empty = WorldSnapshot(0, (), (), True, self._stats(0))
+        self.bytes_received = 0
+        self.snapshots_received = 0
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self._send(MSG_HELLO)
+        print(f"Replication: watching {self.server[0]}:{self.server[1]}")
+
+    def close(self):
+        if self.sock:
+            self._send(MSG_BYE)
+            self.sock.close()
+            self.sock = None
+
+    def poll(self):
+        """Reads every waiting datagram. Call once per frame."""
+        if not self.sock: return
+        now = time.perf_counter()
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            except OSError:
+                break
+            self.bytes_received += len(data)
+            self._receive(data, now)
+        if now - self._last_received > self.HELLO_INTERVAL and now - self._last_hello > self.HELLO_INTERVAL:
+            self._send(MSG_HELLO) # Server not started yet, restarted, or our HELLO was lost
+            self._last_hello = now
+
+    def get_status(self):
+        return f"snapshot #{self.latest_seq}, {self.snapshots_received} received, {self.bytes_received / 1024:.0f} KiB"
+
+    def _send(self, kind, seq=0):
+        try:
+            self.sock.sendto(_CLIENT_MSG.pack(MAGIC, kind, seq), self.server)
+        except OSError:
+            pass
+
+    def _receive(self, data, now):
+        if len(data) < _HEADER.size: return
+        magic, kind, _, seq, baseline, _, part, parts = _HEADER.unpack_from(data)[:8]
+        if magic != MAGIC or kind != MSG_SNAPSHOT: return
+        if seq <= self.latest_seq:
+            if baseline or now - self._last_received < self.HELLO_INTERVAL:
+                return # Late or duplicate
+            self._reset() # Only old-numbered full snapshots for a while: the server restarted
+        received = self._pending.setdefault(seq, {})
+        received[part] = data
+        if len(received) < parts:
+            while len(self._pending) > self.MAX_PENDING:
+                del self._pending[min(self._pending)]
+            return
+        del self._pending[seq]
+        for old in [s for s in self._pending if s < seq]:
+            del self._pending[old]
+        self._apply(seq, baseline, [received[i] for i in range(parts)], now)
+
+    def _apply(self, seq, baseline, datagrams, now):
+        if baseline:
+            base = self._states.get(baseline)
+            if base is None:
+                self._send(MSG_HELLO) # Baseline no longer held; ask for a full snapshot
+                return
+            objects, pairs = dict(base[0]), dict(base[1])
+        else:
+            objects, pairs = {}, {}
+        flags = step = 0
+        for data in datagrams:
+            (_, _, flags, _, _, step, _, _,
+             n_objects, n_removed, n_pairs, n_removed_pairs) = _HEADER.unpack_from(data)
+            offset = _HEADER.size
+            for _ in range(n_objects):
+                obj_id, *record = _OBJECT.unpack_from(data, offset)
+                objects[obj_id] = tuple(record)
+                offset += _OBJECT.size
+            for _ in range(n_removed):
+                objects.pop(_ID.unpack_from(data, offset)[0], None)
+                offset += _ID.size
+            for _ in range(n_pairs):
+                pair_id, *record = _PAIR.unpack_from(data, offset)
+                pairs[pair_id] = tuple(record)
+                offset += _PAIR.size
+            for _ in range(n_removed_pairs):
+                pairs.pop(_ID.unpack_from(data, offset)[0], None)
+                offset += _ID.size
+
+        self._states[seq] = (objects, pairs)
+        while len(self._states) > REPLICATION_HISTORY:
+            del self._states[next(iter(self._states))]
+        self.latest_seq = seq
+        self.snapshots_received += 1
+        self._last_received = now
+        self._send(MSG_ACK, seq)
+
+        server_time = step * TIME_STEP
+        if self._offset is None or now - server_time < self._offset:
+            self._offset = now - server_time
+        self._buffer.append((server_time, step, objects, pairs, flags))
+
+    def _reset(self):
+        self.latest_seq = 0
+        self._pending.clear()
+        self._states.clear()
+        self._buffer.clear()
+        self._offset = None
+
+    def get_snapshot(self, now=None):
+        """WorldSnapshot for drawing now: interpolated objects and the newest portals."""
+        buffer = self._buffer
+        if not buffer: return self._empty
+        now = time.perf_counter() if now is None else now
+        render_time = now - self._offset - self.delay
+        older = newer = None
+        for entry in reversed(buffer):
+            if entry[0] <= render_time:
+                older = entry
+                break
+            newer = entry
+        if older is None: older = newer # Before the buffered range: show the oldest
+        if newer is None: newer = older # Past the newest: hold it (no extrapolation)
+        span = newer[0] - older[0]
+        alpha = (render_time - older[0]) / span if span > 0 else 1.0
+
+        previous = older[2]
+        objects = []
+        for obj_id, record in newer[2].items():
+            code, qx, qy, qa = record
+            shape_type, color, radius, size = SHAPES[code & 0x0F]
+            x, y = _position(qx, qy)
+            angle = qa / _ANGLE_SCALE
+            before = previous.get(obj_id)
+            if before is not None and before != record and before[0] == code and alpha < 1.0:
+                bx, by = _position(before[1], before[2])
+                b_angle = before[3] / _ANGLE_SCALE
+                x, y = bx + (x - bx) * alpha, by + (y - by) * alpha
+                angle = b_angle + ((angle - b_angle + math.pi) % (2 * math.pi) - math.pi) * alpha
+            objects.append(ObjectSnapshot.from_state(obj_id, shape_type, (x, y), angle, color,
+                                                     radius, size, awake=before != record))
+        return WorldSnapshot(newer[1], tuple(objects), self._get_portals(newer[3]),
+                             bool(newer[4] & FLAG_GRAVITY), self._stats(len(objects)))
+
+    def _get_portals(self, pairs):
+        if pairs != self._portal_key: # Rebuilt only when portals change, so portal views keep their cache
+            portals = []
+            size = (DEFAULT_PORTAL_WIDTH, DEFAULT_PORTAL_HEIGHT)
+            for pair_id, record in sorted(pairs.items()):
+                color = PORTAL_COLORS[pair_id % len(PORTAL_COLORS)]
+                poses = [(*_position(record[i], record[i + 1]), record[i + 2] / _ANGLE_SCALE) for i in (0, 3)]
+                for side in (0, 1):
+                    x, y, angle = poses[side]
+                    portals.append(PortalSnapshot.from_state(pair_id * 2 + side, pair_id, color, (x, y), angle,
+                                                             size, poses[1 - side]))
+            self._portals = tuple(portals)
+            self._portal_key = pairs
+        return self._portals
+
+    def _stats(self, count):
+        return {'bodies': count, 'contacts': 'N/A', 'step_ms': 0.0, 'dragging': None, 'teleport_queue': 0}
+
+
+class HeadlessServer:
+    """Runs an authoritative Simulation in real time without pygame and replicates it.
+
+    It has the attributes ControlServer uses on a Game (simulation,
+    portal_manager, submit_command, paused, running, ...), so the JSON-RPC
+    control interface can drive a server as well.
+    """
+    def __init__(self, port, host=REPLICATION_HOST, control_server=None, max_steps=None):
+        self.simulation = Simulation()
+        self.portal_manager = self.simulation.portal_manager
+        self.replication = ReplicationServer(self.simulation, port, host)
+        self.control_server = control_server
+        self.physics_thread = None
+        self.fixed_dt = TIME_STEP
+        self.max_steps = max_steps
+        self.paused = False
+        self.running = True
+        self._setup_scene()
+
+    def _setup_scene(self):
+        # Same starting objects as Game._setup_scene (given there in screen pixels)
+        simulation = self.simulation
+        simulation.add_object('box', (WIDTH * 0.5 / PPM, HEIGHT * 0.7 / PPM))
+        simulation.add_object('circle', (WIDTH * 0.6 / PPM, HEIGHT * 0.5 / PPM))
+        simulation.add_object('circle', (WIDTH * 0.4 / PPM, HEIGHT * 0.5 / PPM))
+        for emitter_args in SCENE_EMITTERS:
+            simulation.spawner.add_emitter(Emitter(**emitter_args))
+
+    def submit_command(self, fn, *args):
+        fn(*args)
+
+    def run(self):
+        if self.control_server and not self.control_server.start(self):
+            self.control_server = None
+        host, port = self.replication.address[:2]
+        print(f"Replication server on {host}:{port} (viewers: python main.py --connect {host}:{port})")
+        next_step = time.perf_counter()
+        next_report = next_step + REPLICATION_REPORT_INTERVAL
+        try:
+            while self.running:
+                if self.control_server:
+                    self.control_server.process()
+                self.replication.poll()
+                if not self.paused:
+                    self.simulation.step(TIME_STEP)
+                self.replication.update()
+                if self.max_steps and self.simulation.step_count >= self.max_steps:
+                    self.running = False
+
+                now = time.perf_counter()
+                if now >= next_report:
+                    print(f"Replication: {self.replication.get_status()}, "
+                          f"{self.simulation.object_manager.get_count()} objects")
+                    next_report = now + REPLICATION_REPORT_INTERVAL
+                next_step += TIME_STEP
+                delay = next_step - now
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -0.25:
+                    next_step = now # Too far behind; don't try to catch up
+        except KeyboardInterrupt:
+            print("Server interrupted.")
+        finally:
+            if self.control_server:
+                self.control_server.stop()
+            self.replication.close()
+        print("Server stopped.")
@@ -0,0 +1,226 @@
+from array import array
+from collections import deque
+from settings import TIME_STEP, REWIND_SECONDS, REWIND_INTERVAL, REWIND_MAX_MB, REWIND_KEYFRAME_INTERVAL
+
+SHAPES = ('circle', 'box') # Shape codes stored per object
+_FIELDS = 6 # x, y, angle, vx, vy, angular velocity per object
+
+class RewindFrame:
+    """World state at one step, as flat arrays.
+
+    Box2D keeps transforms and velocities as 32-bit floats, so storing them
+    as array('f') is exact. Cooldown end times are simulation-clock seconds.
+
+    A keyframe holds a row for every object in `ids`. Any other frame holds
+    rows only for the objects that were awake, new, or had just fallen
+    asleep (`rows` lists their ids); the other objects sat still since the
+    previous frame. `ids`/`shapes` are shared with the previous frame
+    while the set of objects is unchanged.
+    """
+    __slots__ = ('step', 'time', 'key', 'ids', 'shapes', 'rows', 'bodies', 'awake',
+                 'cooldown_portals', 'cooldown_objects', 'cooldown_ends', 'nbytes')
+
+    def __init__(self, step, time, key):
+        self.step = step
+        self.time = time
+        self.key = key
+        self.ids = None # array('i') of every object at this step
+        self.shapes = None # array('b'), parallel to ids
+        self.rows = array('i') # Object id of each stored row
+        self.bodies = array('f') # _FIELDS floats per stored row
+        self.awake = array('b') # Per stored row
+        self.cooldown_portals = array('i') # One entry per (portal, object) cooldown
+        self.cooldown_objects = array('i')
+        self.cooldown_ends = array('d')
+        self.nbytes = 0
+
+
+class RewindBuffer:
+    """Ring buffer of recent world states that can be restored into the live b2World.
+
+    Records every `interval` steps (as a Simulation step listener) and keeps
+    about `seconds` of history and at most `max_mb` megabytes. Frames are
+    stored incrementally (see RewindFrame) with a keyframe every
+    `keyframe_interval` frames, and history is dropped oldest keyframe
+    segment first. Restoring moves surviving bodies in place, deletes
+    objects created since, and recreates deleted ones under their old ids.
+    Portal pairs themselves are not rewound; cooldowns are restored for
+    portals that still exist. Recording and restoring run on the thread
+    that steps the world.
+    """
+    def __init__(self, simulation, seconds=REWIND_SECONDS, interval=REWIND_INTERVAL, max_mb=REWIND_MAX_MB,
+                 keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        self.simulation = simulation
+        self.interval = max(1, int(interval))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_frames = max(1, int(round(seconds / (TIME_STEP * self.interval))))
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.frames = deque()
+        self.nbytes = 0
+        self.cursor = None # Index of the frame shown while scrubbing; None when live
+        self._since_key = None # Frames recorded since the last keyframe; None forces a keyframe
+        self._membership = None # Store version the last frame's ids were taken at
+        self._known = set() # Ids in the last frame that built its own ids
+        self._recorded_awake = set() # Ids stored awake in the last frame; stored once more when they sleep
+        simulation.add_step_listener(self._on_step)
+
+    def _on_step(self, simulation):
+        if self.cursor is None and simulation.step_count % self.interval == 0:
+            self.record()
+
+    def record(self):
+        simulation = self.simulation
+        key = self._since_key is None or self._since_key + 1 >= self.keyframe_interval
+        self._since_key = 0 if key else self._since_key + 1
+        frame = RewindFrame(simulation.step_count, simulation.time, key)
+        store = simulation.object_manager.store
+        previous = self.frames[-1] if self.frames else None
+        same_objects = previous is not None and self._membership == store.version
+
+        if same_objects:
+            frame.ids, frame.shapes = previous.ids, previous.shapes
+        else:
+            frame.ids, frame.shapes = array('i'), array('b')
+        rows, awake, values = frame.rows, frame.awake, []
+        recorded_awake, was_awake = set(), self._recorded_awake
+        for obj in simulation.object_manager.get_objects():
+            body = obj.body
+            if body is None or obj.marked_for_deletion or obj.shape_type not in SHAPES: continue
+            obj_id = obj.id
+            if not same_objects:
+                frame.ids.append(obj_id)
+                frame.shapes.append(SHAPES.index(obj.shape_type))
+            is_awake = body.awake
+            if is_awake:
+                recorded_awake.add(obj_id)
+            elif not key and obj_id not in was_awake and (same_objects or obj_id in self._known):
+                continue # Asleep, and stored since it stopped
+            position, velocity = body.position, body.linearVelocity
+            values += (position.x, position.y, body.angle, velocity.x, velocity.y, body.angularVelocity)
+            rows.append(obj_id)
+            awake.append(is_awake)
+        frame.bodies.fromlist(values)
+        self._recorded_awake = recorded_awake
+        if not same_objects:
+            self._known = set(frame.ids)
+            self._membership = store.version
+
+        for portal in simulation.portal_manager.get_all_portals():
+            for obj_id, end_time in portal.cooldown_end_times.items():
+                frame.cooldown_portals.append(portal.id)
+                frame.cooldown_objects.append(obj_id)
+                frame.cooldown_ends.append(end_time)
+
+        owned = [rows, frame.bodies, awake, frame.cooldown_portals, frame.cooldown_objects, frame.cooldown_ends]
+        if not same_objects:
+            owned += (frame.ids, frame.shapes)
+        frame.nbytes = sum(a.itemsize * len(a) for a in owned)
+        self.frames.append(frame)
+        self.nbytes += frame.nbytes
+        self._evict()
+
+    def _evict(self):
+        """Drops the oldest keyframe segments while history is over its length or memory limit."""
+        frames = self.frames
+        while True:
+            segment = 1
+            while segment < len(frames) and not frames[segment].key:
+                segment += 1
+            if segment >= len(frames): return # Never drop the newest segment
+            over_length = len(frames) - segment >= self.max_frames
+            if not over_length and self.nbytes <= self.max_bytes: return
+            for _ in range(segment):
+                self.nbytes -= frames.popleft().nbytes
+
+    def _state_at(self, index):
+        """Object id -> (row offset in a frame's bodies, frame, awake) at frame `index`, from its keyframe on."""
+        frames = self.frames
+        start = index
+        while not frames[start].key:
+            start -= 1
+        state = {}
+        for position in range(start, index + 1):
+            frame = frames[position]
+            for i, obj_id in enumerate(frame.rows):
+                state[obj_id] = (i * _FIELDS, frame, frame.awake[i])
+        return state
+
+    # --- Scrubbing (cursor bookkeeping; call `restore` on the world thread) ---
+
+    def begin(self):
+        """Enters scrubbing at the newest frame. Returns False when nothing is recorded."""
+        if not self.frames: return False
+        self.cursor = len(self.frames) - 1
+        return True
+
+    def seek(self, offset):
+        """Moves the cursor by `offset` frames. Returns the new index, or None if it did not move."""
+        if self.cursor is None: return None
+        index = min(max(self.cursor + offset, 0), len(self.frames) - 1)
+        if index == self.cursor: return None
+        self.cursor = index
+        return index
+
+    def end(self):
+        """Leaves scrubbing; frames after the restored one are discarded, so recording continues from it."""
+        if self.cursor is None: return
+        while len(self.frames) > self.cursor + 1:
+            self.nbytes -= self.frames.pop().nbytes
+        self.cursor = None
+
+    def get_label(self):
+        """HUD text while scrubbing, e.g. "-1.25 s (150/300)", or None when live."""
+        if self.cursor is None or not self.frames: return None
+        frame, newest = self.frames[self.cursor], self.frames[-1]
+        return f"-{newest.time - frame.time:.2f} s ({self.cursor + 1}/{len(self.frames)})"
+
+    def restore(self, index):
+        """Puts frame `index` into the live world."""
+        frame = self.frames[index]
+        state = self._state_at(index)
+        self._since_key = None # The next frame after scrubbing must not depend on the discarded ones
+        self._membership = None
+        simulation = self.simulation
+        object_manager = simulation.object_manager
+        portal_manager = simulation.portal_manager
+        if object_manager.mouse_joint:
+            object_manager.stop_drag()
+        portal_manager.teleport_queue.clear()
+
+        wanted = set(frame.ids)
+        for obj in list(object_manager.get_objects()):
+            if obj.id not in wanted:
+                object_manager.delete_object(obj)
+        object_manager.cleanup_deleted_objects()
+
+        store = object_manager.store
+        missing = [i for i, obj_id in enumerate(frame.ids) if store.get(obj_id) is None]
+        if missing:
+            specs = []
+            for i in missing:
+                base, source, _ = state[frame.ids[i]]
+                bodies = source.bodies
+                specs.append((SHAPES[frame.shapes[i]], (bodies[base], bodies[base + 1]), bodies[base + 2], (0.0, 0.0)))
+            object_manager.create_objects(specs, ids=[frame.ids[i] for i in missing])
+
+        for obj_id in frame.ids:
+            obj = store.get(obj_id)
+            if obj is None or obj.body is None: continue
+            body = obj.body
+            base, source, awake = state[obj_id]
+            bodies = source.bodies
+            body.transform = ((bodies[base], bodies[base + 1]), bodies[base + 2])
+            body.linearVelocity = (bodies[base + 3], bodies[base + 4])
+            body.angularVelocity = bodies[base + 5]
+            body.awake = bool(awake) # Last: putting a body to sleep zeroes its velocity, as recorded
+            obj.teleporting = False
+            obj.update_from_physics()
+
+        portal_manager.reset_straddles()
+        portal_manager.clear_cooldowns()
+        portals = {portal.id: portal for portal in portal_manager.get_all_portals()}
+        for k, portal_id in enumerate(frame.cooldown_portals):
+            portal = portals.get(portal_id)
+            if portal is None: continue # Pair deleted since
+            portal_manager.set_cooldown(portal, frame.cooldown_objects[k], frame.cooldown_ends[k])
+        simulation.time = frame.time # Cooldowns are on the simulation clock
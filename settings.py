@@ -1,5 +1,6 @@
-import pygame
+import os
 import Box2D
+from colors import Color # Plain RGBA tuples, so the simulation modules never need pygame
 # Screen Dimensions
 WIDTH = 1280
 HEIGHT = 720
@@ -11,39 +12,174 @@ TIME_STEP = 1.0 / FPS
 VELOCITY_ITERATIONS = 8
 POSITION_ITERATIONS = 3
 GRAVITY = (0, -9.8) # Standard gravity in m/s^2
+THREADED_PHYSICS = False # Step physics on a worker thread; the main thread renders snapshots
+
+# World & Camera
+WORLD_WIDTH_M = 2 * WIDTH / PPM  # World size in meters: twice the window at zoom 1, so the view pans and culls
+WORLD_HEIGHT_M = 2 * HEIGHT / PPM
+CAMERA_MIN_ZOOM = 0.1
+CAMERA_MAX_ZOOM = 4.0
+CAMERA_ZOOM_STEP = 1.1         # Zoom factor per mouse wheel notch
+CAMERA_PAN_SPEED = 600         # Screen pixels per second for arrow-key panning
+CAMERA_CULL_MARGIN = 2.0       # Meters added around the viewport when culling
 
 # Colors (Mini Metro Inspired Palette)
-COLOR_BACKGROUND = pygame.Color("#F7F5F2") # Soft off-white
-COLOR_TEXT = pygame.Color("#333333")      # Dark gray
-COLOR_DEBUG = pygame.Color("#FF0000")     # For debug drawing
-COLOR_GRID = pygame.Color("#E0E0E0")      # Grid color
+COLOR_BACKGROUND = Color("#F7F5F2") # Soft off-white
+COLOR_TEXT = Color("#333333")      # Dark gray
+COLOR_DEBUG = Color("#FF0000")     # For debug drawing
+COLOR_DEBUG_SENSOR = Color("cyan") # Debug wireframes of sensor fixtures (portals)
+COLOR_DEBUG_SLEEP = Color("#9E9E9E") # Debug wireframes of sleeping bodies
+COLOR_DEBUG_AABB = Color("#FF00FF") # Fixture AABBs
+COLOR_DEBUG_PROXY = Color("#FFA000") # Broadphase (fattened) proxy boxes
+COLOR_DEBUG_CONTACT = Color("#00A000") # Contact points and normals
+COLOR_GRID = Color("#E0E0E0")      # Grid color
+COLOR_WALL = Color("#9E9E9E")      # Static level geometry
+GRID_SIZE = 50                            # Background grid spacing in pixels
 
 # Object Colors (Bold Primary)
-COLOR_CIRCLE = pygame.Color("#1A73E8")    # Blue
-COLOR_SQUARE = pygame.Color("#EA4335")    # Red
-COLOR_TRIANGLE = pygame.Color("#FBBC04")  # Yellow (Add if needed)
+COLOR_CIRCLE = Color("#1A73E8")    # Blue
+COLOR_SQUARE = Color("#EA4335")    # Red
+COLOR_TRIANGLE = Color("#FBBC04")  # Yellow (Add if needed)
+COLOR_OBJECT_DEFAULT = Color("gray") # GameObject base class
 
 # Portal Colors (Pastel/Secondary Variants - Define pairs later)
 PORTAL_COLORS = [
-    pygame.Color("#A0C3FF"), # Light Blue
-    pygame.Color("#FAD2CF"), # Light Red
-    pygame.Color("#FFF8E1"), # Light Yellow
-    pygame.Color("#D1FAD7"), # Light Green
-    pygame.Color("#E8DFF5"), # Light Purple
+    Color("#A0C3FF"), # Light Blue
+    Color("#FAD2CF"), # Light Red
+    Color("#FFF8E1"), # Light Yellow
+    Color("#D1FAD7"), # Light Green
+    Color("#E8DFF5"), # Light Purple
 ]
 
 # UI Colors
-COLOR_UI_ACCENT = pygame.Color("#1A73E8") # Use a primary color for accents
-COLOR_BUTTON_NORMAL = pygame.Color("#E0E0E0")
-COLOR_BUTTON_HOVER = pygame.Color("#CCCCCC")
-COLOR_BUTTON_PRESSED = pygame.Color("#BDBDBD")
-COLOR_PORTAL_PREVIEW = pygame.Color("#4CAF50") # Green for portal preview line
+COLOR_UI_ACCENT = Color("#1A73E8") # Use a primary color for accents
+COLOR_BUTTON_NORMAL = Color("#E0E0E0")
+COLOR_BUTTON_HOVER = Color("#CCCCCC")
+COLOR_BUTTON_PRESSED = Color("#BDBDBD")
+COLOR_PORTAL_PREVIEW = Color("#4CAF50") # Green for portal preview line
+COLOR_EMITTER = Color("#7B1FA2")        # Emitter markers
+
+# Rendering
+DIRTY_RECT_MODE = False        # Redraw only changed regions instead of the full frame
+DIRTY_RECT_MAX_FRACTION = 0.35 # Fall back to a full redraw + flip above this fraction of screen area
+STATIC_LAYER_MARGIN = 0.5      # Fraction of the view baked past each screen edge into the static background layer
+
+USE_SPRITE_ATLAS = True        # Blit pre-rasterized object sprites instead of per-object draw calls
+SPRITE_ROTATION_STEPS = 64     # Quantized rotation angles cached per (shape, size, color)
+SPRITE_ATLAS_MAX_SPRITES = 4096 # Atlas is flushed when it grows past this (e.g. after much zooming)
+
+# Level of detail
+LOD_ENABLED = True
+LOD_POINT_MAX_RADIUS_PX = 1.5  # Objects this small on screen are drawn as single pixels
+LOD_DETAIL_MIN_RADIUS_PX = 3   # Circle orientation lines only above this on-screen radius
+LOD_OUTLINE_MIN_PX = 6         # Portal outlines only when the portal is at least this thick on screen
+LOD_DENSITY_MIN_OBJECTS = 4000 # Visible object count at which dense regions collapse into tiles
+LOD_DENSITY_TILE_PX = 8        # Density tile size in screen pixels
+LOD_DENSITY_TILE_MIN_COUNT = 4 # Objects in one tile needed to collapse it
+
+# Debug overlay layers (toggled with the number keys while debug mode is on)
+DEBUG_LAYERS = {
+    'shapes': True,    # Fixture wireframes, sensors in COLOR_DEBUG_SENSOR
+    'sleep': True,     # Sleeping dynamic bodies drawn in COLOR_DEBUG_SLEEP
+    'aabbs': False,    # Tight fixture AABBs
+    'contacts': False, # Touching contact points and normals
+    'proxies': False,  # Broadphase proxy boxes (AABB grown by b2_aabbExtension)
+}
+DEBUG_LAYER_KEYS = { # pygame key codes; pygame.K_1 ... K_5 are the digits' ASCII codes
+    ord('1'): 'shapes',
+    ord('2'): 'sleep',
+    ord('3'): 'aabbs',
+    ord('4'): 'contacts',
+    ord('5'): 'proxies',
+}
+
+# Particles (teleport bursts and ambient portal drift; needs NumPy)
+PARTICLES_ENABLED = True
+PARTICLE_CAPACITY = 4096       # Preallocated slots; the hard cap
+PARTICLE_SOFT_LIMIT = 0.75     # Above this fraction of the cap, ambient emission stops and bursts shrink
+PARTICLE_TELEPORT_BURST = 24   # Particles per burst (one at each end of a teleport)
+PARTICLE_AMBIENT_RATE = 6      # Ambient particles per portal per second
+PARTICLE_LIFETIME = 0.6        # Seconds
+PARTICLE_SPEED = 2.0           # Meters per second (burst maximum)
+PARTICLE_DAMPING = 2.0         # Velocity decay rate per second
+PARTICLE_SIZE_PX = 2           # Drawn as squares of this size
+
+# Stress testing: emitters (E places/removes one at the cursor) and flood fill (F)
+SPAWN_BUDGET_PER_FRAME = 50    # Objects all emitters together may create per frame; the rest wait
+SPAWN_MAX_OBJECTS = 20000      # Emitters pause and floods shrink at this many objects
+SPAWN_EMITTER_RATE = 20        # Objects per second from a new emitter
+SPAWN_EMITTER_SPEED = (4.0, 8.0) # Launch speed range, meters per second
+SPAWN_EMITTER_SPREAD = 0.4     # Radians either side of the emitter direction
+SPAWN_SHAPE_MIX = {'circle': 0.5, 'box': 0.5} # Relative weights of spawned object types
+SPAWN_FLOOD_COUNT = 500        # Objects created by one flood (F) over the visible part of the world
+SCENE_EMITTERS = []            # Emitter keyword args created with the scene, e.g. {'position': (10, 5), 'rate': 40}
+
+# Control server (optional JSON-RPC interface for test harnesses; --control-port / --control-socket)
+CONTROL_HOST = '127.0.0.1'     # Loopback only; the protocol has no authentication
+CONTROL_MAX_MESSAGE = 1 << 22  # Bytes in one request line (a whole batch is one line)
+CONTROL_SEND_BUFFER_LIMIT = 1 << 20 # Event notifications to a client are dropped while this much output is unsent
+
+# Replication (python main.py --serve PORT; viewers: python main.py --connect HOST:PORT)
+REPLICATION_HOST = '127.0.0.1' # Server bind address
+REPLICATION_SEND_INTERVAL = 3  # Physics steps between snapshots (20 per second at 60 Hz)
+REPLICATION_MAX_DATAGRAM = 1400 # Bytes per UDP datagram; larger snapshots are split into parts
+REPLICATION_HISTORY = 64       # Snapshots kept on both ends as delta baselines (about 3 s)
+REPLICATION_CLIENT_TIMEOUT = 5.0 # Seconds without a message before the server drops a viewer
+REPLICATION_INTERP_DELAY = 0.1 # Viewers draw this far behind the newest snapshot, interpolating
+REPLICATION_POS_MARGIN = 8.0   # Meters outside the world that 16-bit positions still cover
+REPLICATION_REPORT_INTERVAL = 5.0 # Seconds between server status lines
+
+# Rewind (opt-in with --rewind; R enters/leaves scrubbing; hold [ or ] to move through the recording, Shift for faster)
+REWIND_ENABLED = False
+REWIND_SECONDS = 10.0          # History kept
+REWIND_INTERVAL = 4            # Record every this many physics steps
+REWIND_KEYFRAME_INTERVAL = 30  # Recorded frames per full keyframe; the rest store only bodies that moved
+REWIND_MAX_MB = 64             # Memory cap; the oldest frames go first when exceeded
+REWIND_SCRUB_FAST = 8          # Frames moved per rendered frame while Shift is held (1 without)
+
+# Offscreen capture / video export
+CAPTURE_FPS = 60               # Fixed frame rate of recordings (simulation steps once per frame)
+CAPTURE_QUEUE_SIZE = 32        # Frames buffered for the writer thread before the game waits
+CAPTURE_ENCODER_CMD = ("ffmpeg -y -loglevel error -f rawvideo -pix_fmt rgb24 -s {width}x{height} "
+                       "-r {fps} -i - -c:v libx264 -pix_fmt yuv420p {output}")
+
+# Text
+TEXT_CACHE_SIZE = 256          # Max rendered text surfaces kept in the LRU cache
+HUD_TEXT_REFRESH_INTERVAL = 0.25 # Seconds between refreshes of fast-changing HUD/debug values (FPS, mouse)
+
+# Adaptive quality (steps down through QUALITY_TIERS when frames take too long)
+QUALITY_GOVERNOR_ENABLED = True # Never used for fixed-rate recordings
+QUALITY_WINDOW_FRAMES = 60     # Rolling window of frame work times
+QUALITY_DOWNGRADE_RATIO = 0.9  # Drop a tier when average work time exceeds this fraction of the frame budget
+QUALITY_UPGRADE_RATIO = 0.5    # Climb a tier when it stays below this fraction...
+QUALITY_UPGRADE_DELAY = 3.0    # ...for this many seconds
+QUALITY_COOLDOWN = 1.0         # Seconds after a tier change before the next decision
+QUALITY_TIERS = [ # Best first; tier 0 matches the settings above
+    {'name': 'High', 'grid': True, 'text_refresh': HUD_TEXT_REFRESH_INTERVAL,
+     'particle_cap': PARTICLE_CAPACITY, 'debug_layers': None,
+     'lod_point_px': LOD_POINT_MAX_RADIUS_PX, 'lod_density_objects': LOD_DENSITY_MIN_OBJECTS,
+     'render_scale': 1.0, 'solver_iterations': (VELOCITY_ITERATIONS, POSITION_ITERATIONS)},
+    {'name': 'Medium', 'grid': True, 'text_refresh': 0.5,
+     'particle_cap': PARTICLE_CAPACITY // 2, 'debug_layers': {'shapes', 'sleep', 'aabbs'},
+     'lod_point_px': 2.0, 'lod_density_objects': 2500,
+     'render_scale': 1.0, 'solver_iterations': (6, 2)},
+    {'name': 'Low', 'grid': False, 'text_refresh': 1.0,
+     'particle_cap': PARTICLE_CAPACITY // 8, 'debug_layers': {'shapes'},
+     'lod_point_px': 2.5, 'lod_density_objects': 1500,
+     'render_scale': 0.75, 'solver_iterations': (5, 2)},
+    {'name': 'Minimum', 'grid': False, 'text_refresh': 2.0,
+     'particle_cap': 0, 'debug_layers': {'shapes'},
+     'lod_point_px': 3.0, 'lod_density_objects': 800,
+     'render_scale': 0.5, 'solver_iterations': (4, 1)},
+]
 
 # Font Settings
 DEFAULT_FONT_SIZE = 16
 DEFAULT_FONT_NAME = 'Roboto-Regular.ttf' # Assumes font file is in assets/fonts
 UI_FONT_SIZE = 18
 HUD_FONT_SIZE = 14
+FONT_CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                               'portals2d', 'fonts.json') # Resolved system font paths, reused between runs
 
 # Object Defaults
 DEFAULT_CIRCLE_RADIUS = 16 / PPM
@@ -54,15 +190,41 @@ DEFAULT_PORTAL_HEIGHT = 60 / PPM
 DEFAULT_PORTAL_WIDTH = 10 / PPM
 PORTAL_COOLDOWN = 0.5
 MIN_PORTAL_DRAG_DISTANCE = 50
+PORTAL_SNAP_DISTANCE = 120 / PPM # Farthest a click may be from a wall for a portal to snap onto it
+PORTAL_SURFACE_CELL = 2.0      # Meters per cell of the static-surface index used for snapping
+PORTAL_MAX_HOPS = 8            # Teleports chained in one step when an exit lands straight in another portal
+PORTAL_TRANSIT_REACH = 3.0     # Meters from an exit portal within which other portals count as next hops
+PORTAL_GHOST_POOL_SIZE = 64    # Idle ghost bodies kept for reuse (objects straddling a portal)
+
+# Portal views (each portal shows the area around its linked portal)
+PORTAL_VIEWS_ENABLED = True
+PORTAL_VIEW_RADIUS = 90 / PPM  # Radius of the view window, in meters
+PORTAL_VIEW_MAX_DEPTH = 2      # Levels of portals-seen-through-portals
+PORTAL_VIEW_BUDGET = 4         # Max views re-rendered per frame; the rest reuse their cached image
+PORTAL_VIEW_TINT = 0.35        # How strongly the view background is tinted with the portal color
 
 # --- Helper Functions for Coordinate Conversion ---
 
+_active_camera = None # Set by the Game; when None, conversions use a fixed PPM/HEIGHT view
+
+def set_active_camera(camera):
+    """Routes all coordinate conversions below through `camera` (None restores the fixed view)."""
+    global _active_camera
+    _active_camera = camera
+
+def get_active_camera():
+    return _active_camera
+
 def to_pygame(coords):
     """Convert Box2D coordinates (meters) to Pygame coordinates (pixels)."""
     # Check if it looks like a Box2D vector or a simple tuple/list
     if hasattr(coords, 'x') and hasattr(coords, 'y'):
+        if _active_camera is not None:
+            return _active_camera.world_to_screen(coords.x, coords.y)
         return int(coords.x * PPM), int(HEIGHT - coords.y * PPM)
     elif isinstance(coords, (tuple, list)) and len(coords) == 2:
+        if _active_camera is not None:
+            return _active_camera.world_to_screen(coords[0], coords[1])
         return int(coords[0] * PPM), int(HEIGHT - coords[1] * PPM)
     # Handle scalar conversion if needed, or raise error for unexpected type
     elif isinstance(coords, (int, float)):
@@ -75,6 +237,8 @@ def to_pygame(coords):
 def to_box2d(coords):
     """Convert Pygame coordinates (pixels) to Box2D coordinates (meters)."""
     if isinstance(coords, (tuple, list)) and len(coords) == 2:
+        if _active_camera is not None:
+            return _active_camera.screen_to_world(coords[0], coords[1])
         return Box2D.b2Vec2(coords[0] / PPM, (HEIGHT - coords[1]) / PPM)
     elif isinstance(coords, (int, float)):
         print(f"Warning: to_box2d received scalar {coords}, returning float.")
@@ -89,12 +253,17 @@ def to_box2d(coords):
 
 def scalar_to_pygame(scalar):
     """Convert Box2D scalar (meters) to Pygame scalar (pixels)."""
+    if _active_camera is not None:
+        return _active_camera.scalar_to_screen(scalar)
     return int(scalar * PPM)
 
 def scalar_to_box2d(scalar):
      """Convert Pygame scalar (pixels) to Box2D scalar (meters)."""
+     if _active_camera is not None:
+         return _active_camera.scalar_to_world(scalar)
      return scalar / PPM
 
 USER_DATA_OBJECT = 'object'
 USER_DATA_PORTAL = 'portal'
-USER_DATA_WALL = 'wall'
\ No newline at end of file
+USER_DATA_WALL = 'wall'
+USER_DATA_GHOST = 'ghost'
\ No newline at end of file
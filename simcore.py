@@ -0,0 +1,95 @@
+from settings import TIME_STEP, WORLD_WIDTH_M, WORLD_HEIGHT_M
+from physics import PhysicsManager
+from objects import ObjectManager
+from portals import PortalManager
+from spawner import SpawnManager
+
+class Simulation:
+    """The simulation core: Box2D world, objects, portals, teleports and emitters.
+
+    Depends only on Box2D and the standard library (the modules it pulls in never
+    import pygame), so worker processes can step worlds without SDL or a display.
+    `Game` builds one and adds the pygame adapters on top: Camera, Renderer,
+    InputManager and UI. Cooldowns use the simulated clock `time`, which
+    `step` advances, unless a `time_source` callable is given.
+    """
+    def __init__(self, world_size=(WORLD_WIDTH_M, WORLD_HEIGHT_M), time_source=None):
+        self.object_manager = ObjectManager(None)
+        self.portal_manager = PortalManager(None)
+        self.physics_manager = PhysicsManager(self.object_manager, self.portal_manager)
+        self.object_manager.set_physics_manager(self.physics_manager)
+        self.portal_manager.set_physics_manager(self.physics_manager)
+        self.spawner = SpawnManager(self.object_manager)
+        self.time = 0.0
+        self.step_count = 0
+        self._pending = 0.0 # Time passed to step() but not yet simulated (under one TIME_STEP)
+        self.step_listeners = [] # fn(simulation), called after every step
+        self.portal_manager.time_source = time_source or (lambda: self.time)
+        if world_size:
+            self.physics_manager.add_boundaries(*world_size)
+
+    def step(self, dt=TIME_STEP):
+        """Advances the world by `dt` seconds in whole TIME_STEP steps: emitters, physics,
+        teleports, object cleanup. Box2D always steps TIME_STEP, so a frame rate other
+        than 1/TIME_STEP runs 0, 1 or more steps per call and carries the remainder
+        to the next one. `time` advances by exactly the time simulated. Returns the
+        number of steps run."""
+        pending = self._pending + dt
+        steps = int(pending / TIME_STEP + 1e-6) # Tolerance for float sums of dt
+        self._pending = max(0.0, pending - steps * TIME_STEP)
+        for _ in range(steps):
+            self.spawner.update(TIME_STEP)
+            self.physics_manager.update(TIME_STEP)
+            self.portal_manager.update(TIME_STEP)
+            self.object_manager.update(TIME_STEP)
+            self.time += TIME_STEP
+            self.step_count += 1
+            for listener in self.step_listeners:
+                listener(self)
+        return steps
+
+    def add_step_listener(self, listener):
+        """Registers fn(simulation) to run after each step, on the thread that steps."""
+        self.step_listeners.append(listener)
+
+    def run(self, steps, dt=TIME_STEP):
+        """Calls step(dt) `steps` times, i.e. simulates steps * dt seconds."""
+        for _ in range(steps):
+            self.step(dt)
+
+    # --- World-space helpers (meters, radians) for code without a camera ---
+
+    def add_object(self, obj_type, position, angle=0.0, velocity=(0.0, 0.0)):
+        """Creates one 'circle' or 'box'. Returns the object, or None."""
+        created = self.object_manager.create_objects([(obj_type, position, angle, velocity)])
+        return created[0] if created else None
+
+    def add_portal_pair(self, position_a, angle_a, position_b, angle_b):
+        """Creates a linked portal pair. Returns its pair id, or None."""
+        return self.portal_manager.create_pair(position_a, angle_a, position_b, angle_b)
+
+    def get_state(self):
+        """(id, x, y, angle, vx, vy) for every live object; plain tuples, cheap to pickle."""
+        state = []
+        for obj in self.object_manager.get_objects():
+            body = obj.body
+            if body and not obj.marked_for_deletion:
+                position, velocity = body.position, body.linearVelocity
+                state.append((obj.id, position.x, position.y, body.angle, velocity.x, velocity.y))
+        return state
+
+
+def simulate(steps, objects=(), portal_pairs=(), dt=TIME_STEP):
+    """Builds a fresh world, runs `steps` steps and returns Simulation.get_state().
+
+    `objects` holds (obj_type, position, angle, velocity) specs and `portal_pairs`
+    holds (position_a, angle_a, position_b, angle_b). The world runs for steps * dt
+    seconds, in TIME_STEP physics steps. A top-level function, so it
+    can be handed to multiprocessing.Pool.map.
+    """
+    simulation = Simulation()
+    for position_a, angle_a, position_b, angle_b in portal_pairs:
+        simulation.add_portal_pair(position_a, angle_a, position_b, angle_b)
+    simulation.object_manager.create_objects(objects)
+    simulation.run(steps, dt)
+    return simulation.get_state()
@@ -0,0 +1,179 @@
+import math
+import random
+from settings import (SPAWN_BUDGET_PER_FRAME, SPAWN_MAX_OBJECTS, SPAWN_EMITTER_RATE,
+                      SPAWN_EMITTER_SPEED, SPAWN_EMITTER_SPREAD, SPAWN_SHAPE_MIX,
+                      DEFAULT_CIRCLE_RADIUS)
+
+EMITTER_PICK_RADIUS = 1.5 # Meters; toggle_emitter_at removes an emitter this close instead of adding one
+
+class Emitter:
+    """Spawns objects from a point at a steady rate, for load testing.
+
+    Objects leave at `direction` (radians, world space) plus or minus `spread`,
+    with a speed drawn from the `speed` range (meters/second). `shape_mix` maps
+    object types to relative weights. Each emitter has its own seeded RNG, so a
+    scene spawns the same stream on every run.
+    """
+    _id_counter = 0
+    def __init__(self, position, rate=SPAWN_EMITTER_RATE, direction=math.pi / 2,
+                 spread=SPAWN_EMITTER_SPREAD, speed=SPAWN_EMITTER_SPEED,
+                 shape_mix=SPAWN_SHAPE_MIX, max_spawns=None, seed=None):
+        self.id = Emitter._id_counter
+        Emitter._id_counter += 1
+        self.position = (float(position[0]), float(position[1]))
+        self.rate = rate
+        self.direction = direction
+        self.spread = spread
+        self.speed = speed
+        self.shapes = tuple(shape_mix.keys())
+        self.weights = tuple(shape_mix.values())
+        self.max_spawns = max_spawns # None = unlimited
+        self.enabled = True
+        self.spawned = 0
+        self._accumulator = 0.0
+        self._rng = random.Random(self.id if seed is None else seed)
+
+    def due(self, dt):
+        """Adds this frame's share of the rate and returns how many objects are owed."""
+        if not self.enabled: return 0
+        # Owed spawns never pile up past one second's worth while the budget holds them back
+        self._accumulator = min(self._accumulator + self.rate * dt, max(1.0, float(self.rate)))
+        owed = int(self._accumulator)
+        if self.max_spawns is not None:
+            owed = min(owed, self.max_spawns - self.spawned)
+        return max(0, owed)
+
+    def make_specs(self, count):
+        """Builds `count` create_objects specs and charges them to the accumulator."""
+        rng = self._rng
+        x, y = self.position
+        jitter = DEFAULT_CIRCLE_RADIUS # Keeps a burst from starting perfectly stacked
+        specs = []
+        for shape in rng.choices(self.shapes, self.weights, k=count):
+            angle = self.direction + rng.uniform(-self.spread, self.spread)
+            speed = rng.uniform(self.speed[0], self.speed[1])
+            specs.append((shape,
+                          (x + rng.uniform(-jitter, jitter), y + rng.uniform(-jitter, jitter)),
+                          rng.uniform(0.0, 2 * math.pi),
+                          (math.cos(angle) * speed, math.sin(angle) * speed)))
+        self._accumulator -= count
+        self.spawned += count
+        return specs
+
+
+class SpawnManager:
+    """Owns the emitters and feeds their output to ObjectManager.create_objects.
+
+    All emitters share `budget` objects per frame, handed out round-robin so a
+    fast emitter cannot starve the others; what does not fit waits for later
+    frames. Emitters pause while the world holds `max_objects` or more.
+    `flood` is the exception: it fills a region in one call, ignoring the budget.
+    Call everything on the thread that owns the Box2D world.
+    """
+    def __init__(self, object_manager, budget=SPAWN_BUDGET_PER_FRAME, max_objects=SPAWN_MAX_OBJECTS):
+        self.object_manager = object_manager
+        self.budget = budget
+        self.max_objects = max_objects
+        self.emitters = []
+        self._markers = () # Render-side (id, x, y, direction, enabled) tuples, rebuilt on change
+        self._next = 0 # Round-robin start
+        self._rng = random.Random(0)
+        self.last_spawned = 0 # Objects created by emitters last update (for the debug overlay)
+        self.waiting = 0      # Objects owed but held back by the budget or object cap
+
+    def add_emitter(self, emitter):
+        self.emitters.append(emitter)
+        self._refresh_markers()
+        return emitter
+
+    def remove_emitter(self, emitter):
+        if emitter in self.emitters:
+            self.emitters.remove(emitter)
+            self._refresh_markers()
+
+    def clear(self):
+        self.emitters.clear()
+        self._refresh_markers()
+
+    def toggle_emitter_at(self, position, **emitter_args):
+        """Removes the emitter nearest `position` (meters) if one is close, else places a new one there."""
+        px, py = position[0], position[1]
+        nearest = min(self.emitters, default=None,
+                      key=lambda e: (e.position[0] - px) ** 2 + (e.position[1] - py) ** 2)
+        if nearest and math.hypot(nearest.position[0] - px, nearest.position[1] - py) <= EMITTER_PICK_RADIUS:
+            self.remove_emitter(nearest)
+            print(f"Removed emitter {nearest.id}")
+            return None
+        emitter = self.add_emitter(Emitter((px, py), **emitter_args))
+        print(f"Placed emitter {emitter.id} at ({px:.1f}, {py:.1f})")
+        return emitter
+
+    def get_markers(self):
+        """Emitter markers for drawing; the same tuple is returned until emitters change."""
+        return self._markers
+
+    def _refresh_markers(self):
+        self._markers = tuple((e.id, e.position[0], e.position[1], e.direction, e.enabled) for e in self.emitters)
+
+    def update(self, dt):
+        """Runs the emitters for one frame and creates their objects in one bulk call."""
+        self.last_spawned = 0
+        if not self.emitters:
+            self.waiting = 0
+            return
+        owed = [(emitter, emitter.due(dt)) for emitter in self.emitters]
+        total_owed = sum(count for _, count in owed)
+        room = min(self.budget, self.max_objects - self.object_manager.get_count())
+        if total_owed <= 0 or room <= 0:
+            self.waiting = max(0, total_owed)
+            return
+
+        # Hand out the budget one object per emitter per round, starting from a rotating emitter
+        count = len(owed)
+        start = self._next % count
+        self._next += 1
+        granted = [0] * count
+        remaining = min(room, total_owed)
+        while remaining > 0:
+            for step in range(count):
+                index = (start + step) % count
+                if granted[index] < owed[index][1] and remaining > 0:
+                    granted[index] += 1
+                    remaining -= 1
+
+        specs = []
+        for (emitter, _), n in zip(owed, granted):
+            if n:
+                specs.extend(emitter.make_specs(n))
+            if emitter.max_spawns is not None and emitter.spawned >= emitter.max_spawns and emitter.enabled:
+                emitter.enabled = False
+                self._refresh_markers()
+        self.last_spawned = len(self.object_manager.create_objects(specs))
+        self.waiting = total_owed - len(specs)
+
+    def flood(self, lower, upper, count, shape_mix=SPAWN_SHAPE_MIX):
+        """Fills the world box lower..upper (meters) with `count` objects on a jittered grid, in one call.
+
+        Objects may overlap when the box is too small for `count`; Box2D pushes
+        them apart over the next steps. Returns the number created.
+        """
+        width, height = upper[0] - lower[0], upper[1] - lower[1]
+        if count <= 0 or width <= 0 or height <= 0: return 0
+        count = min(count, max(0, self.max_objects - self.object_manager.get_count()))
+        if not count:
+            print("Flood skipped: object limit reached.")
+            return 0
+        columns = max(1, int(round(math.sqrt(count * width / height))))
+        rows = int(math.ceil(count / columns))
+        cell_w, cell_h = width / columns, height / rows
+        rng = self._rng
+        shapes = rng.choices(tuple(shape_mix.keys()), tuple(shape_mix.values()), k=count)
+        specs = []
+        for index, shape in enumerate(shapes):
+            row, column = divmod(index, columns)
+            x = lower[0] + (column + 0.5 + rng.uniform(-0.2, 0.2)) * cell_w
+            y = lower[1] + (row + 0.5 + rng.uniform(-0.2, 0.2)) * cell_h
+            specs.append((shape, (x, y), rng.uniform(0.0, 2 * math.pi), (0.0, 0.0)))
+        created = len(self.object_manager.create_objects(specs))
+        print(f"Flood: created {created} objects")
+        return created
@@ -0,0 +1,85 @@
+import pygame
+import math
+from settings import (COLOR_BACKGROUND, SPRITE_ROTATION_STEPS, SPRITE_ATLAS_MAX_SPRITES,
+                      LOD_DETAIL_MIN_RADIUS_PX)
+
+class SpriteAtlas:
+    """Pre-rasterized object sprites keyed by (shape, size, color, quantized angle).
+
+    Objects come in a handful of fixed sizes and palette colors, so each
+    combination is drawn once per rotation step and then reused. Sprites are
+    drawn with pygame.draw from rotated vertices (not transform.rotate), so they
+    look the same as the direct draw path.
+    """
+    def __init__(self, rotation_steps=SPRITE_ROTATION_STEPS, max_sprites=SPRITE_ATLAS_MAX_SPRITES):
+        self.rotation_steps = rotation_steps
+        self.max_sprites = max_sprites
+        self._sprites = {}
+        self.misses = 0
+
+    def quantize_angle(self, angle_rad):
+        return int(round(angle_rad / (2 * math.pi) * self.rotation_steps)) % self.rotation_steps
+
+    def get(self, spec, angle_rad):
+        """Returns (surface, half_extent) for a sprite spec from GameObject.get_sprite_spec()."""
+        key = (spec, self.quantize_angle(angle_rad))
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            if len(self._sprites) >= self.max_sprites:
+                self._sprites.clear() # Zooming through many sizes; start over rather than grow unbounded
+            sprite = self._build(spec, key[1] * 2 * math.pi / self.rotation_steps)
+            self._sprites[key] = sprite
+            self.misses += 1
+        return sprite
+
+    def _build(self, spec, angle_rad):
+        shape, dims, color = spec
+        if shape == 'circle':
+            radius = max(1, dims[0])
+            half = radius + 1
+            surface = self._new_surface(half)
+            pygame.draw.circle(surface, color, (half, half), radius)
+            if radius > LOD_DETAIL_MIN_RADIUS_PX:
+                # Same orientation line as Renderer.draw_circle (Pygame Y is inverted)
+                end = (half + radius * math.cos(angle_rad), half - radius * math.sin(angle_rad))
+                pygame.draw.line(surface, COLOR_BACKGROUND, (half, half), (int(end[0]), int(end[1])), 1)
+        else:
+            hw, hh = dims[0] / 2, dims[1] / 2
+            half = int(math.ceil(math.hypot(hw, hh))) + 1
+            surface = self._new_surface(half)
+            c, s = math.cos(angle_rad), math.sin(angle_rad)
+            vertices = [(half + x * c - y * s, half - (x * s + y * c))
+                        for x, y in ((-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh))]
+            pygame.draw.polygon(surface, color, vertices)
+        return surface, half
+
+    def _new_surface(self, half):
+        surface = pygame.Surface((2 * half + 1, 2 * half + 1), pygame.SRCALPHA)
+        try:
+            surface = surface.convert_alpha()
+            surface.fill((0, 0, 0, 0))
+        except pygame.error:
+            pass # No display mode yet; per-pixel alpha surface still works
+        return surface
+
+    def build_blit_sequence(self, objects):
+        """Returns [(surface, dest)] for objects with a sprite, plus a list of those without one."""
+        sequence = []
+        fallback = []
+        for obj in objects:
+            spec = obj.get_sprite_spec()
+            if spec is None:
+                fallback.append(obj)
+                continue
+            if not obj.is_drawable():
+                continue
+            surface, half = self.get(spec, obj.angle)
+            x, y = obj.get_pygame_pos()
+            sequence.append((surface, (x - half, y - half)))
+        return sequence, fallback
+
+    def clear(self):
+        self._sprites.clear()
+
+    def get_sprite_count(self):
+        return len(self._sprites)
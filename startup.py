@@ -0,0 +1,29 @@
+import time
+
+class StartupTimer:
+    """Wall-clock marks from launch to the first presented frame.
+
+    Standard library only, so main.py can create it before importing pygame or
+    Box2D and time those imports too. Each mark records the time since the
+    previous mark and since `start`.
+    """
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = [] # (label, ms since previous mark, ms since start)
+        self._last = self.start
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.marks.append((label, (now - self._last) * 1000.0, (now - self.start) * 1000.0))
+        self._last = now
+        return (now - self.start) * 1000.0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000.0
+
+    def report(self):
+        """Formatted table of the marks, one line per phase."""
+        lines = ["Startup timings:"]
+        for label, delta, total in self.marks:
+            lines.append(f"  {label:<24}{delta:8.1f} ms   (at {total:7.1f} ms)")
+        return "\n".join(lines)
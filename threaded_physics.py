@@ -0,0 +1,352 @@
+import math
+import threading
+import time
+from collections import deque
+from settings import TIME_STEP, to_pygame, scalar_to_pygame
+
+class ObjectSnapshot:
+    """Render-side copy of a GameObject's state at one physics step.
+
+    Implements the same drawing interface the Renderer, SpriteAtlas and
+    LevelOfDetail use on live objects, so snapshots can be rendered directly.
+    Read-only for the main thread; PhysicsThread refills them in place
+    (`capture`) once the buffer holding them is no longer being drawn.
+    """
+    __slots__ = ('id', 'shape_type', 'position', 'angle', 'color', 'color_key',
+                 'radius', 'size', 'teleporting', 'awake')
+
+    def __init__(self, obj):
+        self.capture(obj)
+
+    def capture(self, obj):
+        """Copies a live object's state into this snapshot."""
+        self.id = obj.id
+        self.shape_type = obj.shape_type
+        self.position = (obj.position.x, obj.position.y)
+        self.angle = obj.angle
+        self.color = obj.color
+        self.color_key = obj.color_key
+        self.radius = getattr(obj, 'radius', None)
+        self.size = getattr(obj, 'size', None)
+        self.teleporting = obj.teleporting
+        self.awake = obj.is_awake()
+
+    @classmethod
+    def from_state(cls, obj_id, shape_type, position, angle, color, radius=None, size=None, awake=True):
+        """Builds a snapshot from plain values instead of a live object (e.g. replicated state)."""
+        snapshot = cls.__new__(cls)
+        snapshot._set_state(obj_id, shape_type, position, angle, color, radius, size, awake)
+        return snapshot
+
+    def _set_state(self, obj_id, shape_type, position, angle, color, radius, size, awake):
+        self.id = obj_id
+        self.shape_type = shape_type
+        self.position = position
+        self.angle = angle
+        self.color = color
+        self.color_key = tuple(color)
+        self.radius = radius
+        self.size = size
+        self.teleporting = False
+        self.awake = awake
+
+    @classmethod
+    def ghost_of(cls, obj, position, angle):
+        """Snapshot of `obj` at its ghost's pose, past the portal it straddles (PortalManager.get_ghost_poses).
+        Ids are -1 - obj.id, so they never clash with objects'."""
+        snapshot = cls.__new__(cls)
+        snapshot.capture_ghost((obj, position, angle))
+        return snapshot
+
+    def capture_ghost(self, pose):
+        """Refills this snapshot from one (obj, position, angle) entry of PortalManager.get_ghost_poses."""
+        obj, position, angle = pose
+        self._set_state(-1 - obj.id, obj.shape_type, position, angle, obj.color,
+                        getattr(obj, 'radius', None), getattr(obj, 'size', None), True)
+
+    def get_pygame_pos(self):
+        return to_pygame(self.position)
+
+    def is_drawable(self):
+        return not self.teleporting
+
+    def is_awake(self):
+        return self.awake
+
+    def get_bounding_radius(self):
+        if self.radius is not None:
+            return self.radius
+        if self.size is not None:
+            return math.hypot(self.size[0], self.size[1]) / 2
+        return 0.25
+
+    def get_sprite_spec(self):
+        if self.radius is not None:
+            return ('circle', (scalar_to_pygame(self.radius),), self.color_key)
+        if self.size is not None:
+            return ('box', (scalar_to_pygame(self.size[0]), scalar_to_pygame(self.size[1])), self.color_key)
+        return None
+
+    def get_screen_rect(self):
+        if self.teleporting:
+            return None
+        x, y = self.get_pygame_pos()
+        r = scalar_to_pygame(self.get_bounding_radius()) + 2
+        return (x - r, y - r, 2 * r, 2 * r)
+
+    def draw(self, surface, renderer):
+        if self.teleporting: return
+        if renderer.sprite_atlas is not None and self.get_sprite_spec():
+            renderer.draw_sprite(surface, self)
+        elif self.radius is not None:
+            renderer.draw_circle(surface, self.color, self.get_pygame_pos(), scalar_to_pygame(self.radius), self.angle)
+        elif self.size is not None:
+            hw, hh = self.size[0] / 2, self.size[1] / 2
+            c, s = math.cos(self.angle), math.sin(self.angle)
+            x, y = self.position
+            vertices = [to_pygame((x + vx * c - vy * s, y + vx * s + vy * c))
+                        for vx, vy in ((-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh))]
+            renderer.draw_polygon(surface, self.color, vertices)
+
+
+class PortalSnapshot:
+    """Immutable render-side copy of a Portal. Portals are static, so one is built per portal."""
+    __slots__ = ('id', 'pair_id', 'color', 'angle', 'position', 'size', 'vertices_world', 'linked_pose')
+
+    def __init__(self, portal):
+        self.id = portal.id
+        self.pair_id = portal.pair_id
+        self.color = portal.color
+        self.angle = portal.angle
+        self.position = (portal.position.x, portal.position.y)
+        self.size = portal.size
+        transform = portal.body.transform
+        shape = portal.body.fixtures[0].shape
+        self.vertices_world = tuple(tuple(transform * v) for v in shape.vertices)
+        self.linked_pose = portal.get_linked_pose()
+
+    @classmethod
+    def from_state(cls, portal_id, pair_id, color, position, angle, size, linked_pose):
+        """Builds a snapshot from a pose instead of a live portal; vertices match PhysicsManager's portal box."""
+        snapshot = cls.__new__(cls)
+        snapshot.id = portal_id
+        snapshot.pair_id = pair_id
+        snapshot.color = color
+        snapshot.angle = angle
+        snapshot.position = position
+        snapshot.size = size
+        hw, hh = size[0] / 2, size[1] / 2
+        c, s = math.cos(angle), math.sin(angle)
+        x, y = position
+        snapshot.vertices_world = tuple((x + vx * c - vy * s, y + vx * s + vy * c)
+                                        for vx, vy in ((-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh)))
+        snapshot.linked_pose = linked_pose
+        return snapshot
+
+    def get_linked_pose(self):
+        return self.linked_pose
+
+    def get_pygame_pos(self):
+        return to_pygame(self.position)
+
+    def get_screen_rect(self):
+        x, y = self.get_pygame_pos()
+        r = scalar_to_pygame(math.hypot(self.size[0], self.size[1]) / 2) + 3
+        return (x - r, y - r, 2 * r, 2 * r)
+
+    def draw(self, surface, renderer):
+        renderer.draw_portal(surface, self.color, [to_pygame(v) for v in self.vertices_world], self.angle)
+
+
+class WorldSnapshot:
+    """Everything the main thread needs to draw one frame, captured after a physics step."""
+    __slots__ = ('step', 'objects', 'portals', 'obj_count', 'portal_count', 'gravity_on', 'stats', 'ghosts',
+                 'emitters', 'creation_start', '_grid')
+    GRID_CELL = 2.0 # Meters per cell of the lazily built lookup grid
+
+    def __init__(self, step, objects, portals, gravity_on, stats, ghosts=(), emitters=(), creation_start=None):
+        self.step = step
+        self.objects = objects
+        self.portals = portals
+        self.obj_count = len(objects)
+        self.portal_count = len(portals)
+        self.gravity_on = gravity_on
+        self.stats = stats
+        self.ghosts = ghosts # ObjectSnapshot.ghost_of copies, drawn with the objects but not counted or looked up
+        self.emitters = emitters # Spawner.get_markers() tuple
+        self.creation_start = creation_start # Snapped start of the portal being dragged out, or None
+        self._grid = None
+
+    def get_entities_in_aabb(self, lower, upper):
+        """(objects, portals) whose centers lie in a world box; stands in for the broadphase on the main thread."""
+        cell = self.GRID_CELL
+        if self._grid is None:
+            grid = {}
+            for obj in self.objects:
+                key = (int(obj.position[0] // cell), int(obj.position[1] // cell))
+                grid.setdefault(key, []).append(obj)
+            self._grid = grid
+        x0, y0, x1, y1 = lower[0], lower[1], upper[0], upper[1]
+        objects = []
+        grid = self._grid
+        for cx in range(int(x0 // cell), int(x1 // cell) + 1):
+            for cy in range(int(y0 // cell), int(y1 // cell) + 1):
+                for obj in grid.get((cx, cy), ()):
+                    x, y = obj.position
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        objects.append(obj)
+        portals = [p for p in self.portals if x0 <= p.position[0] <= x1 and y0 <= p.position[1] <= y1]
+        return objects, portals
+
+
+class PhysicsThread:
+    """Steps the Simulation (emitters, physics, teleports, cleanup) on a dedicated thread.
+
+    The main thread never touches the Box2D world while this runs: it reads the
+    latest published WorldSnapshot and sends world changes through `submit`, a
+    deque that is drained at the start of each step.
+
+    Snapshots are double-buffered. Two WorldSnapshots and their ObjectSnapshots
+    are refilled in place, so a step allocates nothing for unchanged object
+    counts. `get_snapshot` holds the buffer it returns until the next call. A
+    step whose back buffer is still held skips publishing, so the main thread
+    sees at most one step less than with a fresh snapshot per step.
+    """
+    def __init__(self, simulation, time_step=TIME_STEP):
+        self.simulation = simulation
+        self.physics_manager = simulation.physics_manager
+        self.object_manager = simulation.object_manager
+        self.portal_manager = simulation.portal_manager
+        self.time_step = time_step
+        self._commands = deque() # append/popleft are atomic; no lock needed
+        self._buffers = (WorldSnapshot(0, [], (), False, {}, []), WorldSnapshot(0, [], (), False, {}, []))
+        self._front = None # Latest published buffer
+        self._held = None # Buffer the main thread is drawing from; never refilled
+        self._lock = threading.Lock() # Guards _front/_held handoffs only
+        self._spare = [] # ObjectSnapshots dropped from a buffer, reused before allocating new ones
+        self._unpublished = False # A publish was skipped; retried even while paused
+        self._portal_snapshots = {} # Portal -> PortalSnapshot, rebuilt only when portals change
+        self._portal_view = None
+        self._portal_tuple = ()
+        self._stop = threading.Event()
+        self._thread = None
+        self.step_count = 0
+        self.last_step_ms = 0.0
+        self.error = None
+        self.paused = False # Set by the main thread; commands still run and are published while paused
+
+    def start(self):
+        self._publish() # So the first frame has something to draw
+        self._thread = threading.Thread(target=self._run, name="PhysicsThread", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn, *args):
+        """Queues a world-changing call to run on the physics thread before the next step."""
+        self._commands.append((fn, args))
+
+    def get_snapshot(self):
+        """The latest published snapshot. It stays valid until the next call (main thread only)."""
+        with self._lock:
+            self._held = self._front
+            return self._front
+
+    def _drain_commands(self):
+        commands = self._commands
+        ran = bool(commands)
+        while commands:
+            fn, args = commands.popleft()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error running physics command {getattr(fn, '__name__', fn)}: {e}")
+        return ran
+
+    def _run(self):
+        next_step = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                if self.paused:
+                    if self._drain_commands() or self._unpublished:
+                        self._publish() # Show what the commands did (e.g. a rewind restore)
+                    time.sleep(self.time_step)
+                    next_step = time.perf_counter()
+                    continue
+                self._drain_commands()
+                start = time.perf_counter()
+                steps = self.simulation.step(self.time_step)
+                self.last_step_ms = (time.perf_counter() - start) * 1000.0
+                self.step_count += steps
+                self._publish()
+            except Exception as e:
+                import traceback; traceback.print_exc()
+                print(f"Error in physics thread: {e}")
+                self.error = e
+                return
+
+            next_step += self.time_step
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.25:
+                next_step = time.perf_counter() # Too far behind; don't try to catch up
+
+    def _publish(self):
+        with self._lock:
+            back = self._buffers[1] if self._front is self._buffers[0] else self._buffers[0]
+            if back is self._held: # Still being drawn; the current front stays up
+                self._unpublished = True
+                return
+        portals = self.portal_manager.get_all_portals()
+        if portals is not self._portal_view: # The registry returns the same tuple until portals change
+            self._portal_snapshots = {p: self._portal_snapshots.get(p) or PortalSnapshot(p)
+                                      for p in portals if p.body}
+            self._portal_view = portals
+            self._portal_tuple = tuple(self._portal_snapshots.values())
+
+        back.step = self.step_count
+        self._fill(back.objects, (obj for obj in self.object_manager.get_objects()
+                                  if obj.body and not obj.marked_for_deletion), ObjectSnapshot.capture)
+        self._fill(back.ghosts, self.portal_manager.get_ghost_poses(), ObjectSnapshot.capture_ghost)
+        back.portals = self._portal_tuple
+        back.obj_count = len(back.objects)
+        back.portal_count = len(back.portals)
+        back.gravity_on = self.physics_manager.get_gravity_state()
+        back.emitters = self.simulation.spawner.get_markers() # Immutable; rebuilt by the spawner on change
+        creation = self.portal_manager.creation_state
+        back.creation_start = creation['start_pos_box2d'] if creation['active'] else None
+        back._grid = None
+        stats = back.stats
+        stats['bodies'] = len(self.physics_manager.world.bodies)
+        stats['contacts'] = self.physics_manager.world.contactCount
+        stats['step_ms'] = self.last_step_ms
+        stats['dragging'] = self.object_manager.selected_object.id if self.object_manager.selected_object else None
+        stats['teleport_queue'] = len(self.portal_manager.teleport_queue)
+        stats['ghosts'] = self.physics_manager.ghosts.get_info()
+        spawner = self.simulation.spawner
+        stats['spawner'] = (len(spawner.emitters), spawner.last_spawned, spawner.waiting)
+        with self._lock:
+            self._front = back
+        self._unpublished = False
+
+    def _fill(self, snapshots, items, capture):
+        """Refills the list `snapshots` from `items` with capture(snapshot, item), reusing snapshots."""
+        count = len(snapshots)
+        spare = self._spare
+        n = 0
+        for item in items:
+            if n < count:
+                snapshot = snapshots[n]
+            else:
+                snapshot = spare.pop() if spare else ObjectSnapshot.__new__(ObjectSnapshot)
+                snapshots.append(snapshot)
+            capture(snapshot, item)
+            n += 1
+        if n < count:
+            spare.extend(snapshots[n:])
+            del snapshots[n:]
@@ -0,0 +1,93 @@
+import math
+from settings import Box2D, PORTAL_TRANSIT_REACH
+
+class TransitGraph:
+    """Which portals an object can land in straight after coming out of another.
+
+    Nodes are portals. An edge P -> R means an object entering P comes out of
+    P's linked portal close enough to R to overlap it at once, so it can go on
+    through R in the same step instead of waiting a step for a new contact.
+    Portals are static, so the graph is rebuilt only when the registry changes
+    (`PortalRegistry.version`), on the thread that steps the world.
+
+    `looping` holds the portals from which a chain of hops can come back to a
+    portal it already used (e.g. two pairs whose exits face each other's
+    entries). Chains that start anywhere else end within the graph's depth, so
+    only chains through `looping` portals need to track where they have been.
+    """
+    def __init__(self, reach=PORTAL_TRANSIT_REACH):
+        self.reach = reach
+        self.next_portals = {} # entry portal -> tuple of portals an arrival may overlap
+        self.looping = frozenset()
+        self._version = None
+        self._transform = Box2D.b2Transform() # Reused for the overlap tests
+
+    def refresh(self, registry):
+        """Rebuilds the graph if portals were created or deleted since the last call."""
+        if registry.version != self._version:
+            self._build(registry.get_portals())
+            self._version = registry.version
+
+    def _build(self, portals):
+        live = [portal for portal in portals if portal.body and not portal.marked_for_deletion]
+        next_portals = {}
+        for portal in live:
+            exit_portal = portal.linked_portal
+            if exit_portal is None or exit_portal.body is None: continue
+            ex, ey = exit_portal.position.x, exit_portal.position.y
+            candidates = []
+            for other in live:
+                if other is exit_portal: continue # Arrivals move away from the portal they leave
+                limit = self.reach + math.hypot(other.size[0], other.size[1]) / 2
+                if (other.position.x - ex) ** 2 + (other.position.y - ey) ** 2 <= limit * limit:
+                    candidates.append(other)
+            if candidates:
+                next_portals[portal] = tuple(candidates)
+
+        # Drop portals whose edges all lead to dropped portals; what is left can reach a cycle
+        looping = set(next_portals)
+        changed = True
+        while changed:
+            changed = False
+            for portal in list(looping):
+                if not any(other in looping for other in next_portals[portal]):
+                    looping.discard(portal)
+                    changed = True
+        self.next_portals = next_portals
+        self.looping = frozenset(looping)
+
+    def next_hop(self, portal, obj, position, angle, velocity, current_time, cooling=()):
+        """The portal an object leaving `portal`'s link at this pose enters straight away, or None.
+
+        That is one whose sensor the object overlaps with its center already past
+        the portal's center plane, in the direction it is moving (the crossing a
+        straddle waits for), and whose exit is not cooling down for it. `cooling`
+        holds portals whose cooldown for obj is about to start (earlier hops of
+        the same chain).
+        """
+        candidates = self.next_portals.get(portal)
+        if not candidates or not obj.body: return None
+        for other in candidates:
+            exit_portal = other.linked_portal
+            if other.marked_for_deletion or not other.body or not exit_portal or not exit_portal.body: continue
+            if exit_portal in cooling or not exit_portal.can_teleport(obj.id, current_time): continue
+            nx, ny = other.normal
+            if other.depth_of(position) * (velocity.x * nx + velocity.y * ny) <= 0: continue
+            if self.overlaps(obj, other, position, angle):
+                return other
+        return None
+
+    def overlaps(self, obj, portal, position, angle):
+        """Whether obj's fixtures, moved to `position`/`angle`, overlap `portal`'s sensor."""
+        if not obj.body or not portal.body: return False
+        transform = self._transform
+        transform.position = position
+        transform.angle = angle
+        sensor_transform = portal.body.transform
+        for sensor in portal.body.fixtures:
+            for fixture in obj.body.fixtures:
+                result = Box2D.b2Distance(shapeA=fixture.shape, shapeB=sensor.shape,
+                                          transformA=transform, transformB=sensor_transform, useRadii=True)
+                if result.distance <= 0.0:
+                    return True
+        return False
@@ -26,10 +26,11 @@ class Button:
         """Handles mouse events relevant to the button. Returns True if event was handled."""
         if not self.visible or not self.enabled:
              return False # Cannot interact if not visible or enabled
+        if not hasattr(event, 'pos'):
+             return False # Not a positional mouse event (e.g. wheel)
 
         event_handled = False
-        mouse_pos = pygame.mouse.get_pos()
-        collides = self.rect.collidepoint(mouse_pos)
+        collides = self.rect.collidepoint(event.pos) # Position at the time of the event
 
         if event.type == pygame.MOUSEMOTION:
             if collides:
@@ -68,6 +69,10 @@ class Button:
 
         return event_handled # Let InputManager know if event is used
 
+    def get_render_signature(self):
+        """Anything that changes the button's pixels; used by dirty-rect rendering."""
+        return (self.state, self.enabled, self.visible, self.text, tuple(self.rect))
+
     def draw(self, surface, renderer):
         """Draws the button based on its current state."""
         if not self.visible: return # Don't draw if not visible
@@ -102,12 +107,46 @@ class Button:
         """DEPRECATED - Use handle_event. Checks if a point is inside the button rect."""
         return self.visible and self.enabled and self.rect.collidepoint(pos)
 
+class UIHitIndex:
+    """Grid of screen cells -> UI elements overlapping them, for constant-time hit tests."""
+    CELL = 64 # Pixels
+
+    def __init__(self):
+        self._cells = {}
+
+    def rebuild(self, elements):
+        cells = {}
+        cell = self.CELL
+        for order, element in enumerate(elements):
+            if not getattr(element, 'visible', True) or not hasattr(element, 'rect'):
+                continue
+            rect = element.rect
+            for cx in range(rect.left // cell, (rect.right - 1) // cell + 1):
+                for cy in range(rect.top // cell, (rect.bottom - 1) // cell + 1):
+                    cells.setdefault((cx, cy), []).append((order, element))
+        self._cells = cells
+
+    def element_at(self, pos):
+        """Topmost (last added) visible element containing `pos`, or None."""
+        top = None
+        for order, element in self._cells.get((pos[0] // self.CELL, pos[1] // self.CELL), ()):
+            if element.rect.collidepoint(pos) and (top is None or order > top[0]):
+                top = (order, element)
+        return top[1] if top else None
+
+
 class UIManager:
     def __init__(self, assets):
         self.elements = [] # List of UI elements (buttons, labels, etc.)
-        self.assets = assets
-        # Get font safely, providing fallback if needed
-        self.ui_font = assets.get('ui_font', pygame.font.SysFont(None, UI_FONT_SIZE))
+        self._hit_index = UIHitIndex() # Spatial index of visible elements, rebuilt when invalidated
+        self._index_dirty = True
+        self._hovered = None # Element currently under the mouse
+        self._pressed = None # Element that received the last handled button press
+        self.assets = assets # Fonts may still be loading in the background; read them on use
+
+    @property
+    def ui_font(self):
+        return self.assets.get('ui_font')
 
     def create_button(self, rect, text, callback, **kwargs):
         """Creates a Button and adds it to the UI manager."""
@@ -119,21 +158,43 @@ class UIManager:
 
         button = Button(rect, text, callback, self.ui_font, **kwargs)
         self.elements.append(button)
+        self._index_dirty = True
         return button
 
     # Add methods for other UI elements (Labels, sliders?) here
     # def create_label(...)
 
+    def invalidate_hit_index(self):
+        """Call after showing/hiding or moving elements so hit-testing sees the change."""
+        self._index_dirty = True
+
     def handle_event(self, event):
-        """Passes events to UI elements, stopping if one handles it."""
+        """Routes a mouse event to the element under its position. Returns True if one handled it.
+
+        Only the hit element, the previously hovered one (to clear its hover) and
+        the one holding a press (to receive the release) are asked, so the cost
+        does not grow with the number of elements.
+        """
+        if event.type not in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            return False
+        if self._index_dirty:
+            self._hit_index.rebuild(self.elements)
+            self._index_dirty = False
+        hit = self._hit_index.element_at(event.pos)
+
         handled = False
-        # Iterate in reverse order so topmost elements receive events first
-        for element in reversed(self.elements):
-            # Check if the element has a handle_event method
-            if hasattr(element, 'handle_event'):
-                if element.handle_event(event):
-                    handled = True
-                    break # Stop processing this event if a UI element consumed it
+        if event.type == pygame.MOUSEMOTION:
+            if self._hovered is not None and self._hovered is not hit:
+                handled = self._hovered.handle_event(event) or handled
+            self._hovered = hit
+        elif event.type == pygame.MOUSEBUTTONUP:
+            pressed, self._pressed = self._pressed, None
+            if pressed is not None and pressed is not hit:
+                handled = pressed.handle_event(event) or handled
+        if hit is not None and hasattr(hit, 'handle_event'):
+            handled = hit.handle_event(event) or handled
+            if event.type == pygame.MOUSEBUTTONDOWN and handled:
+                self._pressed = hit
         return handled
 
     def update(self, dt):
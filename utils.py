@@ -1,6 +1,7 @@
 import pygame
 import math
-from settings import PPM, HEIGHT, to_pygame, to_box2d # Assuming Box2D is imported elsewhere when needed
+from collections import OrderedDict
+from settings import PPM, HEIGHT, to_pygame, to_box2d, TEXT_CACHE_SIZE # Assuming Box2D is imported elsewhere when needed
 
 def rotate_point(point, angle_rad, center):
     """Rotates a point around a center by a given angle in radians."""
@@ -17,13 +18,70 @@ def rotate_point(point, angle_rad, center):
     # Translate point back
     return x_new + center[0], y_new + center[1]
 
-def draw_text(surface, text, position, font, color=pygame.Color("black"), center=False):
-    """Helper function to draw text. Returns the text rect."""
+class TextSurfaceCache:
+    """Bounded LRU cache of rendered text surfaces keyed by (text, font, color, antialias)."""
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """Returns a cached surface for the text, rendering it on a miss."""
+        key = (text, font, tuple(color), antialias) # pygame.Color is unhashable
+        text_surface = self._surfaces.get(key)
+        if text_surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return text_surface
+        self.misses += 1
+        text_surface = font.render(text, antialias, color)
+        self._surfaces[key] = text_surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return text_surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def stats(self):
+        return {'size': len(self._surfaces), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._surfaces)
+
+text_cache = TextSurfaceCache()
+
+
+class ThrottledValue:
+    """Holds a displayed value that is only refreshed every `interval` seconds.
+
+    Used for fast-changing HUD values (FPS, mouse position) so their text does
+    not have to be re-rasterized every frame.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.value = None
+        self._last_update = None
+
+    def get(self, value, now):
+        if self._last_update is None or now - self._last_update >= self.interval:
+            self.value = value
+            self._last_update = now
+        return self.value
+
+
+def draw_text(surface, text, position, font, color=pygame.Color("black"), center=False, antialias=True, cache=text_cache):
+    """Helper function to draw text. Returns the text rect. Uses the shared LRU text cache
+    unless cache=None."""
     if not font:
         print("Error: Attempted to draw text with no font.")
         return None
     try:
-        text_surface = font.render(text, True, color)
+        if cache is not None:
+            text_surface = cache.render(font, text, antialias, color)
+        else:
+            text_surface = font.render(text, antialias, color)
         text_rect = text_surface.get_rect()
         if center:
             text_rect.center = position
@@ -37,50 +95,3 @@ def draw_text(surface, text, position, font, color=pygame.Color("black"), center
     except Exception as e:
          print(f"Unexpected error rendering text '{text}': {e}")
          return None
-
-
-def get_body_vertices_pygame(body):
-    """Gets world vertices of a polygon body in Pygame coordinates."""
-    vertices_pygame = []
-    if not body: return vertices_pygame
-
-    for fixture in body.fixtures:
-        shape = fixture.shape
-        # Check if it's a polygon shape
-        if hasattr(shape, 'vertices') and isinstance(shape.vertices, (list, tuple)):
-            try:
-                # Transform vertices from local body coordinates to world coordinates
-                vertices_box2d = [(body.transform * v) for v in shape.vertices]
-                # Convert world coordinates (meters) to Pygame coordinates (pixels)
-                vertices_pygame = [to_pygame(v) for v in vertices_box2d]
-                # Assuming the first polygon fixture defines the renderable shape
-                break
-            except Exception as e:
-                 print(f"Error transforming vertices for body {body}: {e}")
-                 return [] # Return empty on error
-    return vertices_pygame
-
-def is_sensor(fixture):
-    """Safely checks if a Box2D fixture is a sensor, handling different Box2D-py API versions."""
-    try:
-        # Try property access (older Box2D-py versions)
-        return fixture.isSensor
-    except AttributeError:
-        try:
-            # Try method call (some Box2D-py versions)
-            return fixture.IsSensor()
-        except AttributeError:
-            try:
-                # Try fixture def property with different casing
-                return fixture.sensor
-            except AttributeError:
-                # If all checks fail, use getters if available
-                try:
-                    return fixture.GetFilterData().isSensor
-                except:
-                    # Last resort - check through userData if available
-                    if hasattr(fixture, 'userData') and fixture.userData and isinstance(fixture.userData, dict):
-                        return fixture.userData.get('isSensor', False)
-                    # If all checks fail, assume it's not a sensor
-                    print(f"Warning: Could not determine if fixture is sensor: {fixture}")
-                    return False
\ No newline at end of file